@@ -0,0 +1,84 @@
+"""
+Per-ticker vs. batch forecasting on a synthetic universe.
+
+    python -m benchmarks.bench_batch_forecasting --tickers 10000
+
+The per-ticker path is timed on --sample tickers and extrapolated to the full
+universe (use --sample 0 to time all of them). Also times recomputing the
+projection incrementally after a tax rate change against a full projection.
+"""
+import argparse
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_silver_frames
+from src.batch_forecasting import (
+    MODEL, STATEMENT_NODES, batch_drivers, build_history_panel, flatten_drivers, forecast_batch, _drop_without_revenue,
+)
+from src.forecasting import forecasting_income_statement, forecasting_balance_sheet, forecast_cashflow
+
+def per_ticker(frames):
+    out = {}
+    for ticker, df in frames.items():
+        is_forecast = forecasting_income_statement(df)
+        if is_forecast.empty:
+            continue
+        bs_forecast = forecasting_balance_sheet(df, is_forecast)
+        out[ticker] = (is_forecast, bs_forecast, forecast_cashflow(df, is_forecast, bs_forecast))
+    return out
+
+def check_match(reference, batch):
+    for ticker, expected in reference.items():
+        for exp_df, got_df in zip(expected, batch.frames(ticker)):
+            pd.testing.assert_frame_equal(exp_df, got_df, check_freq=False, check_index_type=False, rtol=1e-9)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=10000)
+    parser.add_argument("--sample", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    print(f"Generating {args.tickers} synthetic tickers...")
+    frames = make_silver_frames(args.tickers, seed=args.seed)
+
+    start = time.perf_counter()
+    panel = build_history_panel(frames)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = forecast_batch(panel)
+    batch_s = time.perf_counter() - start
+
+    sample = list(frames)[:args.sample] if args.sample else list(frames)
+    start = time.perf_counter()
+    reference = per_ticker({t: frames[t] for t in sample})
+    per_ticker_s = (time.perf_counter() - start) * len(frames) / len(sample)
+
+    check_match(reference, batch)
+
+    drivers = flatten_drivers(batch_drivers(_drop_without_revenue(panel)))
+    evaluation = MODEL.evaluate({**drivers, "forecast_years": 5}, STATEMENT_NODES)
+    tax_rate = np.full(len(drivers["tax_rate"]), 0.25)
+    start = time.perf_counter()
+    full = MODEL.evaluate({**drivers, "tax_rate": tax_rate, "forecast_years": 5}, STATEMENT_NODES)
+    full_s = time.perf_counter() - start
+    start = time.perf_counter()
+    updated = MODEL.recompute(evaluation, {"tax_rate": tax_rate})
+    recompute_s = time.perf_counter() - start
+    for col in STATEMENT_NODES:
+        np.testing.assert_array_equal(full[col], updated[col])
+
+    label = "" if len(sample) == len(frames) else f" (extrapolated from {len(sample)})"
+    print(f"per-ticker functions : {per_ticker_s:9.3f} s{label}")
+    print(f"batch panel build    : {build_s:9.3f} s")
+    print(f"batch forecast       : {batch_s:9.3f} s")
+    print(f"speedup (forecast)   : {per_ticker_s / batch_s:9.1f}x")
+    print(f"speedup (incl. build): {per_ticker_s / (build_s + batch_s):9.1f}x")
+    print(f"tax rate change      : {recompute_s:9.4f} s recomputing {len(updated.recomputed)} nodes, "
+          f"{full_s:.4f} s for all {len(full.recomputed)}")
+    print(f"results match for {len(reference)} tickers")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Vectorized integrity checks vs. a per-row loop over every ticker.
+
+    python -m benchmarks.bench_integrity --tickers 2000 --forecast 200
+
+Builds a Gold-shaped panel (historical Silver rows of a synthetic universe,
+plus forecast rows for the first --forecast tickers), times
+integrity.check_panel against an iterrows() loop in the style of the old
+check_balance_sheet, and checks that both flag the same rows.
+"""
+import argparse
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_silver_frames
+from src import integrity
+from src.forecasting import forecast_ticker
+
+def make_panel(n_tickers, n_forecast, seed):
+    frames = make_silver_frames(n_tickers, seed=seed)
+    gold = {}
+    for i, (ticker, df) in enumerate(frames.items()):
+        forecast = forecast_ticker(df.copy()) if i < n_forecast else None
+        if forecast is None:
+            forecast = df.assign(Type="Historical")
+        gold[ticker] = forecast
+    return pd.concat(gold, names=integrity.KEY_COLUMNS).sort_index()
+
+def per_row(panel, tolerances=integrity.TOLERANCES, atol=integrity.ATOL):
+    """
+    The identities row by row with row.get, as the commented-out check_balance_sheet did.
+    """
+    def side(row, alternatives, zero_if_missing=()):
+        for items in alternatives:
+            values = [row.get(item, np.nan) for item in items]
+            if row["Type"] == "Historical":
+                values = [0.0 if item in zero_if_missing and pd.isna(v) else v for item, v in zip(items, values)]
+            if not any(pd.isna(v) for v in values):
+                return sum(values)
+        return np.nan
+
+    flagged = set()
+    previous = None
+    for (ticker, period_end), row in panel.iterrows():
+        for name, identity in integrity.IDENTITIES.items():
+            total = side(row, identity["total"])
+            parts = side(row, identity["parts"], identity.get("zero_if_missing", ()))
+            if not pd.isna(total) and not pd.isna(parts):
+                if abs(total - parts) > max(atol, tolerances[name] * max(abs(total), abs(parts))):
+                    flagged.add((ticker, period_end, name))
+
+        end = row.get(integrity.END_CASH, np.nan)
+        opening = row.get("Beginning Cash Position", np.nan)
+        if previous is not None and previous[0] == ticker and not pd.isna(previous[2]):
+            days = (period_end - previous[1]).days
+            if integrity.YEAR_DAYS[0] <= days <= integrity.YEAR_DAYS[1]:
+                opening = previous[2]
+        fx = row.get("Effect Of Exchange Rate Changes", np.nan)
+        parts = opening + row.get("Changes In Cash", np.nan) + (0.0 if pd.isna(fx) else fx)
+        if not pd.isna(end) and not pd.isna(parts):
+            if abs(end - parts) > max(atol, tolerances[integrity.ROLL_FORWARD] * max(abs(end), abs(parts))):
+                flagged.add((ticker, period_end, integrity.ROLL_FORWARD))
+        previous = (ticker, period_end, end)
+    return flagged
+
+def add_cash_flows(panel, seed):
+    """
+    Cash positions that roll forward, with a few broken links.
+    """
+    rng = np.random.default_rng(seed)
+    historical = (panel["Type"] == "Historical").to_numpy()
+    change = np.where(historical, rng.normal(0, 100, len(panel)), np.nan)
+    end = pd.Series(change, index=panel.index).groupby(level="ticker").cumsum().to_numpy() + 1000
+    begin = end - change
+    broken = rng.random(len(panel)) < 0.01
+    return panel.assign(**{"End Cash Position": np.where(broken, end + 500, end),
+                           "Beginning Cash Position": begin, "Changes In Cash": change})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--forecast", type=int, default=200, help="tickers with forecast rows")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    print(f"Generating {args.tickers} synthetic tickers...")
+    panel = add_cash_flows(make_panel(args.tickers, args.forecast, args.seed), args.seed)
+
+    start = time.perf_counter()
+    report = integrity.check_panel(panel)
+    vectorized_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = per_row(panel)
+    per_row_s = time.perf_counter() - start
+
+    got = set(zip(report.violations["ticker"], report.violations["period_end"], report.violations["Check"]))
+    assert got == expected, f"{len(got ^ expected)} rows flagged differently"
+    print(report.summary.to_string(float_format="{:.2g}".format))
+    print(f"{len(panel)} rows, {len(got)} violations: vectorized {vectorized_s:.3f}s, per-row {per_row_s:.3f}s "
+          f"({per_row_s / vectorized_s:.0f}x), {vectorized_s / args.tickers * 1e6:.1f} us/ticker")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Ingestion against a local stand-in statement server, and Silver from Bronze with and without prefetch.
+
+    python -m benchmarks.bench_io --tickers 300 --workers 8 --handshake-ms 20
+
+Writes a synthetic Bronze tree, serves it over HTTP/1.1 keep-alive from a
+stand-in server (every new connection waits --handshake-ms, like a TLS
+handshake to a remote host would), and ingests it into a second directory
+with ingestion.fetch_http: once opening fresh connections per ticker, once
+through the shared pooled session of run_ingestion. Both runs write Bronze
+through the background writer and must reproduce the served files exactly.
+Then times run_processing of that Bronze with prefetching turned off and on
+and checks that Silver is identical.
+"""
+import argparse
+import filecmp
+import http.server
+import os
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+from functools import partial
+import pandas as pd
+from benchmarks.synthetic import make_universe, write_bronze
+from src import bronze, bronze_io, ingestion, processing
+from src.journal import DONE, Journal
+
+class StatementHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle every keep-alive response waits on a delayed ACK
+    disable_nagle_algorithm = True
+    handshake_seconds = 0.0
+
+    def setup(self):
+        time.sleep(self.handshake_seconds)
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+def serve(directory, handshake_seconds):
+    handler = type("Handler", (StatementHandler,), {"handshake_seconds": handshake_seconds})
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=directory))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+def ingest(tickers, base_url, workers, session):
+    shutil.rmtree("data", ignore_errors=True)
+    fetcher = partial(ingestion.fetch_http, base_url=base_url)
+    start = time.perf_counter()
+    journal = ingestion.run_ingestion(tickers, max_workers=workers, fetcher=fetcher, session=session,
+                                      journal=Journal("data/journal.jsonl"))
+    seconds = time.perf_counter() - start
+    assert journal.counts(tickers) == {DONE: len(tickers)}, journal.counts(tickers)
+    return seconds
+
+def same_bronze(served, tickers):
+    for ticker in tickers:
+        names = [f"{name}.json" for name in bronze.STATEMENT_NAMES]
+        match, mismatch, errors = filecmp.cmpfiles(os.path.join(served, ticker),
+                                                   os.path.join(bronze.BRONZE_DIR, ticker), names, shallow=False)
+        assert not mismatch and not errors, (ticker, mismatch, errors)
+
+def process(tickers, depth):
+    shutil.rmtree(processing.SILVER_DIR, ignore_errors=True)
+    bronze_io.PREFETCH_DEPTH = depth
+    start = time.perf_counter()
+    processing.run_processing(tickers=tickers)
+    seconds = time.perf_counter() - start
+    return seconds, {t: pd.read_parquet(os.path.join(processing.SILVER_DIR, f"{t}.parquet")) for t in tickers}
+
+class NoSession:
+    """
+    A fresh connection for every request, as yfinance without a shared session ends up doing per ticker.
+    """
+    def get(self, url):
+        return bronze_io.make_session(impersonate=False).get(url, headers={"Connection": "close"})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--handshake-ms", type=float, default=20.0, help="delay of every new connection")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", RuntimeWarning)
+    repo_dir = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        print(f"Generating {args.tickers} synthetic tickers...")
+        universe = make_universe(args.tickers, seed=args.seed)
+        write_bronze(universe)
+        served = os.path.join(workdir, "served")
+        os.rename(bronze.BRONZE_DIR, served)
+        tickers = sorted(universe)
+
+        httpd = serve(served, args.handshake_ms / 1000)
+        base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+        fresh_s = ingest(tickers, base_url, args.workers, NoSession())
+        same_bronze(served, tickers)
+        pooled_s = ingest(tickers, base_url, args.workers, None)
+        same_bronze(served, tickers)
+        httpd.shutdown()
+        httpd.server_close()
+
+        default_depth = bronze_io.PREFETCH_DEPTH
+        inline_s, expected = process(tickers, 0)
+        prefetch_s, got = process(tickers, default_depth)
+        bronze_io.PREFETCH_DEPTH = default_depth
+        for ticker in tickers:
+            pd.testing.assert_frame_equal(got[ticker], expected[ticker])
+        os.chdir(repo_dir)
+
+    print(f"ingest {args.tickers} tickers, {args.workers} workers, {args.handshake_ms:.0f} ms per new connection:")
+    print(f"  fresh connections {fresh_s:.2f}s, pooled session {pooled_s:.2f}s ({fresh_s / pooled_s:.1f}x); "
+          f"Bronze identical to the served files")
+    print(f"process: inline reads {inline_s:.2f}s, prefetch depth {default_depth} {prefetch_s:.2f}s "
+          f"({inline_s / prefetch_s:.2f}x); Silver identical")
+
+if __name__ == "__main__":
+    main()
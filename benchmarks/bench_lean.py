@@ -0,0 +1,135 @@
+"""
+Full vs. lean (projected, compact-dtype) Silver and Gold on a synthetic universe.
+
+    python -m benchmarks.bench_lean --tickers 2000 --extra-items 80 --silver-layout panel
+
+Also checks that lean forecasts match the full ones, which fails when the
+forecast functions read a line item missing from forecasting.REQUIRED_COLUMNS.
+--extra-items adds unused line items per ticker, as yfinance returns 100+.
+"""
+import argparse
+import os
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_silver_frames
+from src import instrumentation, silver_store
+from src.forecasting import REQUIRED_COLUMNS, load_silver, run_forecasting
+from src.processing import compact_frame
+
+def add_extra_items(frames, n_items, seed=0):
+    rng = np.random.default_rng(seed)
+    for ticker, df in frames.items():
+        extra = pd.DataFrame(rng.lognormal(10, 2, (len(df), n_items)), index=df.index,
+                             columns=[f"Extra Line Item {i}" for i in range(n_items)])
+        frames[ticker] = pd.concat([df, extra], axis=1)
+    return frames
+
+def dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+def frames_bytes(frames):
+    return sum(int(df.memory_usage(deep=True).sum()) for df in frames.values())
+
+def run(frames, lean, workers, silver_layout="files"):
+    """
+    Writes Silver, forecasts it and returns the sizes, time and peak memory.
+    """
+    os.makedirs("data/silver", exist_ok=True)
+    silver = {ticker: compact_frame(df) if lean else df for ticker, df in frames.items()}
+    if silver_layout == "panel":
+        silver_store.write_panel(silver)
+    else:
+        for ticker, df in silver.items():
+            df.to_parquet(f"data/silver/{ticker}.parquet")
+    del silver
+
+    instrumentation.RECORDER.take()
+    start = time.perf_counter()
+    run_forecasting(max_workers=workers, silver_layout=silver_layout, lean=lean)
+    seconds = time.perf_counter() - start
+    stats = instrumentation.summarize(instrumentation.RECORDER.take())["forecasting"]
+
+    loaded = load_silver(silver_layout=silver_layout, columns=REQUIRED_COLUMNS if lean else None)
+    if lean:
+        loaded = {ticker: compact_frame(df) for ticker, df in loaded.items()}
+    gold = {f.replace("_forecast.parquet", ""): pd.read_parquet(os.path.join("data/gold", f))
+            for f in os.listdir("data/gold")}
+    return {
+        "seconds": seconds,
+        "silver_bytes": sum(dir_bytes(d) for d, _, _ in os.walk("data") if "silver" in d),
+        "gold_bytes": dir_bytes("data/gold"),
+        "silver_memory": frames_bytes(loaded),
+        "gold_memory": frames_bytes(gold),
+        "peak_memory": stats["peak_memory_bytes"],
+    }, gold
+
+def run_isolated(frames, lean, workers, silver_layout):
+    """
+    run() in a temporary directory and a fresh process, so the peak memory of
+    one mode does not include what the other left behind.
+    """
+    with tempfile.TemporaryDirectory() as workdir, ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(_run_in, workdir, frames, lean, workers, silver_layout).result()
+
+def _run_in(workdir, frames, lean, workers, silver_layout):
+    warnings.simplefilter("ignore", RuntimeWarning)
+    os.chdir(workdir)
+    return run(frames, lean, workers, silver_layout)
+
+def check_match(full, lean, rtol):
+    """
+    Largest difference between lean and full forecast rows, relative to the
+    row's revenue: working-capital changes are small differences of large
+    balances, so their own relative error says little about the valuation.
+    """
+    worst = 0.0
+    for ticker, expected in full.items():
+        got = lean[ticker]
+        assert set(got["Type"].astype(str)) == set(expected["Type"].astype(str)), ticker
+        rows = (expected["Type"].astype(str) == "Forecast").to_numpy()
+        scale = np.maximum(np.abs(expected.loc[rows, "Total Revenue"].to_numpy(float)), 1.0)
+        for col in expected.columns.drop("Type"):
+            a = expected.loc[rows, col].to_numpy(float)
+            if col not in got.columns:
+                # Only line items the forecast does not produce may be projected away
+                assert np.isnan(a).all(), (ticker, col)
+                continue
+            b = got.loc[rows, col].to_numpy(float)
+            assert np.array_equal(np.isnan(a), np.isnan(b)), (ticker, col)
+            diff = np.abs(a - b) / scale
+            worst = max(worst, float(np.nanmax(diff, initial=0.0)))
+    assert worst <= rtol, f"lean forecasts differ by {worst:.2e} (> {rtol:.0e})"
+    return worst
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--extra-items", type=int, default=80)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--silver-layout", choices=["files", "panel"], default="files")
+    parser.add_argument("--rtol", type=float, default=1e-6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    print(f"Generating {args.tickers} synthetic tickers...")
+    frames = add_extra_items(make_silver_frames(args.tickers, seed=args.seed), args.extra_items, args.seed)
+
+    results, gold = {}, {}
+    for mode in ("full", "lean"):
+        results[mode], gold[mode] = run_isolated(frames, mode == "lean", args.workers, args.silver_layout)
+
+    worst = check_match(gold["full"], gold["lean"], args.rtol)
+    print(f"{'':16} {'full':>12} {'lean':>12}")
+    for key, label, scale in [("seconds", "forecast s", 1), ("silver_bytes", "Silver MiB", 2**20),
+                              ("gold_bytes", "Gold MiB", 2**20), ("silver_memory", "Silver mem MiB", 2**20),
+                              ("gold_memory", "Gold mem MiB", 2**20), ("peak_memory", "peak RSS MiB", 2**20)]:
+        print(f"{label:16} {results['full'][key] / scale:12.2f} {results['lean'][key] / scale:12.2f}")
+    print(f"lean forecasts match full ones within {worst:.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Latency of the valuation server vs. a cold one-shot process per request.
+
+    python -m benchmarks.bench_server --tickers 500 --requests 2000 --clients 8
+
+Writes synthetic Silver to a temporary directory, starts src/server.py on a
+free port and sends /valuation requests for random tickers and assumptions
+from concurrent clients over keep-alive connections. Reports the client-side
+p50/p99 and the server's /stats, checks the answers against the batch
+forecast and valuation functions, then times one-shot processes that read
+Silver, forecast and value a single ticker.
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+import numpy as np
+from benchmarks.synthetic import make_silver_frames
+from src import server
+from src.forecasting import Assumptions, forecast_ticker
+from src.valuation import inputs_from_gold, value_universe
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ONE_SHOT = """
+import sys, warnings
+warnings.simplefilter("ignore", RuntimeWarning)
+sys.path.insert(0, {repo!r})
+from src.forecasting import _read_silver, forecast_ticker
+from src.valuation import inputs_from_gold, value_universe
+gold = forecast_ticker(_read_silver({ticker!r}))
+print(value_universe(inputs_from_gold({{{ticker!r}: gold}}))["Value Per Share"].iloc[0])
+"""
+
+def make_requests(tickers, n_requests, seed):
+    rng = np.random.default_rng(seed)
+    horizons, growths = [3, 5, 7], [0.03, 0.05]
+    return [(str(rng.choice(tickers)), int(rng.choice(horizons)), float(rng.choice(growths)))
+            for _ in range(n_requests)]
+
+def client(port, requests, latencies, answers):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    for ticker, horizon, growth in requests:
+        start = time.perf_counter()
+        conn.request("GET", f"/valuation?ticker={ticker}&horizon={horizon}&default_growth={growth}")
+        response = conn.getresponse()
+        body = json.loads(response.read())
+        latencies.append(time.perf_counter() - start)
+        if response.status == 200:
+            answers[(ticker, horizon, growth)] = body["valuation"]["Value Per Share"]
+    conn.close()
+
+def check_answers(cache, answers):
+    worst = 0.0
+    for (ticker, horizon, growth), got in answers.items():
+        df, _ = cache.get(ticker)
+        gold = forecast_ticker(df.copy(), Assumptions(horizon, default_growth=growth))
+        expected = value_universe(inputs_from_gold({ticker: gold}))["Value Per Share"].iloc[0]
+        if np.isnan(expected):
+            assert got is None, (ticker, got)
+            continue
+        worst = max(worst, abs(got - expected) / max(abs(expected), 1.0))
+    assert worst <= 1e-12, f"server answers differ by {worst:.2e}"
+    return worst
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--one-shot", type=int, default=5, help="cold one-shot processes to time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.makedirs("data/silver")
+        print(f"Generating {args.tickers} synthetic tickers...")
+        for ticker, df in make_silver_frames(args.tickers, seed=args.seed).items():
+            df.to_parquet(f"data/silver/{ticker}.parquet")
+
+        start = time.perf_counter()
+        httpd, stop = server.start(port=0)
+        port = httpd.server_address[1]
+        print(f"Server loaded {len(httpd.service.cache.frames)} tickers in {time.perf_counter() - start:.2f}s")
+
+        tickers = sorted(httpd.service.cache.frames)
+        requests = make_requests(tickers, args.requests, args.seed)
+        latencies, answers = [], {}
+        threads = [threading.Thread(target=client, args=(port, requests[i::args.clients], latencies, answers))
+                   for i in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", "/stats")
+        stats = json.loads(conn.getresponse().read())
+        conn.close()
+        stop.set()
+        httpd.shutdown()
+        httpd.server_close()
+        worst = check_answers(httpd.service.cache, answers)
+
+        one_shot = []
+        for ticker in tickers[:args.one_shot]:
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", ONE_SHOT.format(repo=REPO_DIR, ticker=ticker)], check=True,
+                           capture_output=True)
+            one_shot.append(time.perf_counter() - start)
+        os.chdir(REPO_DIR)
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    endpoint = stats["endpoints"]["/valuation"]
+    print(f"{args.requests} requests from {args.clients} clients in {seconds:.2f}s "
+          f"({args.requests / seconds:.0f} req/s)")
+    print(f"client p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    print(f"server p50 {endpoint['p50_ms']:.2f} ms, p99 {endpoint['p99_ms']:.2f} ms, "
+          f"forecast cache {stats['forecast_cache']}")
+    print(f"cold one-shot process: median {np.median(one_shot) * 1000:.0f} ms over {len(one_shot)} runs")
+    print(f"answers match forecast_ticker + value_universe within {worst:.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Vectorized trailing-twelve-month pass vs. per-ticker rolling sums.
+
+    python -m benchmarks.bench_ttm --tickers 1000 2000 4000 --quarters 8
+
+Times ttm.trailing_panel on the quarterly Bronze rows of synthetic universes
+of growing size, so the cost per ticker-quarter shows whether it scales
+linearly, and checks it against a per-ticker pandas rolling sum.
+"""
+import argparse
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import make_universe
+from src import bronze, ttm
+
+def quarterly_long(n_tickers, n_quarters, seed):
+    universe = make_universe(n_tickers, seed=seed, n_quarters=n_quarters)
+    return pd.concat([bronze.statements_to_long(ticker, {name: df for name, df in statements.items()
+                                                         if name in bronze.QUARTERLY_NAMES})
+                      for ticker, statements in universe.items()], ignore_index=True)
+
+def per_ticker(long_df):
+    flows = long_df[long_df["statement"].isin(ttm.FLOW_STATEMENTS)
+                    & ~long_df["line_item"].isin(ttm.POINT_IN_TIME_ITEMS)]
+    out = {}
+    for ticker, group in flows.groupby("ticker"):
+        wide = group.pivot_table(index="period_end", columns="line_item", values="value", aggfunc="first")
+        span = pd.Series(wide.index, index=wide.index).diff(ttm.QUARTERS - 1).dt.days
+        sums = wide.rolling(ttm.QUARTERS).sum()
+        out[ticker] = sums[(span >= ttm.WINDOW_DAYS[0]) & (span <= ttm.WINDOW_DAYS[1])]
+    return out
+
+def check_match(reference, flows):
+    for ticker, expected in reference.items():
+        got = flows.loc[ticker].reindex(index=expected.index, columns=expected.columns)
+        np.testing.assert_allclose(got.to_numpy(float), expected.to_numpy(float), rtol=1e-9)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, nargs="+", default=[1000, 2000, 4000])
+    parser.add_argument("--quarters", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    print(f"{'tickers':>8} {'rows':>9} {'vectorized s':>13} {'us/ticker-qtr':>14} {'per-ticker s':>13}")
+    for n_tickers in args.tickers:
+        long_df = quarterly_long(n_tickers, args.quarters, args.seed)
+
+        start = time.perf_counter()
+        stocks, flows = ttm.trailing_panel(long_df)
+        vectorized_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reference = per_ticker(long_df)
+        per_ticker_s = time.perf_counter() - start
+        check_match(reference, flows)
+
+        per_cell = vectorized_s / (n_tickers * args.quarters) * 1e6
+        print(f"{n_tickers:8d} {len(long_df):9d} {vectorized_s:13.3f} {per_cell:14.2f} {per_ticker_s:13.3f}")
+
+if __name__ == "__main__":
+    main()
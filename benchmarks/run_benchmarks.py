@@ -0,0 +1,196 @@
+"""
+Times the pipeline stages on synthetic universes and appends the results to
+benchmarks/results.jsonl, tagged with the current git commit.
+
+    python -m benchmarks.run_benchmarks --sizes 10 1000 10000
+    python -m benchmarks.run_benchmarks --compare
+
+Each size runs in a fresh temporary directory, so nothing under ./data is touched.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+import warnings
+from benchmarks.synthetic import make_universe, write_bronze
+from src import instrumentation
+from src.forecasting import (
+    forecasting_income_statement, forecasting_balance_sheet, forecast_cashflow, load_silver, run_forecasting,
+)
+from src.processing import run_processing
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class PeakRSS:
+    """
+    Samples the resident set size in a background thread while the block runs.
+    """
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = _rss_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+def _files(root):
+    found = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            found[path] = os.stat(path).st_mtime_ns
+    return found
+
+def measure(name, func, write_dir="data"):
+    """
+    Runs func once and returns its wall time, peak RSS of this process (pool
+    workers are not included) and I/O counts.
+    files_read and bytes_read come from the io events the stage recorded (a
+    dataset read of the Parquet Bronze or a panel counts once); files_written
+    counts files created or modified under write_dir.
+    """
+    before = _files(write_dir)
+    mark = instrumentation.RECORDER.mark()
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        func()
+        wall_s = time.perf_counter() - start
+    after = _files(write_dir)
+    reads = [e["bytes_read"] for e in instrumentation.RECORDER.take(mark) if e["type"] == "io" and e["bytes_read"]]
+
+    return {
+        "benchmark": name,
+        "wall_s": round(wall_s, 4),
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+        "files_read": len(reads),
+        "bytes_read": sum(reads),
+        "files_written": sum(1 for path, mtime in after.items() if before.get(path) != mtime),
+    }
+
+def _time_functions(frames):
+    """
+    Times the three forecasting functions separately over every Silver frame.
+    """
+    totals = {"forecasting_income_statement": 0.0, "forecasting_balance_sheet": 0.0, "forecast_cashflow": 0.0}
+    for df in frames.values():
+        start = time.perf_counter()
+        is_forecast = forecasting_income_statement(df)
+        totals["forecasting_income_statement"] += time.perf_counter() - start
+        if is_forecast.empty:
+            continue
+        start = time.perf_counter()
+        bs_forecast = forecasting_balance_sheet(df, is_forecast)
+        totals["forecasting_balance_sheet"] += time.perf_counter() - start
+        start = time.perf_counter()
+        forecast_cashflow(df, is_forecast, bs_forecast)
+        totals["forecast_cashflow"] += time.perf_counter() - start
+    return totals
+
+def run_size(n_tickers, args):
+    rows = []
+    universe = make_universe(n_tickers, seed=args.seed, missing_rate=args.missing_rate)
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            write_bronze(universe, args.bronze_format)
+            del universe
+            os.makedirs("data/silver", exist_ok=True)
+
+            rows.append(measure("run_processing", lambda: run_processing(
+                bronze_format=args.bronze_format, max_workers=args.workers, silver_layout=args.silver_layout)))
+            rows.append(measure("run_forecasting", lambda: run_forecasting(
+                max_workers=args.workers, silver_layout=args.silver_layout)))
+
+            frames = load_silver(silver_layout=args.silver_layout)
+            for name, seconds in _time_functions(frames).items():
+                rows.append({"benchmark": name, "wall_s": round(seconds, 4)})
+        finally:
+            os.chdir(cwd)
+
+    for row in rows:
+        row.update({"tickers": n_tickers, "workers": args.workers,
+                    "bronze_format": args.bronze_format, "silver_layout": args.silver_layout})
+    return rows
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(path=RESULTS_PATH):
+    """
+    Prints the wall time of every benchmark for the last two recorded commits.
+    """
+    if not os.path.exists(path):
+        print("No results recorded yet.")
+        return
+    with open(path) as f:
+        results = [json.loads(line) for line in f if line.strip()]
+
+    commits = list(dict.fromkeys(r["commit"] for r in results))[-2:]
+    latest = {}
+    for r in results:
+        key = (r["benchmark"], r["tickers"], r["workers"], r["bronze_format"], r["silver_layout"])
+        latest.setdefault(r["commit"], {})[key] = r["wall_s"]
+
+    print(f"{'benchmark':32} {'tickers':>8} " + " ".join(f"{c:>12}" for c in commits))
+    for key in sorted({k for c in commits for k in latest[c]}):
+        times = " ".join(f"{latest[c].get(key, float('nan')):12.4f}" for c in commits)
+        print(f"{key[0]:32} {key[1]:>8} {times}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--bronze-format", choices=["json", "parquet"], default="json")
+    parser.add_argument("--silver-layout", choices=["files", "panel"], default="files")
+    parser.add_argument("--missing-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", action="store_true", help="compare the last two recorded commits")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare()
+        return
+
+    warnings.simplefilter("ignore", RuntimeWarning)
+    commit = git_commit()
+    recorded_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+    with open(RESULTS_PATH, "a") as out:
+        for n_tickers in args.sizes:
+            for row in run_size(n_tickers, args):
+                row.update({"commit": commit, "recorded_at": recorded_at})
+                out.write(json.dumps(row) + "\n")
+                print(json.dumps(row))
+
+if __name__ == "__main__":
+    main()
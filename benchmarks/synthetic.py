@@ -0,0 +1,130 @@
+import pandas as pd
+import numpy as np
+from src import bronze
+from src.processing import process_ticker
+
+# yfinance line items per statement, as (name, share of revenue)
+BALANCE_SHEET_ITEMS = [
+    ("Current Assets", 0.45),
+    ("Cash Cash Equivalents And Short Term Investments", 0.15),
+    ("Accounts Receivable", 0.12),
+    ("Inventory", 0.10),
+    ("Total Non Current Assets", 0.90),
+    ("Net PPE", 0.40),
+    ("Goodwill And Other Intangible Assets", 0.25),
+    ("Current Liabilities", 0.35),
+    ("Accounts Payable", 0.09),
+    ("Current Debt And Capital Lease Obligation", 0.05),
+    ("Total Non Current Liabilities Net Minority Interest", 0.50),
+    ("Long Term Debt And Capital Lease Obligation", 0.35),
+    ("Total Equity Gross Minority Interest", 0.50),
+]
+INCOME_STATEMENT_ITEMS = [
+    ("Total Revenue", 1.0),
+    ("Cost Of Revenue", 0.55),
+    ("Operating Expense", 0.20),
+    ("Reconciled Depreciation", 0.05),
+    ("Net Interest Income", -0.01),
+    ("Other Income Expense", 0.005),
+    ("Pretax Income", 0.19),
+    ("Tax Provision", 0.04),
+    ("Net Income", 0.15),
+]
+CASHFLOW_ITEMS = [
+    ("Operating Cash Flow", 0.18),
+    ("Capital Expenditure", -0.06),
+    ("Free Cash Flow", 0.12),
+    ("Depreciation And Amortization", 0.05),
+]
+STATEMENT_ITEMS = {
+    "balance_sheet": BALANCE_SHEET_ITEMS,
+    "income_statement": INCOME_STATEMENT_ITEMS,
+    "cashflow": CASHFLOW_ITEMS,
+}
+ALWAYS_PRESENT = {"Total Revenue"}
+
+def make_statements(rng, n_years=4, missing_rate=0.05, last_year=2024, drop_items=(), n_quarters=0):
+    """
+    Generates one ticker's statements shaped like yfinance output:
+    line items as rows, fiscal year ends as columns (newest first).
+    Each line item except revenue is dropped with probability missing_rate;
+    line items in drop_items are always dropped.
+    n_quarters adds quarterly_* statements for the quarters ending three
+    quarters after the last fiscal year.
+    """
+    dates = [pd.Timestamp(f"{last_year - i}-12-31") for i in range(n_years)]
+    base = rng.lognormal(mean=8, sigma=2)
+    growth = rng.normal(0.06, 0.08, n_years)
+    revenue = base * np.exp(np.cumsum(growth))[::-1]
+
+    statements = {}
+    for name, items in STATEMENT_ITEMS.items():
+        rows = {}
+        for item, share in items:
+            if item not in ALWAYS_PRESENT and (rng.random() < missing_rate or item in drop_items):
+                continue
+            noise = rng.normal(1.0, 0.1, n_years)
+            rows[item] = revenue * share * noise
+        df = pd.DataFrame(rows, index=dates).T
+        if name == "income_statement" and "Tax Provision" in rows:
+            df.loc["Tax Rate For Calcs"] = 0.21
+        if name == "balance_sheet":
+            df.loc["Ordinary Shares Number"] = np.round(base / rng.uniform(5, 50))
+        statements[name] = df
+    if n_quarters:
+        statements.update(make_quarterly_statements(rng, revenue[0], base, n_quarters, last_year))
+    return statements
+
+def make_quarterly_statements(rng, annual_revenue, base, n_quarters, last_year=2024):
+    """
+    quarterly_* statements growing from a quarter of annual_revenue; flows are
+    per quarter, balance sheet items scale with the annualized revenue.
+    """
+    dates = pd.date_range(end=f"{last_year + 1}-09-30", periods=n_quarters, freq="QE")[::-1]
+    revenue = annual_revenue / 4 * np.exp(np.cumsum(rng.normal(0.015, 0.03, n_quarters)))[::-1]
+
+    statements = {}
+    for name, items in STATEMENT_ITEMS.items():
+        scale = revenue * 4 if name == "balance_sheet" else revenue
+        rows = {item: scale * share * rng.normal(1.0, 0.1, n_quarters) for item, share in items}
+        df = pd.DataFrame(rows, index=dates).T
+        if name == "income_statement":
+            df.loc["Tax Rate For Calcs"] = 0.21
+        if name == "balance_sheet":
+            df.loc["Ordinary Shares Number"] = np.round(base / rng.uniform(5, 50))
+        statements[f"quarterly_{name}"] = df
+    return statements
+
+def make_universe(n_tickers, seed=0, n_years=4, missing_rate=0.05, drop_items=(), n_quarters=0):
+    """
+    Returns {ticker: statements} for a synthetic universe; the same seed always
+    yields the same universe.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        f"SYN{i:05d}": make_statements(rng, n_years=n_years, missing_rate=missing_rate, drop_items=drop_items,
+                                       n_quarters=n_quarters)
+        for i in range(n_tickers)
+    }
+
+def write_bronze(universe, bronze_format="json", batch_size=500):
+    """
+    Writes a synthetic universe to data/bronze exactly as run_ingestion would.
+    """
+    if bronze_format == "parquet":
+        tickers = sorted(universe)
+        for i in range(0, len(tickers), batch_size):
+            bronze.write_parquet_batch({t: universe[t] for t in tickers[i:i + batch_size]})
+        return
+    for ticker, statements in universe.items():
+        bronze.write_json(ticker, statements)
+
+def to_silver(statements):
+    """
+    Silver frame of one ticker, as run_processing would build it from Bronze.
+    """
+    return process_ticker([df.T for name, df in statements.items()
+                           if name in bronze.STATEMENT_NAMES and not df.empty])
+
+def make_silver_frames(n_tickers, seed=0, n_years=4, missing_rate=0.05):
+    return {ticker: to_silver(s) for ticker, s in make_universe(n_tickers, seed, n_years, missing_rate).items()}
@@ -1,27 +1,459 @@
+import argparse
 import os
-from src.ingestion import run_ingestion
-from src.processing import run_processing
-from src.forecasting import run_forecasting
+import re
+import sys
+from functools import partial
+from src import instrumentation
+
+# Stage modules are imported inside the commands that need them, so e.g.
+# `python main.py forecast` never loads yfinance.
 
 TICKERS = ['GOOG', 'SOPH', 'PYPL', 'NOV', 'AMZN', 'NVDA', 'TGT']
+INGESTION_WORKERS = 4
+REQUESTS_PER_SECOND = 2
+STATEMENT_SOURCE = None  # or the URL of a stand-in statement server (see ingestion.fetch_http)
+BRONZE_FORMAT = "json"  # or "parquet"
+BRONZE_SNAPSHOTS = False  # also keep deduplicated, time-travel Bronze snapshots
+SILVER_LAYOUT = "files"  # or "panel"
+GOLD_PANEL = False  # also keep the consolidated, queryable Gold dataset
+STAGE_WORKERS = os.cpu_count() or 1
+METRICS_DIR = instrumentation.METRICS_DIR
+COMMANDS = [
+    "ingest", "snapshots", "process", "forecast", "scenarios", "value", "montecarlo", "backtest",
+    "check", "screen", "serve", "all",
+]
 
-def main():
-    print("Starting Data Pipeline...")
-    
-    # Ensure directories exist
-    os.makedirs('data/bronze', exist_ok=True)
-    os.makedirs('data/silver', exist_ok=True)
-    os.makedirs('data/gold', exist_ok=True)
+def report(result):
+    """
+    Prints the per-ticker errors collected by a stage, and the secondary
+    outputs that failed for tickers that otherwise completed.
+    """
+    if result is None:
+        return
+    for ticker, message in result.errors.items():
+        print(f"Error in {result.stage} for {ticker}: {message}")
+    for ticker, message in result.incomplete.items():
+        print(f"Incomplete {result.stage} for {ticker}: {message}")
+
+def export_metrics():
+    """
+    Writes the metrics of this run and prints the time and I/O of every stage.
+    """
+    print("\n--- Metrics ---")
+    for stage, stats in instrumentation.export(METRICS_DIR).items():
+        print(f"{stage}: {stats['stage_seconds']:.2f}s, {stats['tickers_timed']} tickers timed, "
+              f"{stats['bytes_read']} bytes read, {stats['bytes_written']} bytes written, "
+              f"peak memory {stats['peak_memory_bytes'] / 2**20:.0f} MiB")
+    print(f"Metrics written to {METRICS_DIR}")
+
+def read_tickers(args, default=None):
+    """
+    Tickers from the command line and/or --tickers-file (one per line or
+    comma-separated, # starts a comment), in order and without duplicates.
+    Falls back to default when neither is given.
+    """
+    tickers = list(args.tickers or [])
+    if args.tickers_file:
+        with open(args.tickers_file) as f:
+            for line in f:
+                tickers.extend(line.split("#", 1)[0].replace(",", " ").split())
+    if not tickers:
+        return default
+    return list(dict.fromkeys(t.upper() for t in tickers))
+
+def _select(hashes, tickers):
+    if tickers is None:
+        return hashes
+    return {ticker: hashes[ticker] for ticker in tickers if ticker in hashes}
+
+def ingest(args):
+    from src.ingestion import fetch_http, fetch_yahoo, run_ingestion
 
     print("\n--- Bronze Layer: Ingestion ---")
-    run_ingestion(TICKERS)
+    fetcher = partial(fetch_http, base_url=STATEMENT_SOURCE) if STATEMENT_SOURCE else fetch_yahoo
+    run_ingestion(read_tickers(args, TICKERS), max_workers=INGESTION_WORKERS,
+                  requests_per_second=REQUESTS_PER_SECOND, fetcher=fetcher, bronze_format=BRONZE_FORMAT,
+                  quarterly=args.quarterly, resume=args.resume, snapshot=BRONZE_SNAPSHOTS)
+
+def list_snapshots(args):
+    """
+    Prints the Bronze snapshot index, or the statement changes of the given tickers.
+    """
+    from src import snapshots
+
+    print("\n--- Bronze Snapshots ---")
+    tickers = read_tickers(args)
+    table = snapshots.list_snapshots() if tickers is None else snapshots.history(tickers=tickers)
+    print(table.to_string(index=False))
+
+def process(args):
+    """
+    Builds Silver; with --incremental only for tickers whose Bronze inputs or
+    stage version changed since the run recorded in the manifest.
+    --as-of rebuilds it from a past Bronze snapshot.
+    """
+    from src import processing, silver_store
+    from src.manifest import Manifest, bronze_hashes, code_version, run_incremental
 
     print("\n--- Silver Layer: Processing ---")
-    run_processing()
+    tickers = read_tickers(args)
+    run = lambda selected: processing.run_processing(bronze_format=BRONZE_FORMAT, max_workers=args.workers,
+                                                     tickers=selected, silver_layout=SILVER_LAYOUT, lean=args.lean,
+                                                     quarterly=args.quarterly, as_of=args.as_of)
+    if not args.incremental:
+        report(run(tickers))
+        return
+
+    if SILVER_LAYOUT == "panel":
+        panel_tickers = set(silver_store.list_panel_tickers())
+        silver_exists = lambda ticker: ticker in panel_tickers
+    else:
+        silver_exists = lambda ticker: os.path.exists(os.path.join(processing.SILVER_DIR, f"{ticker}.parquet"))
+
+    version = code_version(
+        processing.CODE_MODULES,
+        {"bronze_format": BRONZE_FORMAT, "silver_layout": SILVER_LAYOUT, "lean": args.lean,
+         "quarterly": args.quarterly},
+    )
+    hashes = _select(bronze_hashes(BRONZE_FORMAT, args.as_of), tickers)
+    report(run_incremental(Manifest(), "processing", hashes, version, run, args.force, silver_exists))
+
+def forecast(args):
+    """
+    Builds Gold; with --incremental only for tickers whose Silver data or
+    stage version changed. --quarterly forecasts from the TTM base.
+    """
+    from src import forecasting, processing, silver_store
+    from src.manifest import Manifest, code_version, digest, run_incremental, silver_hashes
 
     print("\n--- Gold Layer: Forecasting ---")
-    run_forecasting()
+    tickers = read_tickers(args)
+    assumptions = forecasting.Assumptions(args.horizon, args.lookback, args.tax_rate, args.default_growth)
+    run = lambda selected: forecasting.run_forecasting(max_workers=args.workers, tickers=selected,
+                                                       silver_layout=SILVER_LAYOUT, assumptions=assumptions,
+                                                       gold_panel=GOLD_PANEL, lean=args.lean, ttm=args.quarterly,
+                                                       cache=args.cache)
+    if not args.incremental:
+        report(run(tickers))
+        return
+
+    version = code_version(
+        forecasting.CODE_MODULES,
+        {"assumptions": assumptions.key(), "silver_layout": SILVER_LAYOUT, "gold_panel": GOLD_PANEL,
+         "lean": args.lean, "ttm": args.quarterly},
+    )
+    gold_exists = lambda ticker: os.path.exists(os.path.join(forecasting.GOLD_DIR, f"{ticker}_forecast.parquet"))
+    hashes = silver_hashes(processing.SILVER_DIR, SILVER_LAYOUT)
+    if args.quarterly:
+        ttm = silver_hashes(processing.SILVER_TTM_DIR, SILVER_LAYOUT, silver_store.TTM_PANEL_DIR)
+        hashes = {ticker: digest(h, ttm.get(ticker, "")) for ticker, h in hashes.items()}
+    hashes = _select(hashes, tickers)
+    report(run_incremental(Manifest(), "forecasting", hashes, version, run, args.force, gold_exists))
+
+def value(args):
+    from src.valuation import run_valuation
+
+    print("\n--- Valuation ---")
+    run_valuation(tickers=read_tickers(args))
+
+# Drivers of monte_carlo.DISTRIBUTIONS and the parameter count of each distribution
+MONTE_CARLO_DRIVERS = ["revenue_growth", "cost_ratio", "opex_ratio", "tax_rate", "working_capital_days",
+                       "discount_rate"]
+DISTRIBUTION_PARAMETERS = {"normal": 1, "scale": 1, "uniform": 2, "fixed": 0}
+
+def parse_distribution(text):
+    """
+    "revenue_growth=uniform:-0.02,0.04" -> ("revenue_growth", ("uniform", -0.02, 0.04))
+    """
+    driver, _, spec = text.partition("=")
+    kind, _, parameters = spec.partition(":")
+    driver, kind = driver.strip(), kind.strip()
+    if driver not in MONTE_CARLO_DRIVERS:
+        raise argparse.ArgumentTypeError(f"unknown driver {driver!r}, expected one of {', '.join(MONTE_CARLO_DRIVERS)}")
+    if kind not in DISTRIBUTION_PARAMETERS:
+        raise argparse.ArgumentTypeError(f"unknown distribution {kind!r}, expected one of "
+                                         f"{', '.join(DISTRIBUTION_PARAMETERS)}")
+    try:
+        values = [float(p) for p in filter(None, parameters.split(","))]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid parameter in {text!r}") from None
+    if len(values) != DISTRIBUTION_PARAMETERS[kind]:
+        raise argparse.ArgumentTypeError(f"{kind} takes {DISTRIBUTION_PARAMETERS[kind]} parameters, got {text!r}")
+    return driver, (kind, *values)
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {text!r}")
+    return value
+
+def montecarlo(args):
+    """
+    Simulates equity-value percentiles of every Silver ticker by sampling its forecast drivers.
+    """
+    import pandas as pd
+    from src import valuation
+    from src.monte_carlo import run_monte_carlo
+
+    print("\n--- Monte Carlo Valuation ---")
+    result = run_monte_carlo(
+        n_paths=args.paths, chunk_size=args.chunk_size, seed=args.seed, distributions=dict(args.distribution or []),
+        wacc=valuation.WACC if args.wacc is None else args.wacc,
+        terminal_growth=valuation.TERMINAL_GROWTH if args.terminal_growth is None else args.terminal_growth,
+        tickers=read_tickers(args), silver_layout=SILVER_LAYOUT,
+    )
+    if result is not None:
+        with pd.option_context("display.width", 200, "display.max_columns", None):
+            print(result)
+
+def backtest(args):
+    from src.backtest import run_backtest
+
+    print("\n--- Backtest ---")
+    run_backtest(tickers=read_tickers(args), silver_layout=SILVER_LAYOUT, horizon=args.horizon,
+                 lookback_years=args.lookback, tax_rate=args.tax_rate, default_growth=args.default_growth)
+
+# --scenario keys -> Assumptions fields
+SCENARIO_FIELDS = {"horizon": ("forecast_years", int), "lookback": ("lookback_years", int),
+                   "tax_rate": ("tax_rate", float), "default_growth": ("default_growth", float)}
+
+def parse_scenario(text):
+    """
+    "bull:default_growth=0.08,horizon=7" -> ("bull", {"default_growth": 0.08, "forecast_years": 7})
+    """
+    name, _, settings = text.partition(":")
+    overrides = {}
+    for setting in filter(None, settings.split(",")):
+        key, _, value = setting.partition("=")
+        if key.strip() not in SCENARIO_FIELDS:
+            raise argparse.ArgumentTypeError(f"unknown scenario setting {key!r}, expected one of "
+                                             f"{', '.join(SCENARIO_FIELDS)}")
+        field, convert = SCENARIO_FIELDS[key.strip()]
+        try:
+            overrides[field] = convert(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid value in scenario setting {setting!r}") from None
+    if not name.strip():
+        raise argparse.ArgumentTypeError(f"expected 'NAME[:KEY=VALUE,...]', got {text!r}")
+    return name.strip(), overrides
+
+def scenarios(args):
+    """
+    Forecasts Silver under named scenarios, each the assumption flags plus its
+    own overrides, reusing cached per-ticker forecasts.
+    """
+    from dataclasses import replace
+    from src.forecasting import Assumptions
+    from src.scenarios import run_scenarios
+
+    print("\n--- Scenarios ---")
+    base = Assumptions(args.horizon, args.lookback, args.tax_rate, args.default_growth)
+    named = {name: replace(base, **overrides) for name, overrides in args.scenario or [("base", {})]}
+    run_scenarios(named, tickers=read_tickers(args), silver_layout=SILVER_LAYOUT)
+
+def check(args):
+    """
+    Checks the balance sheet identity, cash roll-forward and *_agg residuals in Gold.
+    """
+    from src.integrity import run_integrity
+
+    print("\n--- Data Quality ---")
+    run_integrity(tickers=read_tickers(args))
+
+def parse_condition(text):
+    """
+    "UFCF Margin > 0.1" -> ("UFCF Margin", ">", 0.1)
+    """
+    match = re.fullmatch(r"\s*(.+?)\s*(==|!=|<=|>=|<|>)\s*(\S+)\s*", text)
+    if match is None:
+        raise argparse.ArgumentTypeError(f"expected 'COLUMN OP VALUE', got {text!r}")
+    column, op, value = match.groups()
+    return column, op, float(value)
+
+def screen(args):
+    """
+    Ranks tickers in the consolidated Gold dataset by a metric.
+    """
+    import pandas as pd
+    from src import gold_store
+
+    print("\n--- Screen ---")
+    gold_store.refresh()
+    result = gold_store.top_k(args.by, args.top, year=args.year, ascending=args.ascending,
+                              filters=args.where, tickers=read_tickers(args))
+    with pd.option_context("display.width", 200, "display.max_rows", args.top):
+        print(result)
+
+def serve(args):
+    """
+    Serves forecasts and valuations of single tickers from Silver held in memory.
+    """
+    from src.server import run_server
+
+    print("\n--- Valuation Server ---")
+    run_server(args.host, args.port, silver_layout=SILVER_LAYOUT, lean=args.lean, reload_interval=args.reload_interval,
+               tickers=read_tickers(args))
+
+# Flags of `all` that the streaming pipeline does not implement
+STREAMING_UNSUPPORTED = ["incremental", "force", "lean", "quarterly"]
+
+def run_all(args):
+    if args.streaming:
+        from src.forecasting import Assumptions
+        from src.ingestion import fetch_http, fetch_yahoo
+        from src.streaming import run_streaming
+
+        print("\n--- Streaming: Bronze -> Silver -> Gold -> Valuation ---")
+        fetcher = partial(fetch_http, base_url=STATEMENT_SOURCE) if STATEMENT_SOURCE else fetch_yahoo
+        run = run_streaming(read_tickers(args, TICKERS), fetch_workers=INGESTION_WORKERS,
+                            requests_per_second=REQUESTS_PER_SECOND, fetcher=fetcher, bronze_format=BRONZE_FORMAT,
+                            silver_layout=SILVER_LAYOUT,
+                            assumptions=Assumptions(args.horizon, args.lookback, args.tax_rate, args.default_growth),
+                            resume=args.resume, snapshot=BRONZE_SNAPSHOTS)
+        for result in run.results.values():
+            report(result)
+        return
+
+    ingest(args)
+    process(args)
+    forecast(args)
+    check(args)
+    value(args)
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("tickers", nargs="*", metavar="TICKER",
+                        help="tickers to run (default: every ticker in the stage's input; "
+                             "ingest uses the configured TICKERS)")
+    common.add_argument("--tickers-file", metavar="PATH", help="file with one ticker per line")
+    common.add_argument("--workers", type=int, default=STAGE_WORKERS,
+                        help="processes for processing and forecasting (default: CPU count)")
+    common.add_argument("--profile-ticker", metavar="TICKER",
+                        help=f"write a cProfile dump of every stage for this ticker to {METRICS_DIR}")
+
+    incremental = argparse.ArgumentParser(add_help=False)
+    incremental.add_argument("--incremental", action="store_true",
+                             help="only rebuild tickers whose inputs or code changed")
+    incremental.add_argument("--force", action="store_true",
+                             help="with --incremental, rebuild every ticker regardless of the manifest")
+    incremental.add_argument("--lean", action="store_true",
+                             help="compact dtypes, and only the line items the forecast needs")
+
+    resume = argparse.ArgumentParser(add_help=False)
+    resume.add_argument("--resume", action="store_true",
+                        help="continue an interrupted ingestion: skip tickers the journal marks done or quarantined")
+
+    quarterly = argparse.ArgumentParser(add_help=False)
+    quarterly.add_argument("--quarterly", action="store_true",
+                           help="also fetch quarterly statements, build trailing-twelve-month Silver "
+                                "and forecast from the TTM base")
+
+    # Defaults mirror forecasting.Assumptions, which is not imported here to keep startup light
+    assumptions = argparse.ArgumentParser(add_help=False)
+    assumptions.add_argument("--horizon", type=int, default=5, help="forecast years (default: 5)")
+    assumptions.add_argument("--lookback", type=int, default=3,
+                             help="years averaged for the historical ratios (default: 3)")
+    assumptions.add_argument("--tax-rate", type=float, help="override the historical tax rate")
+    assumptions.add_argument("--default-growth", type=float, default=0.05,
+                             help="revenue growth when no CAGR can be computed (default: 0.05)")
+
+    parser = argparse.ArgumentParser(description="Yahoo DCF valuation pipeline. Runs `all` when no command is given.")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.add_parser("ingest", parents=[common, quarterly, resume],
+                        help="fetch statements into Bronze").set_defaults(func=ingest)
+    commands.add_parser("snapshots", parents=[common],
+                        help="list the Bronze snapshots (with tickers: their statement changes)"
+                        ).set_defaults(func=list_snapshots)
+    process_parser = commands.add_parser("process", parents=[common, incremental, quarterly],
+                                         help="build Silver from Bronze")
+    process_parser.add_argument("--as-of", metavar="SNAPSHOT_OR_DATE",
+                                help="rebuild Silver from the Bronze snapshot with this id, or as of this "
+                                     "date/time (see `snapshots`)")
+    process_parser.set_defaults(func=process)
+    forecast_parser = commands.add_parser("forecast", parents=[common, incremental, quarterly, assumptions],
+                                          help="build Gold forecasts from Silver")
+    forecast_parser.add_argument("--cache", action="store_true",
+                                 help="reuse cached forecasts of tickers whose Silver and assumptions are unchanged")
+    forecast_parser.set_defaults(func=forecast)
+    scenarios_parser = commands.add_parser("scenarios", parents=[common, assumptions],
+                                           help="forecast Silver under named assumption scenarios")
+    scenarios_parser.add_argument("--scenario", type=parse_scenario, action="append",
+                                  metavar="NAME[:KEY=VALUE,...]",
+                                  help="a scenario: the assumption flags with overrides of horizon, lookback, "
+                                       "tax_rate or default_growth, e.g. bull:default_growth=0.08 (repeatable; "
+                                       "default: one scenario named base)")
+    scenarios_parser.set_defaults(func=scenarios)
+    commands.add_parser("value", parents=[common], help="value the Gold forecasts").set_defaults(func=value)
+    montecarlo_parser = commands.add_parser("montecarlo", parents=[common],
+                                            help="simulate equity-value percentiles by sampling the forecast drivers")
+    montecarlo_parser.add_argument("--paths", type=positive_int, default=100_000,
+                                   help="simulated paths per ticker (default: 100000)")
+    montecarlo_parser.add_argument("--seed", type=int, default=0,
+                                   help="random seed; runs with the same seed and chunk size match (default: 0)")
+    montecarlo_parser.add_argument("--chunk-size", type=positive_int, default=10_000,
+                                   help="paths simulated at once, bounding memory (default: 10000)")
+    montecarlo_parser.add_argument("--distribution", type=parse_distribution, action="append",
+                                   metavar="DRIVER=KIND[:P1[,P2]]",
+                                   help="distribution of a driver around its deterministic value, e.g. "
+                                        "revenue_growth=normal:0.05 or tax_rate=fixed; kinds: normal:SD, scale:SD, "
+                                        "uniform:LOW,HIGH, fixed (repeatable; default: monte_carlo.DISTRIBUTIONS)")
+    montecarlo_parser.add_argument("--wacc", type=float, help="mean discount rate (default: valuation.WACC)")
+    montecarlo_parser.add_argument("--terminal-growth", type=float,
+                                   help="terminal growth rate (default: valuation.TERMINAL_GROWTH)")
+    montecarlo_parser.set_defaults(func=montecarlo)
+    commands.add_parser("backtest", parents=[common, assumptions],
+                        help="backtest the forecast against realized Silver values").set_defaults(func=backtest)
+    commands.add_parser("check", parents=[common],
+                        help="check accounting identities in Gold and report violations").set_defaults(func=check)
+    screen_parser = commands.add_parser("screen", parents=[common],
+                                        help="rank tickers in the consolidated Gold dataset")
+    screen_parser.add_argument("--by", default="UFCF Margin",
+                               help='Gold column or screening metric to rank by (default: "UFCF Margin")')
+    screen_parser.add_argument("--year", type=int, help="forecast year to rank (default: any row)")
+    screen_parser.add_argument("--top", type=int, default=50, help="number of results (default: 50)")
+    screen_parser.add_argument("--ascending", action="store_true", help="lowest values first")
+    screen_parser.add_argument("--where", type=parse_condition, action="append",
+                               help='condition such as "Total Revenue > 1e9" (repeatable)')
+    screen_parser.set_defaults(func=screen)
+    serve_parser = commands.add_parser("serve", parents=[common],
+                                       help="serve forecasts and valuations over HTTP from Silver kept in memory")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    serve_parser.add_argument("--reload-interval", type=float, default=2.0,
+                              help="seconds between checks for changed Silver files (default: 2)")
+    serve_parser.add_argument("--lean", action="store_true",
+                              help="keep only the line items the forecast needs, with compact dtypes")
+    serve_parser.set_defaults(func=serve)
+    all_parser = commands.add_parser("all", parents=[common, incremental, quarterly, resume, assumptions],
+                                     help="run every stage")
+    all_parser.add_argument("--streaming", action="store_true",
+                            help="move each ticker through all stages as soon as it is fetched")
+    all_parser.set_defaults(func=run_all, as_of=None, cache=False)
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv = ["all"] + argv
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "all" and args.streaming:
+        unsupported = [f"--{name}" for name in STREAMING_UNSUPPORTED if getattr(args, name)]
+        if unsupported:
+            parser.error(f"all --streaming does not support {', '.join(unsupported)}")
+    instrumentation.set_profile_ticker(args.profile_ticker)
+
+    print("Starting Data Pipeline...")
+
+    # Ensure directories exist
+    os.makedirs('data/bronze', exist_ok=True)
+    os.makedirs('data/silver', exist_ok=True)
+    os.makedirs('data/gold', exist_ok=True)
+    os.makedirs('data/valuation', exist_ok=True)
+
+    args.func(args)
 
+    export_metrics()
     print("\nPipeline Completed Successfully.")
 
 if __name__ == "__main__":
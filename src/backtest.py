@@ -0,0 +1,172 @@
+import pandas as pd
+import numpy as np
+import os
+from dataclasses import dataclass
+from src.batch_forecasting import (
+    BS_COLUMNS, HISTORY_ITEMS, IS_COLUMNS, ITEM_INDEX, REVENUE, build_history_panel, drivers_from_history, project,
+)
+from src import instrumentation
+from src.forecasting import DEFAULT_GROWTH, LOOKBACK_YEARS, load_silver
+
+BACKTEST_DIR = "data/backtest"
+HORIZON = 5
+MIN_HISTORY = 2
+
+# Forecast line items that also exist in the Silver history, so they can be compared with realized values
+EVALUATED_ITEMS = [col for col in IS_COLUMNS + BS_COLUMNS if col in ITEM_INDEX]
+
+@dataclass
+class BacktestReport:
+    """
+    errors has one row per (ticker, cut-off, horizon, line item) with the
+    forecast and realized value; by_item and by_ticker aggregate it.
+    """
+    errors: pd.DataFrame
+    by_item: pd.DataFrame
+    by_ticker: pd.DataFrame
+
+def rolling_sums(values, lookback_years=LOOKBACK_YEARS):
+    """
+    nansum over the lookback_years periods ending at every period, for every
+    ticker and line item at once: (tickers x periods x items).
+    One cumulative sum serves all cut-offs.
+    """
+    cumulative = np.cumsum(np.nan_to_num(values, nan=0.0), axis=1)
+    sums = cumulative.copy()
+    sums[:, lookback_years:] -= cumulative[:, :-lookback_years]
+    return sums
+
+def rolling_cagr(series, periods=4, fallback=DEFAULT_GROWTH):
+    """
+    batch_cagr of every row truncated at every period: (tickers x periods).
+    Valid values are ranked once; every cut-off then looks up its start and
+    end value by rank instead of re-scanning the history.
+    """
+    valid = ~np.isnan(series)
+    n_valid = np.cumsum(valid, axis=1)
+    by_rank = np.full(series.shape, np.nan)
+    rows, cols = np.nonzero(valid)
+    by_rank[rows, n_valid[rows, cols] - 1] = series[rows, cols]
+
+    start_rank = np.maximum(0, n_valid - 1 - periods)
+    end_val = np.take_along_axis(by_rank, np.maximum(n_valid - 1, 0), axis=1)
+    start_val = np.take_along_axis(by_rank, start_rank, axis=1)
+    num_years = n_valid - 1 - start_rank
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = (end_val / start_val) ** (1 / num_years) - 1
+
+    undefined = (n_valid < 2) | (start_val == 0) | (num_years == 0) | (start_val < 0)
+    return np.where(undefined, fallback, cagr)
+
+def _cutoff_dates(last_dates, years_back):
+    dates = np.empty(len(years_back), dtype="datetime64[ns]")
+    for k in np.unique(years_back):
+        mask = years_back == k
+        dates[mask] = (last_dates[mask] - pd.DateOffset(years=int(k))).to_numpy()
+    return dates
+
+def backtest(panel, horizon=HORIZON, lookback_years=LOOKBACK_YEARS, tax_rate=None,
+             default_growth=DEFAULT_GROWTH, min_history=MIN_HISTORY):
+    """
+    Walk-forward backtest: re-runs the forecast at every historical cut-off of
+    every ticker with at least min_history periods up to the cut-off, and pairs
+    each forecast year with the realized value. Equivalent to forecasting every
+    truncated history separately, but the look-back sums and CAGRs of all
+    cut-offs come from rolling computations and all (ticker, cut-off) rows
+    are projected in one vectorized pass.
+    Returns the long error frame (see BacktestReport.errors).
+    """
+    n_tickers, n_periods, _ = panel.values.shape
+    horizon = min(horizon, n_periods - 1)
+    if horizon < 1:
+        return pd.DataFrame(columns=["Ticker", "Cutoff", "Horizon", "Item", "Forecast", "Actual"])
+
+    # Cut-offs are period positions; periods are right-aligned, so position c is
+    # n_periods - 1 - c years before each ticker's latest period
+    first = np.argmax(np.isfinite(panel.values).any(axis=2), axis=1)
+    cutoffs = np.arange(n_periods - 1)
+    usable = (cutoffs[None, :] - first[:, None] + 1 >= min_history) & panel.has(REVENUE)[:, None]
+    rows, cuts = np.nonzero(usable)
+
+    growth = rolling_cagr(panel.item(REVENUE), fallback=default_growth)[rows, cuts]
+    sums = rolling_sums(panel.values, lookback_years)[rows, cuts]
+    drivers = drivers_from_history(sums, panel.values[rows, cuts], panel.present[rows], growth, tax_rate)
+    inc, bs, _ = project(drivers, horizon)
+
+    target = cuts[:, None] + np.arange(1, horizon + 1)[None, :]
+    realized = target < n_periods
+    target = np.minimum(target, n_periods - 1)
+    horizons = np.broadcast_to(np.arange(1, horizon + 1), target.shape)
+
+    parts = {"row": [], "Horizon": [], "Item": [], "Forecast": [], "Actual": []}
+    for item in EVALUATED_ITEMS:
+        forecast = inc[item] if item in inc else bs[item]
+        actual = panel.values[rows[:, None], target, ITEM_INDEX[item]]
+        keep = realized & np.isfinite(actual)
+        r = np.nonzero(keep)[0]
+        parts["row"].append(r)
+        parts["Horizon"].append(horizons[keep])
+        parts["Item"].append(np.full(len(r), item, dtype=object))
+        parts["Forecast"].append(forecast[keep])
+        parts["Actual"].append(actual[keep])
+
+    row = np.concatenate(parts["row"])
+    tickers = np.array(panel.tickers, dtype=object)
+    cutoff_dates = _cutoff_dates(panel.last_dates[rows], n_periods - 1 - cuts)
+    return pd.DataFrame({
+        "Ticker": tickers[rows[row]],
+        "Cutoff": cutoff_dates[row],
+        "Horizon": np.concatenate(parts["Horizon"]),
+        "Item": pd.Categorical(np.concatenate(parts["Item"]), categories=EVALUATED_ITEMS),
+        "Forecast": np.concatenate(parts["Forecast"]),
+        "Actual": np.concatenate(parts["Actual"]),
+    })
+
+def error_metrics(errors, by):
+    """
+    Aggregates backtest errors by the given columns: observations, MAPE and
+    median absolute percentage error, bias (mean signed percentage error) and
+    RMSE. Percentage errors skip realized values of zero.
+    """
+    error = errors["Forecast"] - errors["Actual"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = (error / errors["Actual"].abs()).where(errors["Actual"] != 0)
+    grouped = pd.DataFrame({"PE": pct, "APE": pct.abs(), "SE": error ** 2}).groupby(
+        [errors[col] for col in by], observed=True)
+    return pd.DataFrame({
+        "Observations": grouped.size(),
+        "MAPE": grouped["APE"].mean(),
+        "Median APE": grouped["APE"].median(),
+        "Bias": grouped["PE"].mean(),
+        "RMSE": np.sqrt(grouped["SE"].mean()),
+    })
+
+def run_backtest(tickers=None, silver_layout="files", horizon=HORIZON, lookback_years=LOOKBACK_YEARS,
+                 tax_rate=None, default_growth=DEFAULT_GROWTH, min_history=MIN_HISTORY):
+    """
+    Backtests the forecast on the Silver universe.
+    Saves errors.parquet, by_item.parquet (per line item and horizon) and
+    by_ticker.parquet to data/backtest and returns a BacktestReport.
+    """
+    print("Backtesting forecasts against realized values...")
+    with instrumentation.span("backtest"), instrumentation.stage_context("backtest"):
+        frames = load_silver(tickers, silver_layout, columns=HISTORY_ITEMS)
+        if not frames:
+            print("No Silver data to backtest.")
+            return None
+
+        errors = backtest(build_history_panel(frames), horizon, lookback_years, tax_rate, default_growth, min_history)
+        report = BacktestReport(errors, error_metrics(errors, ["Item", "Horizon"]), error_metrics(errors, ["Ticker"]))
+
+        os.makedirs(BACKTEST_DIR, exist_ok=True)
+        paths = []
+        for name, df in [("errors", report.errors), ("by_item", report.by_item), ("by_ticker", report.by_ticker)]:
+            paths.append(os.path.join(BACKTEST_DIR, f"{name}.parquet"))
+            df.to_parquet(paths[-1])
+        instrumentation.record_shape(None, *errors.shape)
+        instrumentation.record_io(None, bytes_written=sum(os.path.getsize(p) for p in paths))
+
+    print(f"Backtested {errors['Ticker'].nunique()} tickers, {len(errors)} forecast values")
+    print(error_metrics(errors, ["Item"])[["Observations", "MAPE", "Bias"]].to_string(float_format="{:.3f}".format))
+    return report
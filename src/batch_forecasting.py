@@ -0,0 +1,431 @@
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from src.driver_model import DriverModel
+
+# Line items read from the Silver history
+REVENUE = 'Total Revenue'
+COST_OF_REVENUE = 'Cost Of Revenue'
+OPEX = 'Operating Expense'
+DEPRECIATION = 'Reconciled Depreciation'
+INTEREST = 'Net Interest Income'
+OTHER_INCOME = 'Other Income Expense'
+TAX = 'Tax Provision'
+TAX_RATE = 'Tax Rate For Calcs'
+RECEIVABLES = "Accounts Receivable"
+PAYABLES = "Accounts Payable"
+INVENTORY = "Inventory"
+PPE = "Net PPE"
+FIN_LIAB = "Long Term Debt And Capital Lease Obligation"
+INTANGIBLE = "Goodwill And Other Intangible Assets"
+CASH = "Cash Cash Equivalents And Short Term Investments"
+CURRENT_ASSETS = "Current Assets"
+NON_CURRENT_ASSETS = "Total Non Current Assets"
+CURRENT_LIAB = "Current Liabilities"
+NON_CURRENT_LIAB = "Total Non Current Liabilities Net Minority Interest"
+CURRENT_DEBT = "Current Debt And Capital Lease Obligation"
+OTHER_CURRENT_ASSETS = "OtherCurrentAssets_agg"
+OTHER_CURRENT_LIAB = "OtherCurrentLiabilities_agg"
+
+EXPENSE_ITEMS = [COST_OF_REVENUE, OPEX, DEPRECIATION, INTEREST, OTHER_INCOME]
+SALES_DRIVEN_ITEMS = [PPE, CURRENT_ASSETS, NON_CURRENT_ASSETS, CURRENT_LIAB, NON_CURRENT_LIAB]
+
+HISTORY_ITEMS = [
+    REVENUE, *EXPENSE_ITEMS, TAX_RATE,
+    RECEIVABLES, PAYABLES, INVENTORY, PPE, FIN_LIAB, INTANGIBLE, CASH,
+    CURRENT_ASSETS, NON_CURRENT_ASSETS, CURRENT_LIAB, NON_CURRENT_LIAB, CURRENT_DEBT,
+    OTHER_CURRENT_ASSETS, OTHER_CURRENT_LIAB,
+]
+ITEM_INDEX = {item: k for k, item in enumerate(HISTORY_ITEMS)}
+
+# Output columns, in the order produced by the per-ticker functions
+IS_COLUMNS = [REVENUE, *EXPENSE_ITEMS, 'Gross Profit', 'EBIT', 'EBITDA', 'EBT', TAX, 'Net Income', TAX_RATE]
+BS_COLUMNS = [
+    RECEIVABLES, PAYABLES, INVENTORY, *SALES_DRIVEN_ITEMS,
+    OTHER_CURRENT_ASSETS, OTHER_CURRENT_LIAB, FIN_LIAB, INTANGIBLE,
+]
+CF_COLUMNS = [
+    'Operating Taxes', 'NOPAT', 'Gross Cash Flow',
+    'Change In Inventory', 'Change In Accounts Receivable', 'Change In Accounts Payable',
+    'Investment in Other Assets', 'Investment in Other Liabilities', 'Investment in Working Capital',
+    'Capex', 'UFCF',
+]
+
+@dataclass
+class HistoryPanel:
+    """
+    Dense history of many tickers.
+    values is (tickers x years x HISTORY_ITEMS), right-aligned so that
+    values[:, -1] is each ticker's latest period; shorter histories are NaN-padded.
+    present marks which line items exist as columns in each ticker's Silver frame.
+    """
+    tickers: list
+    last_dates: pd.DatetimeIndex
+    values: np.ndarray
+    present: np.ndarray
+
+    def item(self, name):
+        return self.values[:, :, ITEM_INDEX[name]]
+
+    def has(self, name):
+        return self.present[:, ITEM_INDEX[name]]
+
+    def take(self, positions):
+        """
+        The panel of the tickers at positions, in that order.
+        """
+        return HistoryPanel([self.tickers[i] for i in positions], self.last_dates[positions],
+                            self.values[positions], self.present[positions])
+
+    @staticmethod
+    def concat(panels):
+        """
+        One panel of the tickers of every panel; shorter histories are NaN-padded on the left.
+        """
+        n_years = max(p.values.shape[1] for p in panels)
+        values = [np.pad(p.values, ((0, 0), (n_years - p.values.shape[1], 0), (0, 0)), constant_values=np.nan)
+                  for p in panels]
+        return HistoryPanel([t for p in panels for t in p.tickers],
+                            pd.DatetimeIndex(np.concatenate([p.last_dates.to_numpy() for p in panels])),
+                            np.concatenate(values), np.concatenate([p.present for p in panels]))
+
+@dataclass
+class BatchForecast:
+    """
+    Forecasts of many tickers; each statement maps column -> (tickers x forecast years) array.
+    """
+    tickers: list
+    last_dates: pd.DatetimeIndex
+    income_statement: dict
+    balance_sheet: dict
+    cashflow: dict
+
+    def take(self, positions):
+        """
+        The forecasts of the tickers at positions, in that order.
+        """
+        return BatchForecast([self.tickers[i] for i in positions], self.last_dates[positions],
+                             *[{col: v[positions] for col, v in s.items()}
+                               for s in (self.income_statement, self.balance_sheet, self.cashflow)])
+
+    @staticmethod
+    def concat(batches):
+        """
+        One BatchForecast of the tickers of every batch; all must have the same horizon and columns.
+        """
+        def statement(name):
+            columns = getattr(batches[0], name)
+            return {col: np.concatenate([getattr(b, name)[col] for b in batches]) for col in columns}
+
+        return BatchForecast([t for b in batches for t in b.tickers],
+                             pd.DatetimeIndex(np.concatenate([b.last_dates.to_numpy() for b in batches])),
+                             statement("income_statement"), statement("balance_sheet"), statement("cashflow"))
+
+    def frames(self, ticker):
+        """
+        Returns (is_forecast, bs_forecast, cf_forecast) for one ticker, shaped like
+        the output of the per-ticker forecasting functions.
+        """
+        i = self.tickers.index(ticker)
+        forecast_years = next(iter(self.income_statement.values())).shape[1]
+        last_date = self.last_dates[i]
+        index = pd.DatetimeIndex([last_date + pd.DateOffset(years=y) for y in range(1, forecast_years + 1)])
+
+        def frame(statement, columns):
+            return pd.DataFrame({col: statement[col][i] for col in columns}, index=index)
+
+        return (frame(self.income_statement, IS_COLUMNS),
+                frame(self.balance_sheet, BS_COLUMNS),
+                frame(self.cashflow, CF_COLUMNS))
+
+    def to_frame(self):
+        """
+        All forecasts as one frame indexed by (Ticker, Date), one row per forecast year.
+        """
+        statements = [self.income_statement, self.balance_sheet, self.cashflow]
+        forecast_years = next(iter(self.income_statement.values())).shape[1] if self.tickers else 0
+        dates = np.stack([(self.last_dates + pd.DateOffset(years=y)).to_numpy()
+                          for y in range(1, forecast_years + 1)], axis=1) if forecast_years else np.array([])
+        index = pd.MultiIndex.from_arrays(
+            [np.repeat(np.array(self.tickers, dtype=object), forecast_years), pd.DatetimeIndex(dates.ravel())],
+            names=["Ticker", "Date"],
+        )
+        columns = {col: values.ravel() for statement in statements for col, values in statement.items()}
+        return pd.DataFrame(columns, index=index)
+
+def build_history_panel(frames):
+    """
+    Stacks {ticker: Silver frame} into a HistoryPanel.
+    Tickers with an empty frame are left out.
+    """
+    tickers = sorted(t for t, df in frames.items() if not df.empty)
+    n_years = max((len(frames[t]) for t in tickers), default=0)
+    values = np.full((len(tickers), n_years, len(HISTORY_ITEMS)), np.nan)
+    present = np.zeros((len(tickers), len(HISTORY_ITEMS)), dtype=bool)
+    last_dates = []
+
+    for i, ticker in enumerate(tickers):
+        df = frames[ticker]
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        # Plain dict lookups: much cheaper than Index.get_indexer for ~20 labels
+        column_pos = {col: j for j, col in enumerate(df.columns)}
+        items = [k for k, item in enumerate(HISTORY_ITEMS) if item in column_pos]
+        positions = [column_pos[HISTORY_ITEMS[k]] for k in items]
+        present[i, items] = True
+        values[i, n_years - len(df):][:, items] = df.to_numpy(dtype=float)[:, positions]
+        last_dates.append(df.index[-1])
+
+    return HistoryPanel(tickers, pd.DatetimeIndex(last_dates), values, present)
+
+def history_panel_from_long(long_df, tickers=None, present=None):
+    """
+    Builds a HistoryPanel from a frame indexed by (ticker, period end), such as
+    silver_store.read_panel(). Without present, a line item counts as present
+    when the ticker has at least one value for it.
+    """
+    long_df = long_df.reindex(columns=HISTORY_ITEMS).sort_index()
+    ticker_level = long_df.index.get_level_values(0)
+    if tickers is None:
+        tickers = sorted(ticker_level.unique())
+
+    codes = pd.Categorical(ticker_level, categories=tickers).codes
+    counts = np.bincount(codes, minlength=len(tickers))
+    n_years = int(counts.max()) if len(counts) else 0
+
+    # Right-align every history so the last period sits at position n_years - 1
+    position = long_df.groupby(level=0, sort=False).cumcount().to_numpy() + (n_years - counts)[codes]
+    values = np.full((len(tickers), n_years, len(HISTORY_ITEMS)), np.nan)
+    values[codes, position] = long_df.to_numpy(dtype=float)
+
+    if present is None:
+        present = ~np.isnan(values).all(axis=1)
+
+    period_end = pd.Series(long_df.index.get_level_values(1))
+    last_dates = pd.DatetimeIndex(period_end.groupby(codes).max().reindex(range(len(tickers))))
+    return HistoryPanel(list(tickers), last_dates, values, present)
+
+def batch_cagr(series, periods=4, fallback=0.05, last_step=1.0):
+    """
+    Vectorized calculate_cagr over the rows of a (tickers x years) array,
+    skipping missing values like Series.dropna(). last_step (a scalar or one
+    value per row) is the length in years of the step to the last value.
+    The batch paths (scenarios, backtest, Monte Carlo) forecast annual Silver
+    without a TTM base, so they leave it at one year.
+    """
+    valid = ~np.isnan(series)
+    n_valid = valid.sum(axis=1)
+    rank = np.cumsum(valid, axis=1) - 1
+
+    start_rank = np.maximum(0, n_valid - 1 - periods)
+    start_val = np.where(valid & (rank == start_rank[:, None]), series, 0.0).sum(axis=1)
+    end_val = np.where(valid & (rank == (n_valid - 1)[:, None]), series, 0.0).sum(axis=1)
+    num_years = n_valid - 2 - start_rank + np.asarray(last_step, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = (end_val / start_val) ** (1 / num_years) - 1
+
+    undefined = (n_valid < 2) | (start_val == 0) | (num_years == 0) | (start_val < 0)
+    return np.where(undefined, fallback, cagr)
+
+def _safe_ratio(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator != 0, numerator / denominator, 0.0)
+
+def _previous(forecast, last_hist):
+    """
+    Value of the prior year for every forecast year: last historical value, then the forecast.
+    """
+    return np.concatenate([last_hist[:, None], forecast[:, :-1]], axis=1)
+
+def _drop_without_revenue(panel):
+    keep = panel.has(REVENUE)
+    if keep.all():
+        return panel
+    return HistoryPanel(
+        [t for t, k in zip(panel.tickers, keep) if k], panel.last_dates[keep],
+        panel.values[keep], panel.present[keep],
+    )
+
+def batch_drivers(panel, lookback_years=3, tax_rate=None, default_growth=0.05):
+    """
+    Derives the forecast drivers of every ticker from its history: revenue CAGR
+    (default_growth where undefined), expense and balance-sheet ratios over the
+    last lookback_years, DSO/DIO/DPO days, tax rate (tax_rate overrides it) and
+    the last historical values the forecast starts from. Every leaf is a per-ticker array.
+    """
+    window_start = max(panel.values.shape[1] - lookback_years, 0)
+    recent_sum = np.nansum(panel.values[:, window_start:, :], axis=1)
+    growth = batch_cagr(panel.item(REVENUE), fallback=default_growth)
+    return drivers_from_history(recent_sum, panel.values[:, -1, :], panel.present, growth, tax_rate)
+
+def _item(name):
+    k = ITEM_INDEX[name]
+    return lambda values: values[:, k]
+
+def _last_value(name):
+    k = ITEM_INDEX[name]
+    return lambda last, has: np.where(has, last[:, k], 0.0)
+
+def _tax_rate(last, has, override):
+    if override is not None:
+        return np.full(len(last), float(override))
+    return np.where(has, last[:, ITEM_INDEX[TAX_RATE]], 0.20)
+
+def _days(balance, flow):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(flow != 0, balance / flow * 360, 0)
+
+def _per_year(value, shape_like):
+    return np.broadcast_to(value[:, None], shape_like.shape).copy()
+
+def _safe_delta(previous, current):
+    return np.nan_to_num(previous, nan=0.0) - np.nan_to_num(current, nan=0.0)
+
+# Driver tree of drivers_from_history: group -> member names (None for a single array)
+DRIVER_GROUPS = {
+    "growth": None,
+    "last_revenue": None,
+    "tax_rate": None,
+    "expense_ratios": EXPENSE_ITEMS,
+    "expense_present": EXPENSE_ITEMS,
+    "days": ["dio", "dpo", "dso"],
+    "bs_ratios": [*SALES_DRIVEN_ITEMS, OTHER_CURRENT_ASSETS, OTHER_CURRENT_LIAB],
+    "last": [RECEIVABLES, PAYABLES, INVENTORY, PPE, OTHER_CURRENT_ASSETS, OTHER_CURRENT_LIAB, FIN_LIAB, INTANGIBLE],
+}
+DRIVER_NODES = [group if members is None else f"{group}:{member}"
+                for group, members in DRIVER_GROUPS.items() for member in (members or [None])]
+# Items whose prior-year value the cash flow needs
+DELTA_ITEMS = [INVENTORY, RECEIVABLES, PAYABLES, PPE, OTHER_CURRENT_ASSETS, OTHER_CURRENT_LIAB]
+
+# The forecast model: node -> (inputs, formula). Sources: history_sum, history_last
+# and history_present (rows x HISTORY_ITEMS look-back sums, latest values and
+# available line items), revenue_cagr, tax_rate_override (None to use the
+# history) and forecast_years. Nodes named group:member are drivers (see
+# DRIVER_GROUPS); line-item nodes are (rows x forecast years).
+DEFAULT_SPEC = {
+    **{f"has:{item}": (["history_present"], _item(item)) for item in HISTORY_ITEMS},
+    **{f"sum:{item}": (["history_sum"], _item(item)) for item in HISTORY_ITEMS},
+    **{f"last:{item}": (["history_last", f"has:{item}"], _last_value(item)) for item in HISTORY_ITEMS},
+
+    # --- Drivers ---
+    "growth": (["revenue_cagr"], lambda growth: growth),
+    "last_revenue": (["history_last"], _item(REVENUE)),
+    "tax_rate": (["history_last", f"has:{TAX_RATE}", "tax_rate_override"], _tax_rate),
+    **{f"expense_ratios:{col}": ([f"has:{col}", f"sum:{col}", f"sum:{REVENUE}"],
+                                 lambda has, total, revenue: np.where(has, _safe_ratio(total, revenue), 0.0))
+       for col in EXPENSE_ITEMS},
+    **{f"expense_present:{col}": ([f"has:{col}"], lambda has: has) for col in EXPENSE_ITEMS},
+    "days:dio": ([f"last:{INVENTORY}", f"last:{COST_OF_REVENUE}"], _days),
+    "days:dpo": ([f"last:{PAYABLES}", f"last:{COST_OF_REVENUE}"], _days),
+    "days:dso": ([f"last:{RECEIVABLES}", f"last:{REVENUE}"], _days),
+    **{f"bs_ratios:{col}": ([f"sum:{col}", f"sum:{REVENUE}"], _safe_ratio) for col in SALES_DRIVEN_ITEMS},
+    f"bs_ratios:{OTHER_CURRENT_ASSETS}": (
+        [f"sum:{CURRENT_ASSETS}", f"sum:{CASH}", f"sum:{RECEIVABLES}", f"sum:{INVENTORY}", f"sum:{REVENUE}"],
+        lambda assets, cash, receivables, inventory, revenue: _safe_ratio(assets - cash - receivables - inventory,
+                                                                          revenue)),
+    f"bs_ratios:{OTHER_CURRENT_LIAB}": (
+        [f"sum:{CURRENT_LIAB}", f"sum:{PAYABLES}", f"sum:{CURRENT_DEBT}", f"sum:{REVENUE}"],
+        lambda liabilities, payables, debt, revenue: _safe_ratio(liabilities - payables - debt, revenue)),
+
+    # --- Income Statement ---
+    "years": (["forecast_years"], lambda forecast_years: np.arange(1, forecast_years + 1)),
+    "growth_factors": (["growth", "years"], lambda growth, years: (1 + growth)[:, None] ** years),
+    REVENUE: (["last_revenue", "growth_factors"], lambda last, factors: last[:, None] * factors),
+    **{col: ([f"expense_present:{col}", REVENUE, f"expense_ratios:{col}"],
+             lambda present, revenue, ratio: np.where(present[:, None], revenue * ratio[:, None], 0.0))
+       for col in EXPENSE_ITEMS},
+    'Gross Profit': ([REVENUE, COST_OF_REVENUE], lambda revenue, cogs: revenue - cogs),
+    'EBIT': (['Gross Profit', OPEX], lambda gross_profit, opex: gross_profit - opex),
+    'EBITDA': (['EBIT', DEPRECIATION], lambda ebit, depreciation: ebit + depreciation),
+    'EBT': (['EBIT', INTEREST, OTHER_INCOME], lambda ebit, interest, other: ebit + interest + other),
+    TAX: (['EBT', "tax_rate"], lambda ebt, tax_rate: ebt * tax_rate[:, None]),
+    'Net Income': (['EBT', TAX], lambda ebt, tax: ebt - tax),
+    TAX_RATE: (["tax_rate", REVENUE], _per_year),
+
+    # --- Balance Sheet: days method, sales-driven ratios, flat debt and intangibles ---
+    RECEIVABLES: (["days:dso", REVENUE], lambda days, revenue: days[:, None] / 360 * revenue),
+    PAYABLES: (["days:dpo", COST_OF_REVENUE], lambda days, cogs: days[:, None] / 360 * cogs),
+    INVENTORY: (["days:dio", COST_OF_REVENUE], lambda days, cogs: days[:, None] / 360 * cogs),
+    **{col: ([REVENUE, f"bs_ratios:{col}"], lambda revenue, ratio: revenue * ratio[:, None])
+       for col in DRIVER_GROUPS["bs_ratios"]},
+    FIN_LIAB: ([f"last:{FIN_LIAB}", REVENUE], _per_year),
+    INTANGIBLE: ([f"last:{INTANGIBLE}", REVENUE], _per_year),
+
+    # --- Cash Flow ---
+    **{f"previous:{col}": ([col, f"last:{col}"], _previous) for col in DELTA_ITEMS},
+    'Operating Taxes': (['EBIT', TAX_RATE], lambda ebit, tax_rate: ebit * tax_rate),
+    'NOPAT': (['EBIT', 'Operating Taxes'], lambda ebit, taxes: ebit - taxes),
+    'Gross Cash Flow': (['NOPAT', DEPRECIATION], lambda nopat, depreciation: nopat + depreciation),
+    'Change In Inventory': ([f"previous:{INVENTORY}", INVENTORY], _safe_delta),
+    'Change In Accounts Receivable': ([f"previous:{RECEIVABLES}", RECEIVABLES], _safe_delta),
+    'Change In Accounts Payable': ([f"previous:{PAYABLES}", PAYABLES],
+                                   lambda previous, current: -_safe_delta(previous, current)),
+    'Investment in Other Assets': ([f"previous:{OTHER_CURRENT_ASSETS}", OTHER_CURRENT_ASSETS],
+                                   lambda previous, current: previous - current),
+    'Investment in Other Liabilities': ([f"previous:{OTHER_CURRENT_LIAB}", OTHER_CURRENT_LIAB],
+                                        lambda previous, current: -(previous - current)),
+    'Investment in Working Capital': (
+        ['Change In Inventory', 'Change In Accounts Receivable', 'Change In Accounts Payable',
+         'Investment in Other Assets', 'Investment in Other Liabilities'],
+        lambda inventory, receivables, payables, other_assets, other_liabilities: (
+            inventory + receivables + payables + other_assets + other_liabilities)),
+    'Capex': ([f"previous:{PPE}", PPE, DEPRECIATION],
+              lambda previous, current, depreciation: (previous - current) - depreciation),
+    'UFCF': (['Gross Cash Flow', 'Investment in Working Capital', 'Capex'],
+             lambda gross_cash_flow, working_capital, capex: gross_cash_flow + working_capital + capex),
+}
+MODEL = DriverModel(DEFAULT_SPEC)
+STATEMENT_NODES = IS_COLUMNS + BS_COLUMNS + CF_COLUMNS
+
+def flatten_drivers(drivers):
+    """
+    Driver tree -> {node name: array}, e.g. drivers["days"]["dso"] -> "days:dso".
+    """
+    flat = {}
+    for group, value in drivers.items():
+        if isinstance(value, dict):
+            flat.update({f"{group}:{member}": v for member, v in value.items()})
+        else:
+            flat[group] = value
+    return flat
+
+def nest_drivers(values):
+    return {group: values[group] if members is None else {m: values[f"{group}:{m}"] for m in members}
+            for group, members in DRIVER_GROUPS.items()}
+
+def split_statements(values):
+    """
+    (income_statement, balance_sheet, cashflow) dicts of an evaluation of the model.
+    """
+    return tuple({col: values[col] for col in columns} for columns in (IS_COLUMNS, BS_COLUMNS, CF_COLUMNS))
+
+def drivers_from_history(recent_sum, last, present, growth, tax_rate=None, model=MODEL):
+    """
+    Builds the driver tree from per-row history statistics: recent_sum and last
+    are (rows x HISTORY_ITEMS) look-back sums and latest values, present marks
+    the available line items and growth is the revenue CAGR of every row.
+    """
+    given = {"history_sum": recent_sum, "history_last": last, "history_present": present,
+             "revenue_cagr": growth, "tax_rate_override": tax_rate}
+    return nest_drivers(model.evaluate(given, DRIVER_NODES).values)
+
+def project(drivers, forecast_years=5, model=MODEL):
+    """
+    Projects the three statements from driver arrays of any common length
+    (tickers, or simulated paths of one ticker).
+    Returns (income_statement, balance_sheet, cashflow) dicts of (rows x years) arrays.
+    """
+    evaluation = model.evaluate({**flatten_drivers(drivers), "forecast_years": forecast_years}, STATEMENT_NODES)
+    return split_statements(evaluation.values)
+
+def forecast_batch(panel, forecast_years=5, lookback_years=3, tax_rate=None, default_growth=0.05):
+    """
+    Computes the Income Statement, Balance Sheet and Cash Flow forecasts of every
+    ticker in the panel in one vectorized pass. Matches forecasting_income_statement,
+    forecasting_balance_sheet and forecast_cashflow ticker by ticker; tickers
+    without revenue are dropped, as the per-ticker path skips them.
+    """
+    panel = _drop_without_revenue(panel)
+    inc, bs, cf = project(batch_drivers(panel, lookback_years, tax_rate, default_growth), forecast_years)
+    return BatchForecast(panel.tickers, panel.last_dates, inc, bs, cf)
@@ -0,0 +1,241 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import json
+import os
+import time
+from src import bronze_io, instrumentation
+
+BRONZE_DIR = "data/bronze"
+PARQUET_DIR = os.path.join(BRONZE_DIR, "parquet")
+STATEMENT_NAMES = ["balance_sheet", "income_statement", "cashflow"]
+# Optional quarterly statements, stored next to the annual ones
+QUARTERLY_NAMES = [f"quarterly_{name}" for name in STATEMENT_NAMES]
+
+BRONZE_SCHEMA = pa.schema([
+    ("ticker", pa.dictionary(pa.int32(), pa.string())),
+    ("statement", pa.dictionary(pa.int8(), pa.string())),
+    ("period_end", pa.timestamp("ms")),
+    ("line_item", pa.dictionary(pa.int32(), pa.string())),
+    ("value", pa.float64()),
+])
+
+# --- JSON layout: data/bronze/<TICKER>/<statement>.json ---
+
+def statement_payloads(statements):
+    """
+    {bronze name: DataFrame.to_json() text} of fetched statements; "{}" for a
+    missing annual statement. Quarterly statements are included only when fetched.
+    """
+    payloads = {}
+    for name in STATEMENT_NAMES + [name for name in QUARTERLY_NAMES if name in statements]:
+        df = statements.get(name)
+        payloads[name] = df.to_json() if df is not None and not df.empty else "{}"
+    return payloads
+
+def json_to_frame(data):
+    """
+    Parsed statement JSON -> (dates x line items) frame, or None when empty.
+    """
+    if not data:
+        return None
+    df = pd.DataFrame.from_dict(data, orient='index')
+    df.index = pd.to_datetime(df.index.astype(int), unit='ms')
+    return df
+
+def write_json(ticker, statements, writer=None, callback=None):
+    """
+    Writes the fetched statements as one DataFrame.to_json() file per statement.
+    Quarterly statements are written only when they were fetched. Every file is
+    replaced atomically; with a bronze_io.BackgroundWriter the files are written
+    on its thread and callback(error) runs once they are.
+    """
+    base_path = os.path.join(BRONZE_DIR, ticker)
+    os.makedirs(base_path, exist_ok=True)
+
+    files = {os.path.join(base_path, f"{name}.json"): payload
+             for name, payload in statement_payloads(statements).items()}
+    if writer is not None:
+        writer.write_files(files, ticker, callback)
+        return
+    bronze_io.write_files(files, ticker)
+    if callback is not None:
+        callback(None)
+
+def list_json_tickers():
+    if not os.path.exists(BRONZE_DIR):
+        return []
+    return sorted(
+        d for d in os.listdir(BRONZE_DIR)
+        if d not in ("parquet", "snapshots") and os.path.isdir(os.path.join(BRONZE_DIR, d))
+    )
+
+def _read_json_statement(ticker, name):
+    file_path = os.path.join(BRONZE_DIR, ticker, f"{name}.json")
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+    instrumentation.record_io(ticker, bytes_read=os.path.getsize(file_path))
+    return json_to_frame(data)
+
+def read_json(ticker):
+    """
+    Reads the JSON statements of a ticker as a list of (dates x line items) frames.
+    """
+    dfs = []
+    for name in STATEMENT_NAMES:
+        df = _read_json_statement(ticker, name)
+        if df is not None:
+            dfs.append(df)
+    return dfs
+
+def statements_to_frames(statements):
+    """
+    Turns fetched statements (line items x dates) into the (dates x line items)
+    frames that read_json returns, without the JSON round trip.
+    """
+    dfs = []
+    for name in STATEMENT_NAMES:
+        df = statements.get(name)
+        if df is None or df.empty:
+            continue
+        df = df.T
+        df.index = pd.to_datetime(df.index)
+        dfs.append(df)
+    return dfs
+
+# --- Parquet layout: data/bronze/parquet/batch_<id>.parquet, one row group per ticker ---
+
+def statements_to_long(ticker, statements):
+    """
+    Flattens yfinance statements (line items x dates) into typed long rows.
+    """
+    parts = []
+    for name in STATEMENT_NAMES + QUARTERLY_NAMES:
+        df = statements.get(name)
+        if df is None or df.empty:
+            continue
+        wide = df.T.rename_axis(index="period_end")
+        long_df = wide.reset_index().melt(id_vars="period_end", var_name="line_item", value_name="value")
+        long_df["statement"] = name
+        parts.append(long_df)
+
+    if not parts:
+        return pd.DataFrame(columns=BRONZE_SCHEMA.names)
+
+    out = pd.concat(parts, ignore_index=True)
+    out["ticker"] = ticker
+    out["period_end"] = pd.to_datetime(out["period_end"])
+    out["line_item"] = out["line_item"].astype(str)
+    out["value"] = pd.to_numeric(out["value"], errors="coerce").astype("float64")
+    return out[BRONZE_SCHEMA.names]
+
+def new_batch_id():
+    return time.strftime("%Y%m%dT%H%M%S") + f"_{time.time_ns() % 1_000_000_000:09d}"
+
+def write_parquet_batch(batch, batch_id=None):
+    """
+    Writes {ticker: statements} as a single Parquet file, one row group per ticker.
+    Returns the written path, or None if the batch holds no data.
+    """
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    batch_id = batch_id or new_batch_id()
+    path = os.path.join(PARQUET_DIR, f"batch_{batch_id}.parquet")
+    tmp_path = path + ".tmp"
+
+    written = 0
+    with pq.ParquetWriter(tmp_path, BRONZE_SCHEMA) as writer:
+        for ticker in sorted(batch):
+            long_df = statements_to_long(ticker, batch[ticker])
+            if long_df.empty:
+                continue
+            writer.write_table(pa.Table.from_pandas(long_df, schema=BRONZE_SCHEMA, preserve_index=False))
+            written += 1
+
+    if not written:
+        os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, path)
+    instrumentation.record_io(None, bytes_written=os.path.getsize(path))
+    return path
+
+def list_parquet_batches():
+    if not os.path.exists(PARQUET_DIR):
+        return []
+    return sorted(f for f in os.listdir(PARQUET_DIR) if f.startswith("batch_") and f.endswith(".parquet"))
+
+def list_parquet_tickers():
+    tickers = set()
+    for file_name in list_parquet_batches():
+        column = pq.read_table(os.path.join(PARQUET_DIR, file_name), columns=["ticker"]).column("ticker")
+        tickers.update(column.unique().cast(pa.string()).to_pylist())
+    return sorted(tickers)
+
+def read_parquet_long(tickers=None):
+    """
+    Reads all Parquet batches, keeping only each ticker's most recent batch.
+    """
+    tables = []
+    for file_name in list_parquet_batches():
+        filters = [("ticker", "in", list(tickers))] if tickers is not None else None
+        table = pq.read_table(os.path.join(PARQUET_DIR, file_name), filters=filters)
+        instrumentation.record_io(None, bytes_read=table.nbytes)
+        if table.num_rows:
+            table = table.append_column("batch", pa.array([file_name] * table.num_rows, pa.string()))
+            tables.append(table)
+
+    if not tables:
+        return pd.DataFrame(columns=BRONZE_SCHEMA.names)
+
+    long_df = pa.concat_tables(tables).to_pandas()
+    for col in ["ticker", "statement", "line_item"]:
+        long_df[col] = long_df[col].astype(str)
+    latest = long_df.groupby("ticker")["batch"].transform("max")
+    return long_df[long_df["batch"] == latest].drop(columns="batch")
+
+def long_to_frames(long_df):
+    """
+    Pivots the long rows of one ticker back into a list of (dates x line items) frames.
+    """
+    dfs = []
+    for name in STATEMENT_NAMES:
+        part = long_df[long_df["statement"] == name]
+        if part.empty:
+            continue
+        df = part.pivot(index="period_end", columns="line_item", values="value")
+        df = df.rename_axis(index=None, columns=None)
+        df.columns = df.columns.astype(str)
+        dfs.append(df)
+    return dfs
+
+def read_parquet(tickers=None):
+    """
+    Reads the Parquet bronze store as {ticker: [statement frames]}.
+    """
+    long_df = read_parquet_long(tickers)
+    return {ticker: long_to_frames(group) for ticker, group in long_df.groupby("ticker", sort=True)}
+
+def read_quarterly_long(tickers, bronze_format="json", long_df=None):
+    """
+    Quarterly statement rows of the given tickers as one long frame
+    (ticker, statement, period_end, line_item, value).
+    long_df reuses long rows already read (read_parquet_long, or a snapshot).
+    """
+    if long_df is not None or bronze_format == "parquet":
+        if long_df is None:
+            long_df = read_parquet_long(tickers)
+        return long_df[long_df["statement"].isin(QUARTERLY_NAMES)]
+
+    parts = []
+    for ticker in tickers:
+        statements = {}
+        for name in QUARTERLY_NAMES:
+            df = _read_json_statement(ticker, name)
+            if df is not None:
+                statements[name] = df.T
+        if statements:
+            parts.append(statements_to_long(ticker, statements))
+    if not parts:
+        return pd.DataFrame(columns=BRONZE_SCHEMA.names)
+    return pd.concat(parts, ignore_index=True)
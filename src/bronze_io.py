@@ -0,0 +1,147 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from src import instrumentation
+
+# Connections kept open per host by a pooled session
+POOL_SIZE = 8
+# Write jobs queued before submitting blocks, so a slow disk throttles fetching instead of filling memory
+MAX_PENDING_WRITES = 256
+# Tickers whose Bronze files are read ahead while the current one is processed
+PREFETCH_DEPTH = 8
+PREFETCH_THREADS = 4
+
+def make_session(pool_size=POOL_SIZE, impersonate=True):
+    """
+    One HTTP session for a whole ingestion run, so connections (and Yahoo's
+    cookie and crumb) are reused across tickers instead of set up per ticker.
+    With impersonate and curl_cffi installed, which is what yfinance prefers,
+    a curl_cffi session with browser TLS that keeps a connection per thread;
+    otherwise a requests session pooling pool_size connections per host.
+    """
+    if impersonate:
+        try:
+            from curl_cffi import requests as curl_requests
+            return curl_requests.Session(impersonate="chrome")
+        except ImportError:
+            pass
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def atomic_write(path, payload):
+    """
+    Writes text through a temporary file and a rename, so readers see the old
+    file or the new one, never a partial one. Returns the characters written.
+    """
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(payload)
+
+def write_files(files, ticker=None):
+    """
+    Writes {path: text} atomically, one file at a time.
+    """
+    written = sum(atomic_write(path, payload) for path, payload in files.items())
+    instrumentation.record_io(ticker, bytes_written=written)
+
+class BackgroundWriter:
+    """
+    Runs disk writes on one background thread, so the threads that fetch (or
+    compute) never wait on the disk. Jobs run in submission order; a bounded
+    queue of max_pending jobs applies backpressure. A job's callback(error)
+    runs on the writer thread after the job, with None or the exception it
+    raised; errors of jobs without a callback are printed. close() waits for
+    every queued job. Events are recorded under stage.
+    """
+    def __init__(self, max_pending=MAX_PENDING_WRITES, stage=None):
+        self.stage = stage
+        self.jobs = queue.Queue(max_pending)
+        self.errors = []
+        self.completed = 0
+        self._thread = threading.Thread(target=self._run, name="bronze-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, callback=None):
+        self.jobs.put((func, args, callback))
+
+    def write_files(self, files, ticker=None, callback=None):
+        self.submit(write_files, files, ticker, callback=callback)
+
+    def _run(self):
+        with instrumentation.stage_context(self.stage):
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                func, args, callback = job
+                error = None
+                try:
+                    func(*args)
+                except Exception as e:
+                    error = e
+                    self.errors.append(e)
+                    if callback is None:
+                        print(f"Background write failed: {type(e).__name__}: {e}")
+                if callback is not None:
+                    try:
+                        callback(error)
+                    except Exception as e:
+                        self.errors.append(e)
+                        print(f"Background write callback failed: {type(e).__name__}: {e}")
+                self.completed += 1
+
+    def close(self):
+        if self._thread.is_alive():
+            self.jobs.put(None)
+            self._thread.join()
+
+def _resolved(load, item):
+    future = Future()
+    try:
+        future.set_result(load(item))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def prefetch(items, load, depth=PREFETCH_DEPTH, threads=PREFETCH_THREADS):
+    """
+    Yields (item, future of load(item)) in order while the loads of the next
+    depth items run on threads, so reading the next tickers' files overlaps
+    with processing the current one. future.result() returns the load or
+    raises its error. Loads are recorded under the caller's stage.
+    depth=0 loads each item when it is reached, without threads.
+    """
+    if depth <= 0:
+        for item in items:
+            yield item, _resolved(load, item)
+        return
+
+    stage = instrumentation.current_stage()
+    def run(item):
+        with instrumentation.stage_context(stage):
+            return load(item)
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="bronze-prefetch") as executor:
+        in_flight = deque((item, executor.submit(run, item)) for item in islice(items, depth))
+        while in_flight:
+            item, future = in_flight.popleft()
+            for following in islice(items, 1):
+                in_flight.append((following, executor.submit(run, following)))
+            yield item, future
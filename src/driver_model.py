@@ -0,0 +1,132 @@
+from dataclasses import dataclass, field
+
+@dataclass
+class Evaluation:
+    """
+    Values of a DriverModel evaluation by node name: the given sources and
+    pinned nodes plus the nodes computed from their formulas (computed).
+    recomputed lists the nodes the evaluation or recompute that produced it ran.
+    """
+    values: dict
+    computed: set
+    recomputed: list = field(default_factory=list)
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+class DriverModel:
+    """
+    A declarative forecast model: spec maps every node (a driver or line item)
+    to (inputs, formula), where formula(*input values) returns its value,
+    usually an array over tickers or (tickers x years). Names used as inputs
+    but not defined in spec are sources (history statistics, assumptions)
+    supplied at evaluation time. The spec is compiled once into a topological
+    order; a cycle raises ValueError.
+    """
+    def __init__(self, spec):
+        self.spec = dict(spec)
+        self.dependents = {}
+        for name, (inputs, _) in self.spec.items():
+            for source in inputs:
+                self.dependents.setdefault(source, []).append(name)
+        self.sources = sorted(set(self.dependents) - set(self.spec))
+        self.order = self._topological_order()
+        self._rank = {name: i for i, name in enumerate(self.order)}
+        self._plans = {}
+
+    def _topological_order(self):
+        pending = {name: sum(i in self.spec for i in inputs) for name, (inputs, _) in self.spec.items()}
+        ready = [name for name in self.spec if pending[name] == 0]
+        order = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for dependent in self.dependents.get(name, []):
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) < len(self.spec):
+            raise ValueError(f"Cycle in driver model among {sorted(set(self.spec) - set(order))}")
+        # Spec order among independent nodes, so evaluations are reproducible
+        position = {name: i for i, name in enumerate(self.spec)}
+        depths = {}
+        return sorted(order, key=lambda name: (self._depth(name, depths), position[name]))
+
+    def _depth(self, name, memo):
+        if name not in self.spec:
+            return -1
+        if name not in memo:
+            memo[name] = 1 + max((self._depth(i, memo) for i in self.spec[name][0]), default=-1)
+        return memo[name]
+
+    def replace(self, formulas):
+        """
+        A new model with some nodes added or redefined, {name: (inputs, formula)}.
+        Follow with recompute(evaluation, stale=formulas) to update an evaluation.
+        """
+        return DriverModel({**self.spec, **formulas})
+
+    def upstream(self, outputs, given=()):
+        """
+        The nodes needed to compute outputs, not looking past the given names.
+        """
+        needed, stack = set(), [name for name in outputs if name not in given]
+        while stack:
+            name = stack.pop()
+            if name in needed or name not in self.spec:
+                continue
+            needed.add(name)
+            stack.extend(i for i in self.spec[name][0] if i not in given)
+        return needed
+
+    def downstream(self, names):
+        """
+        Every node that depends on one of names, directly or not, in evaluation order.
+        """
+        found, stack = set(), list(names)
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), []):
+                if dependent not in found:
+                    found.add(dependent)
+                    stack.append(dependent)
+        return sorted(found, key=self._rank.get)
+
+    def _run(self, values, names):
+        for name in names:
+            inputs, formula = self.spec[name]
+            try:
+                args = [values[i] for i in inputs]
+            except KeyError as e:
+                raise KeyError(f"Driver model node {name!r} needs {e.args[0]!r}, which was not given") from None
+            values[name] = formula(*args)
+
+    def evaluate(self, given, outputs=None):
+        """
+        Evaluates the model from given values of sources, and optionally of
+        nodes, which are then pinned rather than computed. Only the nodes
+        needed for outputs (default: every node) are computed.
+        """
+        values = dict(given)
+        # The nodes to run depend only on the given names and outputs; cache them
+        key = (frozenset(values), None if outputs is None else tuple(outputs))
+        names = self._plans.get(key)
+        if names is None:
+            needed = self.upstream(self.order if outputs is None else outputs, values)
+            names = self._plans[key] = [name for name in self.order if name in needed]
+        self._run(values, names)
+        return Evaluation(values, set(names), list(names))
+
+    def recompute(self, evaluation, changes=None, stale=()):
+        """
+        Updates an evaluation after changes, {name: new value} of sources or
+        nodes (a changed node is pinned to its new value), and after the
+        formulas of the stale nodes changed (see replace). Only the computed
+        nodes downstream of a change are recomputed; the rest are reused.
+        """
+        changes = changes or {}
+        values = {**evaluation.values, **changes}
+        computed = (evaluation.computed - set(changes)) | set(stale)
+        affected = set(stale) | set(self.downstream([*changes, *stale]))
+        names = [name for name in self.order if name in affected and name in computed]
+        self._run(values, names)
+        return Evaluation(values, computed, names)
@@ -0,0 +1,209 @@
+import os
+import pickle
+from collections import OrderedDict
+from src.manifest import digest
+
+CACHE_DIR = "data/cache/forecasts"
+# Segments kept in memory; a segment is everything one put() stored
+MAX_ENTRIES = 32
+MAX_BYTES = 1024 * 2**20
+
+def cache_key(ticker, silver_hash, assumptions=None, *extra):
+    """
+    Key of the forecast of one ticker's Silver content under assumptions, or of
+    its history panel row when assumptions is None. extra distinguishes
+    variants, such as the code version or lean output.
+    """
+    return digest(ticker, silver_hash, "panel" if assumptions is None else assumptions.key(), *extra)
+
+class FrameList:
+    """
+    Per-ticker frames (such as Gold forecasts) in the batch form ForecastCache stores.
+    """
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def take(self, positions):
+        return FrameList([self.frames[i] for i in positions])
+
+    @staticmethod
+    def concat(parts):
+        return FrameList([df for part in parts for df in part.frames])
+
+class ForecastCache:
+    """
+    Two-tier cache of per-ticker values: history panel rows, batch forecasts or
+    Gold frames, keyed by cache_key(), so a changed ticker invalidates only its
+    own entries. Values are stored in batches (HistoryPanel, BatchForecast or
+    FrameList; anything with take(positions) and concat(parts)): put(keys, batch)
+    stores one segment whose row i belongs to keys[i], and get(keys) gathers the
+    rows of every cached key from the segments holding them.
+    The memory tier is an LRU of max_entries segments. The disk tier keeps one
+    .pkl file per segment under cache_dir and, once the files exceed max_bytes,
+    deletes the least recently used ones. cache_dir=None keeps it in memory only.
+    """
+    def __init__(self, max_entries=MAX_ENTRIES, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._disk_bytes = None
+        self._index = None  # key -> (segment, position)
+
+    def get(self, keys):
+        """
+        (batch, found): the cached rows of keys in one batch, found lists their
+        keys in batch order. batch is None when no key is cached.
+        """
+        index = self._load_index()
+        by_segment = OrderedDict()
+        for key in keys:
+            if key in index:
+                segment, position = index[key]
+                by_segment.setdefault(segment, []).append((key, position))
+
+        parts, found = [], []
+        for segment, rows in by_segment.items():
+            batch = self._segment(segment, len(rows))
+            if batch is None:
+                for key, _ in rows:
+                    index.pop(key, None)
+                continue
+            parts.append(batch.take([position for _, position in rows]))
+            found.extend(key for key, _ in rows)
+        self.stats["misses"] += len(keys) - len(found)
+        if not parts:
+            return None, []
+        return (parts[0] if len(parts) == 1 else type(parts[0]).concat(parts)), found
+
+    def put(self, keys, batch):
+        """
+        Stores batch, whose row i is the value of keys[i].
+        """
+        keys = list(keys)
+        if not keys:
+            return
+        segment = digest(*keys)
+        self._remember(segment, batch)
+        index = self._load_index()
+        for position, key in enumerate(keys):
+            index[key] = (segment, position)
+        self._write(segment, keys, batch)
+
+    def _segment(self, segment, n_rows):
+        if segment in self.memory:
+            self.memory.move_to_end(segment)
+            self.stats["memory_hits"] += n_rows
+            return self.memory[segment]
+        batch = self._read(segment)
+        if batch is not None:
+            self.stats["disk_hits"] += n_rows
+            self._remember(segment, batch)
+        return batch
+
+    def _remember(self, segment, batch):
+        self.memory[segment] = batch
+        self.memory.move_to_end(segment)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _path(self, segment):
+        return os.path.join(self.cache_dir, f"{segment}.pkl")
+
+    def _load_index(self):
+        """
+        The keys of every segment on disk, read from the head of each file; when
+        two segments hold a key, the more recently used one wins.
+        """
+        if self._index is not None:
+            return self._index
+        self._index = {}
+        if self.cache_dir is None or not os.path.exists(self.cache_dir):
+            return self._index
+        for _, name, _ in sorted(self._disk_files()):
+            try:
+                with open(os.path.join(self.cache_dir, name), "rb") as f:
+                    keys = pickle.load(f)
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+                continue
+            segment = name[:-len(".pkl")]
+            for position, key in enumerate(keys):
+                self._index[key] = (segment, position)
+        return self._index
+
+    def _read(self, segment):
+        if self.cache_dir is None:
+            return None
+        path = self._path(segment)
+        try:
+            with open(path, "rb") as f:
+                pickle.load(f)  # the keys, already in the index
+                batch = pickle.load(f)
+            os.utime(path)  # mtime is the LRU clock of the disk tier
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        return batch
+
+    def _write(self, segment, keys, batch):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(segment)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(keys, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, _, size in self._disk_files())
+        else:
+            self._disk_bytes += os.path.getsize(path) - replaced
+        if self._disk_bytes > self.max_bytes:
+            self._evict()
+
+    def _disk_files(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, name, stat.st_size))
+        return files
+
+    def _evict(self):
+        """
+        Deletes the least recently used files until the tier is at 90% of max_bytes,
+        so eviction does not run again on the very next write.
+        """
+        files = sorted(self._disk_files())
+        total = sum(size for _, _, size in files)
+        evicted = set()
+        for _, name, size in files:
+            if total <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            evicted.add(name[:-len(".pkl")])
+            total -= size
+        self._disk_bytes = total
+        if self._index is not None:
+            self._index = {key: entry for key, entry in self._index.items()
+                           if entry[0] not in evicted or entry[0] in self.memory}
+
+_default_cache = None
+
+def default_cache():
+    """
+    Process-wide ForecastCache backed by CACHE_DIR, shared by forecasting and scenario runs.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ForecastCache()
+    return _default_cache
@@ -1,32 +1,101 @@
 import pandas as pd
+import pyarrow.parquet as pq
+import json
 import os
+import traceback
 import numpy as np
+from dataclasses import asdict, dataclass
+from src import instrumentation, processing, silver_store
+from src.manifest import code_version, digest, file_hash, frame_hash
+from src.parallel import ERROR, run_chunked, run_ticker
+from src.processing import SILVER_TTM_DIR, compact_frame
+from src.valuation import HISTORY_COLUMNS as VALUATION_COLUMNS
 
-def calculate_cagr(series, periods=4):
+SILVER_DIR = "data/silver"
+GOLD_DIR = "data/gold"
+FORECAST_YEARS = 5
+LOOKBACK_YEARS = 3
+DEFAULT_GROWTH = 0.05
+
+# Silver line items read by forecasting_income_statement, forecasting_balance_sheet
+# and forecast_cashflow, plus the historical ones valuation reads from Gold.
+# Lean runs read only these columns: a line item used by the forecast functions
+# must be listed here (tests/test_lean.py checks lean against full forecasts).
+REQUIRED_COLUMNS = list(dict.fromkeys([
+    'Total Revenue', 'Cost Of Revenue', 'Operating Expense', 'Reconciled Depreciation',
+    'Net Interest Income', 'Other Income Expense', 'Tax Rate For Calcs',
+    "Accounts Receivable", "Accounts Payable", "Inventory", "Net PPE",
+    "Long Term Debt And Capital Lease Obligation", "Goodwill And Other Intangible Assets",
+    "Cash Cash Equivalents And Short Term Investments", "Current Assets", "Total Non Current Assets",
+    "Current Liabilities", "Total Non Current Liabilities Net Minority Interest",
+    "Current Debt And Capital Lease Obligation",
+    "OtherCurrentAssets_agg", "OtherNonCurrentAssets_agg",
+    "OtherCurrentLiabilities_agg", "OtherNonCurrentLiabilities_agg",
+    "Total Equity Gross Minority Interest",
+    *VALUATION_COLUMNS,
+]))
+REQUIRED_SET = set(REQUIRED_COLUMNS)
+TYPE_DTYPE = pd.CategoricalDtype(["Historical", "Forecast"])
+# Modules whose code decides a Gold frame: the forecast itself, compact_frame
+# (lean output), the Silver and Gold layouts, valuation's history columns (lean
+# reads) and the batch forecast model that backs scenarios and the backtest
+CODE_MODULES = [__file__, processing.__file__, silver_store.__file__] + [
+    os.path.join(os.path.dirname(__file__), f"{module}.py")
+    for module in ["gold_store", "valuation", "batch_forecasting", "driver_model"]
+]
+
+@dataclass(frozen=True)
+class Assumptions:
+    """
+    Forecast assumptions: horizon, look-back window of the historical ratios,
+    an optional tax rate overriding the historical one, and the revenue growth
+    used when no CAGR can be computed. The defaults reproduce the standard forecast.
+    """
+    forecast_years: int = FORECAST_YEARS
+    lookback_years: int = LOOKBACK_YEARS
+    tax_rate: float = None
+    default_growth: float = DEFAULT_GROWTH
+
+    def key(self):
+        return json.dumps(asdict(self), sort_keys=True)
+
+def calculate_cagr(series, periods=4, fallback=DEFAULT_GROWTH, last_step=1.0):
     """
     Calculate Compound Annual Growth Rate (CAGR).
     Defaults to using the last 4 years (5 data points) if available.
+    last_step is the length in years of the step to the last point, which
+    differs from a year only for a TTM base (see with_ttm_base).
+    Returns fallback when the CAGR is undefined.
     """
     if len(series) < 2:
-        return 0.05
+        return fallback
     
     start_idx = max(0, len(series) - 1 - periods)
     end_val = series.iloc[-1]
     start_val = series.iloc[start_idx]
-    num_years = len(series) - 1 - start_idx
+    num_years = len(series) - 2 - start_idx + last_step
     
     if start_val == 0 or num_years == 0:
-        return 0.05
+        return fallback
         
     if start_val < 0: 
-        return 0.05
+        return fallback
         
     cagr = (end_val / start_val) ** (1 / num_years) - 1
     return cagr
 
-def forecasting_income_statement(df, forecast_years=5):
+def ttm_step_years(fiscal_year_end, ttm_end):
+    """
+    Years from the last fiscal year end to a TTM quarter end, in whole quarters.
     """
-    Forecasts the Income Statement positions using 3-year historical averages and vectorization.
+    return max(1, round((ttm_end - fiscal_year_end).days / 91.3)) / 4
+
+def forecasting_income_statement(df, forecast_years=5, lookback_years=LOOKBACK_YEARS, tax_rate=None,
+                                 default_growth=DEFAULT_GROWTH):
+    """
+    Forecasts the Income Statement positions using historical averages over the
+    last lookback_years (3 by default) and vectorization.
+    tax_rate, when given, replaces the historical tax rate.
     """
     # Identify columns
     col_revenue = 'Total Revenue'
@@ -40,12 +109,12 @@ def forecasting_income_statement(df, forecast_years=5):
     # Forecast Revenue using CAGR
     if col_revenue in df.columns:
         revenue_series = df[col_revenue].dropna()
-        cagr = calculate_cagr(revenue_series)
+        cagr = calculate_cagr(revenue_series, fallback=default_growth, last_step=df.attrs.get("ttm_step", 1.0))
     else:
         return pd.DataFrame()
 
-    # Calculate Ratios (Average of last 3 years)
-    recent_df = df.tail(3).copy()
+    # Calculate Ratios (Average of last lookback_years years)
+    recent_df = df.tail(lookback_years).copy()
     avg_ratios = {}
     expense_cols = [col_cost_revenue, col_opex, col_depreciation, col_interest, col_other_income]
     
@@ -65,10 +134,11 @@ def forecasting_income_statement(df, forecast_years=5):
     col_ebt = "Pretax Income"
     col_tax_rate = "Tax Rate For Calcs"
     
-    if col_tax_rate in df.columns:
-        tax_rate = df[col_tax_rate].iloc[-1]
-    else:
-        tax_rate = 0.20
+    if tax_rate is None:
+        if col_tax_rate in df.columns:
+            tax_rate = df[col_tax_rate].iloc[-1]
+        else:
+            tax_rate = 0.20
 
     # Generate Forecast
     last_date = df.index.max()
@@ -99,7 +169,7 @@ def forecasting_income_statement(df, forecast_years=5):
     
     return forecast_df
 
-def forecasting_balance_sheet(df, is_forecast_df):
+def forecasting_balance_sheet(df, is_forecast_df, lookback_years=LOOKBACK_YEARS):
     """
     Forecasts the Balance Sheet positions.
     Depends on the historical dataframe and the forecasted Income Statement.
@@ -149,7 +219,7 @@ def forecasting_balance_sheet(df, is_forecast_df):
     dso_2024 = (val_receivables / last_revenue * 360) if last_revenue != 0 else 0
     
     # Calculate Ratios for other items (% of Sales)
-    recent_df = df.tail(3).copy()
+    recent_df = df.tail(lookback_years).copy()
     sum_revenue = recent_df[col_revenue].sum()
     
     def get_sum(col):
@@ -368,68 +438,251 @@ def forecast_cashflow(df, is_forecast_df, bs_forecast_df):
     
 #     return all_balanced
 
-def run_forecasting():
-    print("Forecasting data from Silver to Gold...")
-    
-    silver_dir = "data/silver"
-    gold_dir = "data/gold"
-    
-    if not os.path.exists(silver_dir):
-        print("Silver directory not found.")
-        return
-        
-    if not os.path.exists(gold_dir):
-        os.makedirs(gold_dir)
+def forecast_ticker(df, assumptions=None):
+    """
+    Forecasts IS, BS and CF for one Silver frame under assumptions (default: Assumptions()).
+    Returns the historical and forecast rows marked by a Type column, or None if
+    the Income Statement cannot be forecast.
+    """
+    a = assumptions or Assumptions()
+    df = df.sort_index()
 
-    files = [f for f in os.listdir(silver_dir) if f.endswith(".parquet")]
-    
-    for file_name in files:
-        ticker = file_name.replace(".parquet", "")
-        print(f"Forecasting {ticker}...")
-        
+    # Forecast Income Statement, Balance Sheet, and Cash Flow
+    is_forecast = forecasting_income_statement(df, a.forecast_years, a.lookback_years, a.tax_rate,
+                                               a.default_growth)
+    if is_forecast.empty:
+        return None
+
+    bs_forecast = forecasting_balance_sheet(df, is_forecast, a.lookback_years)
+    cf_forecast = forecast_cashflow(df, is_forecast, bs_forecast)
+
+    # Forecast Cash (updates bs_forecast in place)
+    # bs_forecast = forecast_cash(df, bs_forecast, cf_forecast)
+
+    # Check if balance sheet balances
+    # check_balance_sheet(bs_forecast, ticker)
+
+    # Combine Forecasts and Historical
+    forecast_df = pd.concat([is_forecast, bs_forecast, cf_forecast], axis=1)
+
+    df['Type'] = 'Historical'
+    forecast_df['Type'] = 'Forecast'
+
+    return pd.concat([df, forecast_df])
+
+def project_silver(df):
+    """
+    Keeps only the REQUIRED_COLUMNS of a Silver frame.
+    """
+    return df[[col for col in df.columns if col in REQUIRED_SET]]
+
+def read_silver_file(path, columns=None):
+    """
+    Reads one Silver file, optionally only the given columns (those it has).
+    """
+    if columns is not None:
+        names = set(pq.read_schema(path).names)
+        columns = [col for col in columns if col in names]
+    return pd.read_parquet(path, columns=columns)
+
+def _read_silver(ticker, lean=False):
+    path = os.path.join(SILVER_DIR, f"{ticker}.parquet")
+    df = read_silver_file(path, REQUIRED_COLUMNS if lean else None)
+    instrumentation.record_io(ticker, bytes_read=os.path.getsize(path))
+    return df
+
+def _read_silver_ttm(ticker, lean=False):
+    path = os.path.join(SILVER_TTM_DIR, f"{ticker}.parquet")
+    if not os.path.exists(path):
+        return None
+    df = read_silver_file(path, REQUIRED_COLUMNS if lean else None).sort_index()
+    instrumentation.record_io(ticker, bytes_read=os.path.getsize(path))
+    return df
+
+def with_ttm_base(df, ttm_df):
+    """
+    Appends the latest trailing-twelve-month row of a ticker to its annual
+    Silver frame when it is more recent than the last fiscal year, so the
+    forecast starts from the TTM base. The revenue CAGR counts the step from
+    the last fiscal year to the TTM row by its actual length, kept in
+    attrs["ttm_step"] (see ttm_step_years); every other step counts as one
+    year, even after a change of fiscal year end. Forecast years are the
+    twelve-month periods ending on the anniversaries of the TTM quarter end,
+    like the TTM row itself. The ratios average the TTM row with the last fiscal years although their
+    periods overlap, an approximation that weighs the overlap twice.
+    """
+    if ttm_df is None or 'Total Revenue' not in ttm_df.columns:
+        return df
+    latest = ttm_df[ttm_df['Total Revenue'].notna()].sort_index().tail(1)
+    if latest.empty or (not df.empty and latest.index[0] <= df.index.max()):
+        return df
+    combined = pd.concat([df, latest])
+    if not df.empty:
+        combined.attrs["ttm_step"] = ttm_step_years(df.index.max(), latest.index[0])
+    return combined
+
+def save_gold(ticker, df=None, assumptions=None, collect=None, lean=False):
+    """
+    Forecasts one ticker and writes its Gold file.
+    lean projects Silver onto REQUIRED_COLUMNS, computes the forecast in float64
+    from compact inputs and stores Gold with compact dtypes and a categorical Type.
+    """
+    # Read Silver data
+    if df is None:
+        df = _read_silver(ticker, lean)
+    elif lean:
+        df = project_silver(df)
+
+    if df.empty:
+        return "No data"
+
+    if lean:
+        df = compact_frame(df).astype("float64")
+    combined_df = forecast_ticker(df, assumptions)
+    if combined_df is None:
+        return "Could not forecast IS"
+    if lean:
+        combined_df = compact_frame(combined_df)
+        combined_df["Type"] = combined_df["Type"].astype(TYPE_DTYPE)
+    write_gold(ticker, combined_df, collect)
+
+def write_gold(ticker, combined_df, collect=None):
+    path = os.path.join(GOLD_DIR, f"{ticker}_forecast.parquet")
+    combined_df.to_parquet(path)
+    instrumentation.record_shape(ticker, *combined_df.shape)
+    instrumentation.record_io(ticker, bytes_written=os.path.getsize(path))
+    if collect is not None:
+        collect[ticker] = combined_df
+
+def gold_cache_keys(silver_hashes, assumptions=None, lean=False):
+    """
+    {ticker: ForecastCache key of its Gold frame} from {ticker: hash of its forecast input}.
+    """
+    from src.forecast_cache import cache_key
+
+    version = code_version(CODE_MODULES)
+    assumptions = assumptions or Assumptions()
+    return {ticker: cache_key(ticker, h, assumptions, version, "gold", lean) for ticker, h in silver_hashes.items()}
+
+def _save_loaded(ticker, load, assumptions, collect, lean):
+    # Loading runs inside run_ticker, so a broken Silver file fails only its ticker
+    return save_gold(ticker, load(ticker), assumptions, collect, lean)
+
+def _forecast_tickers(tickers, load, assumptions, gold_panel, lean, keys=None):
+    """
+    Forecasts and writes the Gold file of every ticker from load(ticker), its
+    Silver frame or None to read its Silver file. With keys ({ticker:
+    cache key}, see gold_cache_keys), Gold frames cached by an earlier run
+    are written without reading Silver or forecasting, and new ones are cached.
+    """
+    from src import gold_store
+    from src.forecast_cache import FrameList, default_cache
+
+    collect = {} if gold_panel or keys else None
+    cached = {}
+    if keys:
+        batch, found = default_cache().get(list(keys.values()))
+        ticker_of = {key: ticker for ticker, key in keys.items()}
+        cached = {ticker_of[key]: df for key, df in zip(found, batch.frames)} if batch is not None else {}
+
+    outcomes = [run_ticker(write_gold, ticker, cached[ticker], collect) if ticker in cached
+                else run_ticker(_save_loaded, ticker, load, assumptions, collect, lean)
+                for ticker in tickers]
+    if keys:
+        new = [ticker for ticker in collect if ticker not in cached]
+        default_cache().put([keys[ticker] for ticker in new], FrameList([collect[ticker] for ticker in new]))
+    if gold_panel and collect:
         try:
-            # Read Silver data
-            df = pd.read_parquet(os.path.join(silver_dir, file_name))
-            
-            if df.empty:
-                print(f"No data for {ticker}")
-                continue
-            
-            df = df.sort_index()
-            
-            # Forecast Income Statement, Balance Sheet, and Cash Flow
-            is_forecast = forecasting_income_statement(df)
-            if is_forecast.empty:
-                print(f"  Could not forecast IS for {ticker}")
-                continue
-                
-            bs_forecast = forecasting_balance_sheet(df, is_forecast)
-            cf_forecast = forecast_cashflow(df, is_forecast, bs_forecast)
-            
-            # Forecast Cash (updates bs_forecast in place)
-            # bs_forecast = forecast_cash(df, bs_forecast, cf_forecast)
-            
-            # Check if balance sheet balances
-            # print(f"  Checking balance sheet for {ticker}...")
-            # check_balance_sheet(bs_forecast, ticker)
-            
-            # Combine Forecasts and Historical
-            forecast_df = pd.concat([is_forecast, bs_forecast, cf_forecast], axis=1)
-            
-            df['Type'] = 'Historical'
-            forecast_df['Type'] = 'Forecast'
-            
-            combined_df = pd.concat([df, forecast_df])
-            
-            # Save to Gold
-            output_path = os.path.join(gold_dir, f"{ticker}_forecast.parquet")
-            combined_df.to_parquet(output_path)
-            print(f"  Saved forecast for {ticker} to Gold layer")
-            
+            gold_store.write_panel(collect)
         except Exception as e:
-            print(f"Error forecasting {ticker}: {e}")
-            import traceback
-            traceback.print_exc()
+            detail = (f"{type(e).__name__}: {e}", traceback.format_exc())
+            outcomes = [(t, ERROR, detail) if t in collect else (t, status, d) for t, status, d in outcomes]
+    return outcomes
+
+def _forecast_chunk(tickers, assumptions=None, gold_panel=False, lean=False, ttm=False, cache=False):
+    keys = None
+    if cache:
+        # File hashes identify the inputs without parsing Silver
+        silver_dirs = [SILVER_DIR, SILVER_TTM_DIR] if ttm else [SILVER_DIR]
+        hashes = {t: digest(*[file_hash(os.path.join(d, f"{t}.parquet")) for d in silver_dirs]) for t in tickers}
+        keys = gold_cache_keys(hashes, assumptions, lean)
+    if not ttm:
+        return _forecast_tickers(tickers, lambda ticker: None, assumptions, gold_panel, lean, keys)
+    return _forecast_tickers(tickers, lambda ticker: with_ttm_base(_read_silver(ticker, lean),
+                                                                   _read_silver_ttm(ticker, lean)),
+                             assumptions, gold_panel, lean, keys)
+
+def _forecast_panel_chunk(tickers, assumptions=None, gold_panel=False, lean=False, ttm=False, cache=False):
+    frames = silver_store.read_panel_frames(columns=REQUIRED_COLUMNS if lean else None, tickers=tickers)
+    if ttm:
+        bases = load_silver(tickers, "panel", REQUIRED_COLUMNS if lean else None, ttm=True)
+        frames = {ticker: with_ttm_base(df, bases.get(ticker)) for ticker, df in frames.items()}
+    if lean:
+        frames = {ticker: compact_frame(df) for ticker, df in frames.items()}
+    # The panel is read anyway; the frames' content identifies the forecast input
+    keys = gold_cache_keys({t: frame_hash(df) for t, df in frames.items()}, assumptions, lean) if cache else None
+    return _forecast_tickers(tickers, lambda ticker: frames.get(ticker, pd.DataFrame()), assumptions, gold_panel,
+                             lean, keys)
+
+def list_silver_tickers(silver_layout="files"):
+    if silver_layout == "panel":
+        return silver_store.list_panel_tickers()
+    return sorted(f.replace(".parquet", "") for f in os.listdir(SILVER_DIR) if f.endswith(".parquet"))
+
+def load_silver(tickers=None, silver_layout="files", columns=None, ttm=False):
+    """
+    Reads Silver as {ticker: frame} from either layout, optionally only the given columns.
+    ttm reads the trailing-twelve-month Silver instead of the annual one.
+    """
+    if silver_layout == "panel":
+        panel_dir = silver_store.TTM_PANEL_DIR if ttm else silver_store.PANEL_DIR
+        return silver_store.read_panel_frames(columns=columns, tickers=tickers, panel_dir=panel_dir)
+    silver_dir = SILVER_TTM_DIR if ttm else SILVER_DIR
+    if not os.path.exists(silver_dir):
+        return {}
+    if tickers is None:
+        tickers = sorted(f.replace(".parquet", "") for f in os.listdir(silver_dir) if f.endswith(".parquet"))
+    return {
+        ticker: read_silver_file(os.path.join(silver_dir, f"{ticker}.parquet"), columns).sort_index()
+        for ticker in tickers
+        if os.path.exists(os.path.join(silver_dir, f"{ticker}.parquet"))
+    }
+
+def run_forecasting(max_workers=1, chunksize=None, tickers=None, silver_layout="files", assumptions=None,
+                    gold_panel=False, lean=False, ttm=False, cache=False):
+    """
+    Builds the Gold layer from Silver under assumptions (default: Assumptions()).
+    silver_layout selects the input: "files" (one parquet per ticker) or "panel";
+    with the panel, only the buckets and row groups of the requested tickers are read.
+    gold_panel also upserts the forecasts into the consolidated, queryable Gold
+    dataset (src/gold_store.py). lean reads only REQUIRED_COLUMNS from Silver
+    and stores compact Gold (see save_gold). ttm forecasts from the latest
+    trailing-twelve-month row where it is newer than the last fiscal year (see
+    with_ttm_base); build it with run_processing(quarterly=True). cache reuses
+    the Gold frames of tickers whose Silver and assumptions match an earlier
+    cached run (src/forecast_cache.py), so switching back to earlier
+    assumptions or changing a few tickers only forecasts what changed.
+    Tickers are forecast in chunks, in a pool of max_workers processes when
+    max_workers > 1. Returns a StageResult with per-ticker outcomes.
+    """
+    print("Forecasting data from Silver to Gold...")
+
+    silver_path = silver_store.PANEL_DIR if silver_layout == "panel" else SILVER_DIR
+    if not os.path.exists(silver_path):
+        print("Silver directory not found.")
+        return None
+
+    os.makedirs(GOLD_DIR, exist_ok=True)
+    if tickers is None:
+        tickers = list_silver_tickers(silver_layout)
+
+    # Chunks own whole buckets whenever a panel is read or written
+    key = silver_store.ticker_bucket if silver_layout == "panel" or gold_panel else None
+    chunk_func = _forecast_panel_chunk if silver_layout == "panel" else _forecast_chunk
+    result = run_chunked("forecasting", chunk_func, tickers, max_workers, chunksize,
+                         args=(assumptions, gold_panel, lean, ttm, cache), key=key)
+    print(result.summary())
+    return result
 
 
 if __name__ == "__main__":
@@ -0,0 +1,309 @@
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import glob
+import operator
+import os
+from src import instrumentation
+from src.silver_store import KEY_COLUMNS, ROW_GROUP_SIZE, open_dataset, ticker_bucket
+
+GOLD_DIR = "data/gold"
+PANEL_DIR = "data/gold_panel"
+TYPE_COL = "Type"
+YEAR_COL = "Forecast Year"
+REVENUE = "Total Revenue"
+
+# Screening metrics derived from the forecast: {name: (numerator, denominator)}
+MARGINS = {
+    "UFCF Margin": ("UFCF", REVENUE),
+    "EBITDA Margin": ("EBITDA", REVENUE),
+    "EBIT Margin": ("EBIT", REVENUE),
+    "Net Margin": ("Net Income", REVENUE),
+}
+GROWTH = "Revenue Growth"
+
+# Columns with per-ticker statistics in the summary: min/max over all rows and
+# the value of every forecast year
+INDEXED_COLUMNS = [REVENUE, "EBITDA", "Net Income", "UFCF", *MARGINS, GROWTH]
+
+OPERATORS = {
+    "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le,
+    ">": operator.gt, ">=": operator.ge,
+}
+
+def _bucket_dir(bucket):
+    return os.path.join(PANEL_DIR, f"bucket={bucket}")
+
+def add_metrics(panel):
+    """
+    Adds the Forecast Year column (0 for historical rows, 1..n for forecast
+    rows) and the screening metrics to Gold rows indexed by (ticker, period_end)
+    and sorted, for all tickers at once.
+    """
+    panel = panel.copy()
+    is_forecast = (panel[TYPE_COL] == "Forecast").astype("int32")
+    panel[YEAR_COL] = is_forecast.groupby(level="ticker").cumsum().where(is_forecast == 1, 0).astype("int32")
+
+    revenue = panel[REVENUE] if REVENUE in panel.columns else pd.Series(np.nan, index=panel.index)
+    for name, (numerator, denominator) in MARGINS.items():
+        if numerator in panel.columns:
+            panel[name] = panel[numerator] / revenue.where(revenue != 0)
+    previous = revenue.groupby(level="ticker").shift(1)
+    panel[GROWTH] = revenue / previous.where(previous > 0) - 1
+    return panel
+
+def _to_table(frames):
+    panel = pd.concat({ticker: df.sort_index() for ticker, df in frames.items()}, names=KEY_COLUMNS)
+    panel = add_metrics(panel.sort_index())
+    for col in panel.columns:
+        if col not in (TYPE_COL, YEAR_COL) and panel[col].dtype != "float64":
+            panel[col] = pd.to_numeric(panel[col], errors="coerce").astype("float64")
+    panel[TYPE_COL] = panel[TYPE_COL].astype(str)
+
+    table = pa.Table.from_pandas(panel.reset_index(), preserve_index=False).replace_schema_metadata(None)
+    period_end = table.schema.get_field_index("period_end")
+    return table.set_column(period_end, "period_end", table.column("period_end").cast(pa.timestamp("ms")))
+
+def summarize(table):
+    """
+    Per-ticker summary of a Gold panel table: forecast horizon, last historical
+    period, and for every indexed column its min and max over all rows plus
+    its value in each forecast year ("<column> Y<n>").
+    """
+    columns = ["ticker", "period_end", TYPE_COL, YEAR_COL] + [c for c in INDEXED_COLUMNS if c in table.column_names]
+    df = table.select(columns).to_pandas()
+    indexed = [c for c in INDEXED_COLUMNS if c in df.columns]
+    grouped = df.groupby("ticker", sort=True)
+
+    summary = pd.DataFrame({
+        "bucket": [ticker_bucket(t) for t in grouped.size().index],
+        "forecast_years": grouped[YEAR_COL].max().astype("int32"),
+        "last_historical": df[df[TYPE_COL] == "Historical"].groupby("ticker")["period_end"].max(),
+    }, index=grouped.size().index)
+    if indexed:
+        summary = summary.join(grouped[indexed].min().add_suffix(" min"))
+        summary = summary.join(grouped[indexed].max().add_suffix(" max"))
+        by_year = df[df[YEAR_COL] > 0].pivot(index="ticker", columns=YEAR_COL, values=indexed)
+        by_year.columns = [f"{col} Y{year}" for col, year in by_year.columns]
+        summary = summary.join(by_year)
+    return summary.rename_axis("ticker").reset_index()
+
+def write_panel(frames):
+    """
+    Upserts {ticker: Gold frame} into the consolidated Gold dataset.
+    Like the Silver panel, rows live in hash buckets sorted by (ticker,
+    period_end) and only the buckets of the given tickers are rewritten.
+    Each bucket also keeps summary.arrow with the per-ticker statistics of
+    summarize(), which screens read instead of the rows. The summaries are
+    uncompressed Arrow IPC files: wide and small, so they load several times
+    faster than Parquet. Metrics and statistics are computed once for all
+    frames and then split by bucket.
+    """
+    table = _to_table(frames)
+    summary = pa.Table.from_pandas(summarize(table))
+    row_buckets = pa.array([ticker_bucket(t) for t in table.column("ticker").to_pylist()], pa.int32())
+
+    for bucket in sorted(set(summary.column("bucket").to_pylist())):
+        tickers = pa.array(sorted(t for t in frames if ticker_bucket(t) == bucket))
+        bucket_table = table.filter(pc.equal(row_buckets, bucket))
+        bucket_summary = summary.filter(pc.equal(summary.column("bucket"), bucket))
+
+        path = os.path.join(_bucket_dir(bucket), "part-0.parquet")
+        summary_path = os.path.join(_bucket_dir(bucket), "summary.arrow")
+        if os.path.exists(path):
+            existing = pq.read_table(path)
+            keep = pc.invert(pc.is_in(existing.column("ticker"), tickers))
+            bucket_table = pa.concat_tables([existing.filter(keep), bucket_table], promote_options="permissive")
+        if os.path.exists(summary_path):
+            existing = feather.read_table(summary_path)
+            keep = pc.invert(pc.is_in(existing.column("ticker"), tickers))
+            bucket_summary = pa.concat_tables([existing.filter(keep), bucket_summary], promote_options="permissive")
+
+        bucket_table = bucket_table.sort_by([("ticker", "ascending"), ("period_end", "ascending")])
+        bucket_summary = bucket_summary.sort_by("ticker")
+
+        os.makedirs(_bucket_dir(bucket), exist_ok=True)
+        for target, write in [
+            (path, lambda p: pq.write_table(bucket_table, p, row_group_size=ROW_GROUP_SIZE)),
+            (summary_path, lambda p: feather.write_feather(bucket_summary, p, compression="uncompressed")),
+        ]:
+            tmp_path = target + ".tmp"
+            write(tmp_path)
+            os.replace(tmp_path, target)
+        instrumentation.record_io(None, bytes_written=os.path.getsize(path) + os.path.getsize(summary_path))
+
+def consolidate(tickers=None):
+    """
+    Builds the consolidated dataset from the per-ticker Gold files.
+    """
+    files = sorted(f for f in os.listdir(GOLD_DIR) if f.endswith("_forecast.parquet"))
+    frames = {}
+    for file_name in files:
+        ticker = file_name.replace("_forecast.parquet", "")
+        if tickers is None or ticker in tickers:
+            frames[ticker] = pd.read_parquet(os.path.join(GOLD_DIR, file_name))
+    if frames:
+        write_panel(frames)
+    print(f"Consolidated {len(frames)} Gold files into {PANEL_DIR}")
+    return sorted(frames)
+
+def stale_tickers(tickers=None):
+    """
+    Tickers whose Gold file is missing from the consolidated dataset or was
+    written after their bucket, e.g. by a forecast run without gold_panel.
+    """
+    if not os.path.exists(GOLD_DIR):
+        return []
+    listed = set(list_gold_tickers()) if os.path.exists(PANEL_DIR) else set()
+    stale = []
+    for file_name in sorted(f for f in os.listdir(GOLD_DIR) if f.endswith("_forecast.parquet")):
+        ticker = file_name.replace("_forecast.parquet", "")
+        if tickers is not None and ticker not in tickers:
+            continue
+        bucket_path = os.path.join(_bucket_dir(ticker_bucket(ticker)), "part-0.parquet")
+        if (ticker not in listed or not os.path.exists(bucket_path)
+                or os.stat(os.path.join(GOLD_DIR, file_name)).st_mtime_ns > os.stat(bucket_path).st_mtime_ns):
+            stale.append(ticker)
+    return stale
+
+def refresh():
+    """
+    Brings the consolidated dataset up to date with the Gold files: only the
+    stale tickers are consolidated. Returns them.
+    """
+    stale = stale_tickers()
+    return consolidate(set(stale)) if stale else []
+
+_cache = {}
+
+def _cached(name, pattern, load):
+    """
+    load(files) for the bucket files matching pattern, kept in memory until
+    one of them changes.
+    """
+    files = sorted(glob.glob(os.path.join(PANEL_DIR, "bucket=*", pattern)))
+    stamps = tuple((f, os.stat(f).st_mtime_ns) for f in files)
+    if name not in _cache or _cache[name][0] != stamps:
+        _cache[name] = (stamps, load(files))
+    return _cache[name][1]
+
+def _load_summary(files):
+    if not files:
+        return pd.DataFrame()
+    tables = [feather.read_table(f, memory_map=True) for f in files]
+    return pa.concat_tables(tables, promote_options="permissive").to_pandas().set_index("ticker").sort_index()
+
+def read_summary():
+    """
+    Per-ticker summary statistics of the whole dataset, indexed by ticker.
+    """
+    return _cached("summary", "summary.arrow", _load_summary)
+
+def list_gold_tickers():
+    return read_summary().index.tolist()
+
+def _summary_mask(summary, filters, year):
+    """
+    Tickers that can match all filters according to the summary. With a year,
+    filters on indexed columns are decided exactly from "<column> Y<year>";
+    otherwise a ticker is skipped when its min/max range rules the filter out.
+    """
+    mask = pd.Series(True, index=summary.index)
+    for column, op, value in filters:
+        if year is not None and f"{column} Y{year}" in summary.columns:
+            mask &= OPERATORS[op](summary[f"{column} Y{year}"], value).fillna(False)
+        elif f"{column} min" in summary.columns:
+            low, high = summary[f"{column} min"], summary[f"{column} max"]
+            if op in (">", ">="):
+                mask &= OPERATORS[op](high, value).fillna(False)
+            elif op in ("<", "<="):
+                mask &= OPERATORS[op](low, value).fillna(False)
+            elif op == "==":
+                mask &= ((low <= value) & (high >= value)).fillna(False)
+    return mask
+
+def query(filters=None, columns=None, tickers=None, year=None, row_type=None):
+    """
+    Rows of the consolidated Gold dataset as a DataFrame indexed by (ticker, period_end).
+    filters is a list of (column, op, value) conditions that must all hold, with op
+    one of ==, !=, <, <=, >, >=; year selects one forecast year (1 = first) and
+    row_type "Historical" or "Forecast" rows. columns projects the result.
+    The summary first narrows the candidate tickers, so only their buckets are
+    opened; the conditions are then pushed down to the Parquet reader.
+    """
+    filters = list(filters or [])
+    for _, op, _ in filters:
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator {op!r}, expected one of {sorted(OPERATORS)}")
+
+    summary = read_summary()
+    if summary.empty:
+        return pd.DataFrame()
+    candidates = summary.index[_summary_mask(summary, filters, year)]
+    if tickers is not None:
+        candidates = candidates.intersection(pd.Index(list(tickers)))
+    if len(candidates) == 0:
+        return pd.DataFrame()
+
+    dataset = _cached("dataset", "part-0.parquet", lambda files: open_dataset(PANEL_DIR))
+    names = dataset.schema.names
+    missing = [c for c, _, _ in filters if c not in names]
+    if missing:
+        raise KeyError(f"Unknown Gold columns: {missing}")
+
+    expr = ds.scalar(True)
+    if len(candidates) < len(summary):
+        expr &= ds.field("bucket").isin(sorted({ticker_bucket(t) for t in candidates}))
+        expr &= ds.field("ticker").isin(candidates.tolist())
+    if year is not None:
+        expr &= ds.field(YEAR_COL) == int(year)
+    if row_type is not None:
+        expr &= ds.field(TYPE_COL) == row_type
+    for column, op, value in filters:
+        expr &= OPERATORS[op](ds.field(column), value)
+
+    if columns is None:
+        columns = [c for c in names if c not in KEY_COLUMNS and c != "bucket"]
+    selected = KEY_COLUMNS + list(dict.fromkeys(c for c in [TYPE_COL, YEAR_COL, *columns] if c in names))
+
+    table = dataset.to_table(columns=selected, filter=expr)
+    instrumentation.record_io(None, bytes_read=table.nbytes)
+    df = table.to_pandas()
+    df["period_end"] = pd.to_datetime(df["period_end"])
+    return df.set_index(KEY_COLUMNS).sort_index()
+
+def top_k(metric, k=50, year=None, ascending=False, filters=None, tickers=None, columns=None):
+    """
+    The k rows with the highest (or, with ascending=True, lowest) metric that
+    match filters. With a year the result has one row per ticker, indexed by
+    ticker; when the metric and every filter column are indexed it is answered
+    from the summary alone, and columns are then fetched for the k winners only.
+    Without a year, rows of any period compete.
+    """
+    filters = list(filters or [])
+    summary = read_summary()
+    indexed = lambda column: year is not None and f"{column} Y{year}" in summary.columns
+
+    if indexed(metric) and all(indexed(column) for column, _, _ in filters):
+        selected = summary[_summary_mask(summary, filters, year)]
+        if tickers is not None:
+            selected = selected[selected.index.isin(list(tickers))]
+        values = selected[f"{metric} Y{year}"].dropna()
+        best = values.nsmallest(k) if ascending else values.nlargest(k)
+        result = best.rename(metric).to_frame()
+        if columns:
+            rows = query(columns=columns, tickers=result.index, year=year).droplevel("period_end")
+            result = result.join(rows[[c for c in columns if c in rows.columns and c != metric]])
+        return result
+
+    rows = query(filters, [metric, *(columns or [])], tickers, year)
+    if rows.empty:
+        return rows
+    rows = rows.dropna(subset=[metric])
+    best = rows.nsmallest(k, metric) if ascending else rows.nlargest(k, metric)
+    return best.droplevel("period_end") if year is not None else best
@@ -1,30 +1,282 @@
-import yfinance as yf
-import json
-import os
+import random
+import threading
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from src import bronze, bronze_io, instrumentation, snapshots
+from src.journal import DONE, FAILED, PENDING, QUARANTINED, Journal
+from src.parallel import DONE as DONE_OUTCOME, ERROR
 
-def run_ingestion(tickers):
-    print(f"Ingesting data for: {tickers}")
-    for ticker in tickers:
+# Bronze file name -> yfinance Ticker attribute
+STATEMENTS = {
+    "balance_sheet": "balance_sheet",
+    "income_statement": "financials",
+    "cashflow": "cashflow",
+}
+QUARTERLY_STATEMENTS = {
+    "quarterly_balance_sheet": "quarterly_balance_sheet",
+    "quarterly_income_statement": "quarterly_financials",
+    "quarterly_cashflow": "quarterly_cashflow",
+}
+
+# Fetch attempts per ticker before it is quarantined, and the retry backoff
+MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 1.0
+RETRY_CAP_SECONDS = 60.0
+
+class RateLimiter:
+    """
+    Global requests-per-second limiter shared by all ingestion workers.
+    Hands out evenly spaced time slots; None or 0 disables limiting.
+    """
+    def __init__(self, requests_per_second=None):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            slot = max(self._next_slot, time.monotonic())
+            self._next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+def fetch_yahoo(ticker, limiter, quarterly=False, session=None):
+    """
+    Default fetcher. Reads every statement from yfinance exactly once.
+    A fetcher takes (ticker, limiter) and returns {bronze name: DataFrame};
+    quarterly=True also fetches the quarterly statements. session is the HTTP
+    session shared by all fetches of a run (see bronze_io.make_session).
+    """
+    import yfinance as yf  # imported here so stages that never fetch don't pay for it
+
+    stock = yf.Ticker(ticker, session=session)
+    statements = {}
+    attrs = {**STATEMENTS, **QUARTERLY_STATEMENTS} if quarterly else STATEMENTS
+    for name, attr in attrs.items():
+        limiter.wait()
+        statements[name] = getattr(stock, attr)
+    return statements
+
+def fetch_http(ticker, limiter, quarterly=False, session=None, base_url="http://127.0.0.1:8000"):
+    """
+    Fetcher for a stand-in statement server that serves the Bronze JSON layout
+    at {base_url}/<TICKER>/<statement>.json, e.g. `python -m http.server` run in
+    a copy of data/bronze. Lets ingestion run end to end offline. session is
+    anything with get(url), such as a pooled session or a fake one in tests;
+    by default every ticker opens its own connections. A missing quarterly
+    statement is skipped; a missing annual one is an error.
+    """
+    get = session.get if session is not None else bronze_io.make_session(impersonate=False).get
+    statements = {}
+    names = {**STATEMENTS, **QUARTERLY_STATEMENTS} if quarterly else STATEMENTS
+    for name in names:
+        limiter.wait()
+        response = get(f"{base_url}/{ticker}/{name}.json")
+        if response.status_code == 404 and name in QUARTERLY_STATEMENTS:
+            continue
+        response.raise_for_status()
+        df = bronze.json_to_frame(response.json())
+        # Bronze stores dates x line items; fetchers return yfinance's line items x dates
+        statements[name] = df.T if df is not None else pd.DataFrame()
+    return statements
+
+def backoff_delay(attempt, base=RETRY_BASE_SECONDS, cap=RETRY_CAP_SECONDS):
+    """
+    Seconds to wait after failed attempt number `attempt` (1-based): exponential
+    in the attempt, capped, with full jitter (uniform between 0 and the capped
+    delay) so tickers that failed together do not all retry together.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+def fetch_with_retries(ticker, fetcher, limiter, journal, max_attempts=MAX_ATTEMPTS, retry_base=RETRY_BASE_SECONDS,
+                       retry_cap=RETRY_CAP_SECONDS):
+    """
+    Calls the fetcher until it succeeds, recording every failure in the journal.
+    Attempts count across runs; after max_attempts the ticker is quarantined
+    and the last error is raised.
+    """
+    while True:
         try:
-            print(f"Fetching data for {ticker}...")
-            stock = yf.Ticker(ticker)
-            
-            # Fetch data and save to Bronze
-            balance_sheet = stock.balance_sheet.to_json() if not stock.balance_sheet.empty else "{}"
-            income_statement = stock.financials.to_json() if not stock.financials.empty else "{}"
-            cashflow = stock.cashflow.to_json() if not stock.cashflow.empty else "{}"
-            
-            base_path = f"data/bronze/{ticker}"
-            os.makedirs(base_path, exist_ok=True)
-            
-            with open(f"{base_path}/balance_sheet.json", "w") as f:
-                f.write(balance_sheet)
-            with open(f"{base_path}/income_statement.json", "w") as f:
-                f.write(income_statement)
-            with open(f"{base_path}/cashflow.json", "w") as f:
-                f.write(cashflow)
-                
-            print(f"Saved raw data for {ticker}")
-            
+            return fetcher(ticker, limiter)
         except Exception as e:
-            print(f"Error ingesting {ticker}: {e}")
+            attempt = journal.attempts(ticker) + 1
+            reason = f"{type(e).__name__}: {e}"
+            if attempt >= max_attempts:
+                journal.mark(ticker, QUARANTINED, reason, attempt)
+                raise
+            journal.mark(ticker, FAILED, reason, attempt)
+            delay = backoff_delay(attempt, retry_base, retry_cap)
+            print(f"Fetching {ticker} failed ({reason}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def start_journal(journal, tickers, resume):
+    """
+    With resume, the tickers of the journal that are not done or quarantined;
+    otherwise every ticker, with its journal entry reset to pending.
+    """
+    if not resume:
+        journal.mark_many(tickers, PENDING, attempts=0)
+        return tickers
+    remaining = journal.remaining(tickers)
+    finished = journal.counts(set(tickers) - set(remaining))
+    print(f"Resuming ingestion: {len(remaining)} of {len(tickers)} tickers left "
+          f"({finished.get(DONE, 0)} done, {finished.get(QUARANTINED, 0)} quarantined)")
+    return remaining
+
+def fetch_failed(journal, ticker, e):
+    """
+    Records a fetch that failed for good and returns the reason.
+    """
+    reason = f"{type(e).__name__}: {e}"
+    if journal.state(ticker) == QUARANTINED:
+        return f"quarantined after {journal.attempts(ticker)} attempts: {reason}"
+    journal.mark(ticker, FAILED, reason)
+    return reason
+
+def ingest_ticker(ticker, fetcher, limiter, bronze_format, journal, retry, bronze_writer, writer=None,
+                  snapshot_errors=None):
+    with instrumentation.stage_context("ingestion"), instrumentation.span(ticker=ticker):
+        print(f"Fetching data for {ticker}...")
+        statements = fetch_with_retries(ticker, fetcher, limiter, journal, *retry)
+        if writer is not None:
+            # Queued ahead of the Bronze write, so a failed snapshot is known when the write completes
+            bronze_writer.submit(writer.add, ticker, statements,
+                                 callback=partial(_snapshot_saved, snapshot_errors, ticker))
+        if bronze_format == "json":
+            bronze.write_json(ticker, statements, bronze_writer, partial(_saved, journal, snapshot_errors, ticker))
+    return statements
+
+def _snapshot_saved(snapshot_errors, ticker, error):
+    if error is not None:
+        snapshot_errors[ticker] = f"snapshot {type(error).__name__}: {error}"
+
+def _saved(journal, snapshot_errors, ticker, error):
+    # Outcomes are recorded once the Bronze write (and snapshot) is known to have succeeded or failed
+    reason = f"{type(error).__name__}: {error}" if error is not None else (snapshot_errors or {}).get(ticker)
+    if reason is not None:
+        journal.mark(ticker, FAILED, reason)
+        instrumentation.record_outcome("ingestion", ticker, ERROR, reason)
+        print(f"Error saving {ticker}: {reason}")
+        return
+    journal.mark(ticker, DONE, attempts=journal.attempts(ticker) + 1)
+    instrumentation.record_outcome("ingestion", ticker, DONE_OUTCOME)
+    print(f"Saved raw data for {ticker}")
+
+def run_ingestion(tickers, max_workers=1, requests_per_second=None, fetcher=fetch_yahoo,
+                  bronze_format="json", parquet_batch_size=500, quarterly=False, resume=False,
+                  max_attempts=MAX_ATTEMPTS, retry_base=RETRY_BASE_SECONDS, retry_cap=RETRY_CAP_SECONDS,
+                  journal=None, snapshot=False, session=None):
+    """
+    Fetches and saves the statements of every ticker to Bronze.
+    Tickers are fetched concurrently by max_workers threads, all sharing a single
+    requests_per_second limit. fetcher can be swapped for a local fake provider,
+    or be fetch_http for a stand-in statement server. The built-in fetchers
+    share one pooled HTTP session, session or bronze_io.make_session(); custom
+    fetchers are called with session=session only when one is given.
+    With bronze_format="parquet", fetched tickers are buffered and written as one
+    Parquet file per parquet_batch_size tickers instead of three JSON files each.
+    quarterly also fetches the quarterly statements: the fetcher is called with
+    quarterly=True and returns them under their quarterly_* Bronze names.
+
+    Per-ticker state is kept in a durable journal (src/journal.py, default
+    data/ingestion_journal.jsonl). A ticker is done once its Bronze data is
+    written: once its files are written for JSON, when its batch is flushed
+    for Parquet. Bronze files, Parquet batches and snapshots are written by a
+    bronze_io.BackgroundWriter, so fetching never waits on the disk.
+    Failed fetches are retried after backoff_delay(attempt, retry_base, retry_cap);
+    after max_attempts in total a ticker is quarantined. resume skips the done
+    and quarantined tickers and keeps the attempt counts of the others; without
+    it the journal entries of the given tickers start over.
+
+    snapshot also records the run in the content-addressed snapshot store
+    (src/snapshots.py): only statements that changed since the previous
+    snapshot are stored, and processing can later rebuild Silver as of any
+    snapshot. A ticker whose snapshot cannot be written is marked failed, so
+    a resumed run fetches it again. Returns the journal.
+    """
+    journal = journal or Journal()
+    tickers = start_journal(journal, tickers, resume)
+
+    print(f"Ingesting data for: {tickers}")
+    limiter = RateLimiter(requests_per_second)
+    if session is None and getattr(fetcher, "func", fetcher) in (fetch_yahoo, fetch_http):
+        session = bronze_io.make_session(max(bronze_io.POOL_SIZE, max_workers))
+    if session is not None:
+        fetcher = partial(fetcher, session=session)
+    if quarterly:
+        fetcher = partial(fetcher, quarterly=True)
+    retry = (max_attempts, retry_base, retry_cap)
+    writer = snapshots.SnapshotWriter() if snapshot else None
+    bronze_writer = bronze_io.BackgroundWriter(stage="ingestion")
+    snapshot_errors = {}
+    pending = {}
+
+    with instrumentation.span("ingestion"), instrumentation.stage_context("ingestion"):
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                futures = {executor.submit(ingest_ticker, ticker, fetcher, limiter, bronze_format, journal, retry,
+                                           bronze_writer, writer, snapshot_errors): ticker
+                           for ticker in tickers}
+                for future in as_completed(futures):
+                    ticker = futures[future]
+                    try:
+                        statements = future.result()
+                    except Exception as e:
+                        reason = fetch_failed(journal, ticker, e)
+                        print(f"Error ingesting {ticker}: {reason}")
+                        instrumentation.record_outcome("ingestion", ticker, ERROR, reason)
+                        continue
+
+                    if bronze_format == "parquet":
+                        pending[ticker] = statements
+                        if len(pending) >= parquet_batch_size:
+                            bronze_writer.submit(_flush_parquet, pending, journal, snapshot_errors,
+                                                 callback=partial(_batch_saved, journal, snapshot_errors,
+                                                                  list(pending)))
+                            pending = {}
+
+            if pending:
+                bronze_writer.submit(_flush_parquet, pending, journal, snapshot_errors,
+                                     callback=partial(_batch_saved, journal, snapshot_errors, list(pending)))
+        finally:
+            # Waits for every queued write, so the journal and snapshot below are complete
+            bronze_writer.close()
+        if writer is not None:
+            writer.close()
+            print(f"Snapshot {writer.snapshot_id}: {writer.changed} statements changed")
+            if snapshot_errors:
+                print(f"Snapshot {writer.snapshot_id} is missing {len(snapshot_errors)} tickers; "
+                      f"they are marked failed in the journal")
+
+    counts = journal.counts(tickers)
+    print("Ingestion journal: " + ", ".join(f"{n} {state}" for state, n in sorted(counts.items())))
+    journal.compact()
+    return journal
+
+def _flush_parquet(pending, journal, snapshot_errors):
+    path = bronze.write_parquet_batch(pending)
+    print(f"Saved raw data for {len(pending)} tickers to {path}")
+    saved = [ticker for ticker in pending if ticker not in snapshot_errors]
+    journal.mark_many(saved, DONE, attempts={ticker: journal.attempts(ticker) + 1 for ticker in saved})
+
+def _batch_saved(journal, snapshot_errors, tickers, error):
+    if error is None:
+        # _flush_parquet marked them done, except the tickers whose snapshot failed
+        for ticker in tickers:
+            if ticker in snapshot_errors:
+                journal.mark(ticker, FAILED, snapshot_errors[ticker])
+                instrumentation.record_outcome("ingestion", ticker, ERROR, snapshot_errors[ticker])
+                print(f"Error saving {ticker}: {snapshot_errors[ticker]}")
+            else:
+                instrumentation.record_outcome("ingestion", ticker, DONE_OUTCOME)
+        return
+    reason = f"{type(error).__name__}: {error}"
+    journal.mark_many(tickers, FAILED, reason)
+    for ticker in tickers:
+        instrumentation.record_outcome("ingestion", ticker, ERROR, reason)
+    print(f"Error saving a Parquet batch of {len(tickers)} tickers: {reason}")
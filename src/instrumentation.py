@@ -0,0 +1,236 @@
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+METRICS_DIR = "data/metrics"
+PROFILE_ENV = "PIPELINE_PROFILE_TICKER"
+
+_local = threading.local()
+
+@contextmanager
+def stage_context(stage):
+    """
+    Labels every event emitted by this thread inside the block with stage.
+    """
+    previous = getattr(_local, "stage", None)
+    _local.stage = stage
+    try:
+        yield
+    finally:
+        _local.stage = previous
+
+def current_stage():
+    """
+    The stage of this thread, for handing it on to threads it starts.
+    """
+    return getattr(_local, "stage", None)
+
+class Recorder:
+    """
+    Collects the metric events of this process.
+    Events are plain dicts so they can travel back from pool workers.
+    """
+    def __init__(self):
+        self.events = []
+        self.enabled = True
+        self._lock = threading.Lock()
+
+    def emit(self, event):
+        if not self.enabled:
+            return
+        if event.get("stage") is None:
+            event["stage"] = getattr(_local, "stage", None)
+        with self._lock:
+            self.events.append(event)
+
+    def mark(self):
+        with self._lock:
+            return len(self.events)
+
+    def take(self, mark=0):
+        """
+        Removes and returns the events recorded since mark.
+        """
+        with self._lock:
+            events = self.events[mark:]
+            del self.events[mark:]
+        return events
+
+    def extend(self, events):
+        with self._lock:
+            self.events.extend(events)
+
+RECORDER = Recorder()
+
+def set_recording(enabled):
+    """
+    Switches event recording of this process on or off, e.g. off in a
+    long-running process that never exports metrics.
+    """
+    RECORDER.enabled = enabled
+
+def set_profile_ticker(ticker):
+    """
+    Profiles every span of the named ticker with cProfile; None disables it.
+    Set through the environment so pool workers inherit it.
+    """
+    if ticker:
+        os.environ[PROFILE_ENV] = ticker
+    else:
+        os.environ.pop(PROFILE_ENV, None)
+
+def reset_peak_memory():
+    """
+    Restarts the peak resident set size of this process at its current size.
+    Only Linux supports this; elsewhere the peak covers the whole process lifetime.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_memory():
+    """
+    Peak resident set size of this process in bytes since the last reset_peak_memory().
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def record_memory(stage=None):
+    RECORDER.emit({"type": "memory", "stage": stage, "ticker": None, "peak_bytes": peak_memory(), "pid": os.getpid()})
+
+@contextmanager
+def span(stage=None, ticker=None):
+    """
+    Times the enclosed block: the whole stage when ticker is None, otherwise one ticker.
+    A stage span also records the peak memory of the process during the stage.
+    """
+    if ticker is None:
+        reset_peak_memory()
+    profiler = None
+    if ticker is not None and ticker == os.environ.get(PROFILE_ENV):
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    event = {"type": "span", "stage": stage, "ticker": ticker, "start": time.time()}
+    start = time.perf_counter()
+    try:
+        yield event
+    finally:
+        event["duration_s"] = time.perf_counter() - start
+        RECORDER.emit(event)
+        if ticker is None:
+            record_memory(stage)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            profiler.dump_stats(os.path.join(METRICS_DIR, f"profile_{event['stage']}_{ticker}.prof"))
+
+def record_io(ticker, bytes_read=0, bytes_written=0, stage=None):
+    RECORDER.emit({"type": "io", "stage": stage, "ticker": ticker,
+                   "bytes_read": int(bytes_read), "bytes_written": int(bytes_written)})
+
+def record_shape(ticker, rows, columns, stage=None):
+    RECORDER.emit({"type": "shape", "stage": stage, "ticker": ticker, "rows": int(rows), "columns": int(columns)})
+
+def record_outcome(stage, ticker, status, message=None):
+    RECORDER.emit({"type": "outcome", "stage": stage, "ticker": ticker, "status": status, "message": message})
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def summarize(events):
+    """
+    Aggregates events per stage: stage wall time, ticker time, bytes, rows,
+    columns, outcome counters and the largest peak memory of any process
+    that ran the stage.
+    """
+    stages = {}
+    for event in events:
+        stats = stages.setdefault(event.get("stage") or "unknown", {
+            "stage_seconds": 0.0, "ticker_seconds": 0.0, "tickers_timed": 0,
+            "bytes_read": 0, "bytes_written": 0, "rows": 0, "columns": 0, "outcomes": {},
+            "peak_memory_bytes": 0,
+        })
+        kind = event["type"]
+        if kind == "span" and event["ticker"] is None:
+            stats["stage_seconds"] += event["duration_s"]
+        elif kind == "span":
+            stats["ticker_seconds"] += event["duration_s"]
+            stats["tickers_timed"] += 1
+        elif kind == "io":
+            stats["bytes_read"] += event["bytes_read"]
+            stats["bytes_written"] += event["bytes_written"]
+        elif kind == "shape":
+            stats["rows"] += event["rows"]
+            stats["columns"] += event["columns"]
+        elif kind == "memory":
+            stats["peak_memory_bytes"] = max(stats["peak_memory_bytes"], event["peak_bytes"])
+        elif kind == "outcome":
+            stats["outcomes"][event["status"]] = stats["outcomes"].get(event["status"], 0) + 1
+    return stages
+
+def write_jsonl(events, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        for event in events:
+            f.write(json.dumps(event, default=str) + "\n")
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def write_prometheus(events, path):
+    """
+    Writes the summary in the Prometheus textfile-collector format.
+    Every value describes the last run only, so all metrics are gauges.
+    """
+    lines = []
+    def metric(name, help_text, samples):
+        lines.append(f"# HELP pipeline_{name} {help_text}")
+        lines.append(f"# TYPE pipeline_{name} gauge")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"pipeline_{name}{{{label_text}}} {value}" if label_text else f"pipeline_{name} {value}")
+
+    stages = summarize(events)
+    per_stage = lambda key: [({"stage": s}, v[key]) for s, v in stages.items()]
+    metric("stage_duration_seconds", "Wall time of the stage.", per_stage("stage_seconds"))
+    metric("ticker_duration_seconds_sum", "Summed per-ticker time of the stage.", per_stage("ticker_seconds"))
+    metric("ticker_duration_seconds_count", "Number of timed tickers.", per_stage("tickers_timed"))
+    metric("bytes_read", "Bytes read by the stage.", per_stage("bytes_read"))
+    metric("bytes_written", "Bytes written by the stage.", per_stage("bytes_written"))
+    metric("rows", "Rows of the frames produced by the stage.", per_stage("rows"))
+    metric("columns", "Columns of the frames produced by the stage, summed over tickers.", per_stage("columns"))
+    metric("peak_memory_bytes", "Largest peak resident set size of a process running the stage.",
+           per_stage("peak_memory_bytes"))
+    metric("tickers", "Tickers per stage and outcome.",
+           [({"stage": s, "status": status}, n) for s, v in stages.items() for status, n in v["outcomes"].items()])
+    metric("last_run_timestamp_seconds", "Time the metrics were exported.", [({}, time.time())])
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+def export(metrics_dir=METRICS_DIR):
+    """
+    Drains the recorded events into metrics.jsonl and pipeline.prom under metrics_dir.
+    """
+    events = RECORDER.take()
+    write_jsonl(events, os.path.join(metrics_dir, "metrics.jsonl"))
+    write_prometheus(events, os.path.join(metrics_dir, "pipeline.prom"))
+    return summarize(events)
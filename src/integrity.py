@@ -0,0 +1,230 @@
+import pandas as pd
+import numpy as np
+import os
+import pyarrow.parquet as pq
+from dataclasses import dataclass
+from src import gold_store, instrumentation
+
+GOLD_DIR = "data/gold"
+QUALITY_DIR = "data/quality"
+KEY_COLUMNS = ["ticker", "period_end"]
+
+CASH = "Cash Cash Equivalents And Short Term Investments"
+EQUITY = "Total Equity Gross Minority Interest"
+END_CASH = "End Cash Position"
+
+# Accounting identities, checked as total = sum of parts on every row.
+# Each side lists alternatives; a row uses the first alternative whose line
+# items are all present, and the check is skipped where none is. Items in
+# "zero_if_missing" count as 0 on historical rows, as process_ticker treats
+# them when deriving the *_agg residuals.
+IDENTITIES = {
+    "balance_sheet": {
+        "total": [["Total Assets"], ["Current Assets", "Total Non Current Assets"]],
+        "parts": [["Total Liabilities Net Minority Interest", EQUITY],
+                  ["Current Liabilities", "Total Non Current Liabilities Net Minority Interest", EQUITY]],
+    },
+    "other_current_assets_agg": {
+        "total": [["Current Assets"]],
+        "parts": [["OtherCurrentAssets_agg", CASH, "Accounts Receivable", "Inventory"]],
+        "zero_if_missing": [CASH, "Accounts Receivable", "Inventory"],
+    },
+    "other_non_current_assets_agg": {
+        "total": [["Total Non Current Assets"]],
+        "parts": [["OtherNonCurrentAssets_agg", "Net PPE", "Goodwill And Other Intangible Assets"]],
+        "zero_if_missing": ["Net PPE", "Goodwill And Other Intangible Assets"],
+    },
+    "other_current_liabilities_agg": {
+        "total": [["Current Liabilities"]],
+        "parts": [["OtherCurrentLiabilities_agg", "Accounts Payable"]],
+        "zero_if_missing": ["Accounts Payable"],
+    },
+    "other_non_current_liabilities_agg": {
+        "total": [["Total Non Current Liabilities Net Minority Interest"]],
+        "parts": [["OtherNonCurrentLiabilities_agg", "Long Term Debt And Capital Lease Obligation"]],
+        "zero_if_missing": ["Long Term Debt And Capital Lease Obligation"],
+    },
+}
+# End cash = opening cash + change in cash (+ FX effect). Opening cash is the
+# previous year's end cash when that year is 330-400 days earlier, else the
+# reported beginning cash position.
+ROLL_FORWARD = "cash_roll_forward"
+ROLL_FORWARD_ITEMS = ["Beginning Cash Position", "Changes In Cash", "Effect Of Exchange Rate Changes"]
+YEAR_DAYS = (330, 400)
+CHECKS = list(IDENTITIES) + [ROLL_FORWARD]
+
+# A row violates a check when |total - parts| > max(ATOL, rtol * max(|total|, |parts|)).
+# Reported statements are rounded, the *_agg residuals are exact by construction.
+ATOL = 1.0
+TOLERANCES = {
+    "balance_sheet": 0.01,
+    "other_current_assets_agg": 1e-6,
+    "other_non_current_assets_agg": 1e-6,
+    "other_current_liabilities_agg": 1e-6,
+    "other_non_current_liabilities_agg": 1e-6,
+    ROLL_FORWARD: 0.01,
+}
+
+CHECK_COLUMNS = list(dict.fromkeys(
+    [item for identity in IDENTITIES.values() for side in ("total", "parts") for items in identity[side]
+     for item in items] + [END_CASH] + ROLL_FORWARD_ITEMS
+))
+
+@dataclass
+class IntegrityReport:
+    """
+    violations has one row per (ticker, period, check) outside its tolerance,
+    with both sides of the identity; summary counts the rows checked, skipped
+    (line items missing) and violating per check and row type. Its Status is
+    "unchecked" where the check ran on none of the rows of that type, so such
+    rows do not count as covered.
+    """
+    violations: pd.DataFrame
+    summary: pd.DataFrame
+
+def _values(panel, col):
+    if col not in panel.columns:
+        return np.full(len(panel), np.nan)
+    return pd.to_numeric(panel[col], errors="coerce").to_numpy(dtype="float64")
+
+def side_values(panel, alternatives, historical, zero_if_missing=()):
+    """
+    Sum of the first complete alternative on every row, NaN where none is complete.
+    """
+    out = np.full(len(panel), np.nan)
+    for items in alternatives:
+        total = np.zeros(len(panel))
+        for item in items:
+            values = _values(panel, item)
+            if item in zero_if_missing:
+                values = np.where(historical & np.isnan(values), 0.0, values)
+            total += values
+        out = np.where(np.isnan(out), total, out)
+    return out
+
+def roll_forward_values(panel):
+    """
+    (end cash, opening cash + changes) for every row of a panel sorted by (ticker, period_end).
+    """
+    tickers = panel.index.get_level_values("ticker").to_numpy()
+    dates = panel.index.get_level_values("period_end").to_numpy()
+    end = _values(panel, END_CASH)
+
+    previous_end = np.full(len(panel), np.nan)
+    gap = np.full(len(panel), np.nan)
+    previous_end[1:] = end[:-1]
+    gap[1:] = (dates[1:] - dates[:-1]) / np.timedelta64(1, "D")
+    consecutive = np.zeros(len(panel), dtype=bool)
+    consecutive[1:] = tickers[1:] == tickers[:-1]
+    consecutive &= (gap >= YEAR_DAYS[0]) & (gap <= YEAR_DAYS[1]) & ~np.isnan(previous_end)
+
+    opening = np.where(consecutive, previous_end, _values(panel, "Beginning Cash Position"))
+    fx = np.nan_to_num(_values(panel, "Effect Of Exchange Rate Changes"))
+    return end, opening + _values(panel, "Changes In Cash") + fx
+
+def check_panel(panel, tolerances=None, atol=ATOL):
+    """
+    Runs every check on a panel indexed by (ticker, period_end), such as
+    Gold (historical and forecast rows, told apart by Type) or Silver (all
+    rows historical), in one vectorized pass per check. Returns an IntegrityReport.
+    """
+    tolerances = {**TOLERANCES, **(tolerances or {})}
+    panel = panel.sort_index()
+    row_type = panel["Type"].astype(str).to_numpy() if "Type" in panel.columns else np.full(len(panel), "Historical")
+    historical = row_type == "Historical"
+
+    sides = {}
+    for name, identity in IDENTITIES.items():
+        zero_if_missing = set(identity.get("zero_if_missing", ()))
+        sides[name] = (side_values(panel, identity["total"], historical),
+                       side_values(panel, identity["parts"], historical, zero_if_missing))
+    sides[ROLL_FORWARD] = roll_forward_values(panel)
+
+    violations, summary = [], []
+    for name, (total, parts) in sides.items():
+        checked = ~np.isnan(total) & ~np.isnan(parts)
+        difference = total - parts
+        scale = np.maximum(np.abs(total), np.abs(parts))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative = np.abs(difference) / scale
+        violated = checked & (np.abs(difference) > np.maximum(atol, tolerances[name] * scale))
+
+        for kind in np.unique(row_type):
+            rows = row_type == kind
+            summary.append({"Check": name, "Type": kind, "Rows": int(rows.sum()),
+                            "Checked": int((checked & rows).sum()), "Violations": int((violated & rows).sum()),
+                            "Max Relative": float(np.max(relative[checked & rows], initial=0.0)),
+                            "Tolerance": tolerances[name]})
+        if violated.any():
+            index = panel.index[violated]
+            violations.append(pd.DataFrame({
+                "ticker": index.get_level_values("ticker"), "period_end": index.get_level_values("period_end"),
+                "Type": row_type[violated], "Check": name, "Total": total[violated], "Parts": parts[violated],
+                "Difference": difference[violated], "Relative": relative[violated],
+            }))
+
+    columns = ["ticker", "period_end", "Type", "Check", "Total", "Parts", "Difference", "Relative"]
+    violations = pd.concat(violations, ignore_index=True) if violations else pd.DataFrame(columns=columns)
+    summary = pd.DataFrame(summary).set_index(["Check", "Type"])
+    summary.insert(2, "Skipped", summary["Rows"] - summary["Checked"])
+    summary["Status"] = np.select([summary["Checked"] == 0, summary["Skipped"] > 0],
+                                  ["unchecked", "partial"], "checked")
+    return IntegrityReport(violations, summary)
+
+def read_gold_panel(tickers=None):
+    """
+    The line items the checks need from Gold, as one panel indexed by
+    (ticker, period_end): from the consolidated Gold dataset when it holds the
+    latest forecasts of all tickers, else from the per-ticker files.
+    """
+    if os.path.exists(gold_store.PANEL_DIR) and not gold_store.stale_tickers(tickers):
+        return gold_store.query(columns=["Type"] + CHECK_COLUMNS, tickers=tickers)
+
+    frames = {}
+    for file_name in sorted(f for f in os.listdir(GOLD_DIR) if f.endswith("_forecast.parquet")):
+        ticker = file_name.replace("_forecast.parquet", "")
+        if tickers is not None and ticker not in tickers:
+            continue
+        path = os.path.join(GOLD_DIR, file_name)
+        wanted = {"Type", *CHECK_COLUMNS}
+        frames[ticker] = pd.read_parquet(path, columns=[c for c in pq.read_schema(path).names if c in wanted])
+        instrumentation.record_io(ticker, bytes_read=os.path.getsize(path))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, names=KEY_COLUMNS)
+
+def run_integrity(tickers=None, tolerances=None, atol=ATOL):
+    """
+    Checks the balance sheet identity, the cash roll-forward and the *_agg
+    residuals on every historical and forecast row in Gold.
+    Saves violations.parquet and summary.parquet to data/quality and returns
+    an IntegrityReport. tolerances overrides the relative tolerance of single checks.
+    """
+    print("Checking balance sheet and cash flow integrity...")
+
+    if not os.path.exists(GOLD_DIR) and not os.path.exists(gold_store.PANEL_DIR):
+        print("Gold directory not found.")
+        return None
+
+    with instrumentation.span("integrity"), instrumentation.stage_context("integrity"):
+        panel = read_gold_panel(tickers)
+        if panel.empty:
+            print("No forecasts to check.")
+            return None
+        report = check_panel(panel, tolerances, atol)
+
+        os.makedirs(QUALITY_DIR, exist_ok=True)
+        paths = []
+        for name, df in [("violations", report.violations), ("summary", report.summary)]:
+            paths.append(os.path.join(QUALITY_DIR, f"{name}.parquet"))
+            df.to_parquet(paths[-1])
+        instrumentation.record_shape(None, *report.violations.shape)
+        instrumentation.record_io(None, bytes_written=sum(os.path.getsize(p) for p in paths))
+
+    n_tickers = panel.index.get_level_values("ticker").nunique()
+    print(f"Read {len(panel)} rows of {n_tickers} tickers, {len(report.violations)} violations")
+    unchecked = report.summary[report.summary["Status"] == "unchecked"].reset_index()
+    for kind, names in unchecked.groupby("Type")["Check"]:
+        print(f"Not checked on {kind} rows (line items missing): {', '.join(names)}")
+    print(report.summary.to_string(float_format="{:.2g}".format))
+    return report
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+
+JOURNAL_PATH = "data/ingestion_journal.jsonl"
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+QUARANTINED = "quarantined"
+# States a resumed run does not fetch again
+FINISHED = {DONE, QUARANTINED}
+
+class Journal:
+    """
+    Durable per-ticker ingestion state: pending, done, failed (with the reason)
+    or quarantined, plus the number of fetch attempts.
+    Stored as an append-only JSON-lines log, one line per state change, flushed
+    and fsynced before the call returns, so a crash loses at most the tickers in
+    flight. Loading replays the log (the last line of a ticker wins) and ignores
+    a line cut short by a crash. Safe to use from several threads.
+    """
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._file = None
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry.pop("ticker")] = entry
+
+    def state(self, ticker):
+        return self.entries.get(ticker, {}).get("state")
+
+    def attempts(self, ticker):
+        return self.entries.get(ticker, {}).get("attempts", 0)
+
+    def remaining(self, tickers):
+        """
+        Tickers a resumed run still has to fetch: neither done nor quarantined.
+        """
+        return [ticker for ticker in tickers if self.state(ticker) not in FINISHED]
+
+    def counts(self, tickers=None):
+        tickers = self.entries if tickers is None else tickers
+        counts = {}
+        for ticker in tickers:
+            state = self.state(ticker) or PENDING
+            counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    def mark(self, ticker, state, reason=None, attempts=None):
+        self.mark_many([ticker], state, reason, attempts)
+
+    def mark_many(self, tickers, state, reason=None, attempts=None):
+        """
+        Records a state for several tickers with a single write and fsync.
+        attempts is a count, {ticker: count}, or None to keep each ticker's count.
+        """
+        with self._lock:
+            lines = []
+            for ticker in tickers:
+                if attempts is None:
+                    count = self.attempts(ticker)
+                else:
+                    count = attempts[ticker] if isinstance(attempts, dict) else attempts
+                entry = {"state": state, "attempts": count,
+                         "reason": reason, "updated": time.time()}
+                self.entries[ticker] = entry
+                lines.append(json.dumps({"ticker": ticker, **entry}) + "\n")
+            if lines:
+                self._append("".join(lines))
+
+    def _append(self, text):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write(text)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def compact(self):
+        """
+        Rewrites the log with one line per ticker, so it does not grow with every run.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                for ticker in sorted(self.entries):
+                    f.write(json.dumps({"ticker": ticker, **self.entries[ticker]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,131 @@
+import pandas as pd
+import hashlib
+import json
+import os
+from src import bronze, silver_store, snapshots
+
+MANIFEST_PATH = "data/manifest.json"
+
+def digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+def file_hash(path):
+    if not os.path.exists(path):
+        return digest("missing")
+    with open(path, "rb") as f:
+        return digest(f.read())
+
+def frame_hash(df):
+    """
+    Content hash of a DataFrame, independent of how it was stored.
+    """
+    values = pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()
+    return digest(values, list(df.columns))
+
+def code_version(module_paths, params=None):
+    """
+    Version of a stage: hash of its source files and parameters.
+    """
+    return digest(*[file_hash(p) for p in module_paths], json.dumps(params or {}, sort_keys=True))
+
+def bronze_hashes(bronze_format="json", as_of=None):
+    """
+    {ticker: hash of its Bronze statements}; with as_of, of the snapshot store
+    as of that snapshot or time, from the content digests alone.
+    """
+    if as_of is not None:
+        snapshot_state = snapshots.state(as_of)
+        return {ticker: digest(*(group["statement"] + ":" + group["digest"]))
+                for ticker, group in snapshot_state.groupby("ticker")}
+    if bronze_format == "parquet":
+        long_df = bronze.read_parquet_long()
+        return {ticker: frame_hash(group.reset_index(drop=True)) for ticker, group in long_df.groupby("ticker")}
+    return {ticker: _json_hash(ticker) for ticker in bronze.list_json_tickers()}
+
+def _json_hash(ticker):
+    # Quarterly files count only when present, so annual-only hashes stay as they were
+    paths = [os.path.join(bronze.BRONZE_DIR, ticker, f"{name}.json") for name in bronze.STATEMENT_NAMES]
+    quarterly = [os.path.join(bronze.BRONZE_DIR, ticker, f"{name}.json") for name in bronze.QUARTERLY_NAMES]
+    return digest(*[file_hash(p) for p in paths + [p for p in quarterly if os.path.exists(p)]])
+
+def silver_hashes(silver_dir, silver_layout="files", panel_dir=silver_store.PANEL_DIR):
+    """
+    {ticker: hash of its Silver data}.
+    """
+    if silver_layout == "panel":
+        return {ticker: frame_hash(df) for ticker, df in silver_store.read_panel_frames(panel_dir=panel_dir).items()}
+    if not os.path.exists(silver_dir):
+        return {}
+    return {
+        f.replace(".parquet", ""): file_hash(os.path.join(silver_dir, f))
+        for f in sorted(os.listdir(silver_dir)) if f.endswith(".parquet")
+    }
+
+class Manifest:
+    """
+    Records, per stage and ticker, the input hash and stage version of the last
+    successful build, so unchanged tickers can be skipped on the next run.
+    """
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.stages = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.stages = json.load(f)
+
+    def stale(self, stage, hashes, version, force=False, output_exists=None):
+        """
+        Tickers whose input hash or stage version changed, or whose output is
+        missing. Tickers recorded as skipped have no output to check.
+        """
+        if force:
+            return sorted(hashes)
+        built = self.stages.get(stage, {})
+        stale = []
+        for ticker, input_hash in hashes.items():
+            entry = built.get(ticker) or {}
+            if entry.get("input") != input_hash or entry.get("version") != version:
+                stale.append(ticker)
+            elif not entry.get("skipped") and output_exists is not None and not output_exists(ticker):
+                stale.append(ticker)
+        return sorted(stale)
+
+    def record(self, stage, hashes, version, tickers, skipped=()):
+        """
+        Records tickers built from hashes by version; skipped ones produced no output.
+        """
+        built = self.stages.setdefault(stage, {})
+        for ticker in tickers:
+            built[ticker] = {"input": hashes[ticker], "version": version}
+        for ticker in skipped:
+            built[ticker] = {"input": hashes[ticker], "version": version, "skipped": True}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.stages, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+def run_incremental(manifest, stage, hashes, version, run, force=False, output_exists=None):
+    """
+    Runs run(tickers) on the stale tickers only and records the tickers it
+    completed or skipped (a skipped ticker stays fresh although it has no
+    output); failed or incomplete tickers stay stale and are retried next time.
+    """
+    stale = manifest.stale(stage, hashes, version, force, output_exists)
+    print(f"{stage}: {len(stale)} of {len(hashes)} tickers changed")
+    if not stale:
+        return None
+
+    result = run(stale)
+    if result is not None:
+        finished = [t for t in result.done if t not in result.incomplete]
+        skipped = [t for t in result.skipped if t not in result.incomplete]
+        manifest.record(stage, hashes, version, finished, skipped)
+        manifest.save()
+    return result
@@ -0,0 +1,210 @@
+import pandas as pd
+import numpy as np
+import os
+import zlib
+from src import valuation
+from src.forecasting import load_silver
+from src.batch_forecasting import (
+    COST_OF_REVENUE, OPEX, build_history_panel, batch_drivers, project, _drop_without_revenue,
+)
+
+N_PATHS = 100_000
+CHUNK_SIZE = 10_000
+PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+
+# Driver -> (distribution, *parameters), applied around each ticker's deterministic value:
+#   ("normal", sd)          base + N(0, sd)
+#   ("scale", sd)           base * (1 + N(0, sd))
+#   ("uniform", low, high)  base + U(low, high)
+#   ("fixed",)              base
+DISTRIBUTIONS = {
+    "revenue_growth": ("normal", 0.03),
+    "cost_ratio": ("scale", 0.05),
+    "opex_ratio": ("scale", 0.05),
+    "tax_rate": ("normal", 0.02),
+    "working_capital_days": ("scale", 0.10),
+    "discount_rate": ("normal", 0.01),
+}
+
+def sample(rng, base, spec, size):
+    """
+    Draws size values of one driver around base according to spec.
+    """
+    kind = spec[0]
+    if kind == "normal":
+        return base + rng.normal(0.0, spec[1], size)
+    if kind == "scale":
+        return base * (1 + rng.normal(0.0, spec[1], size))
+    if kind == "uniform":
+        return base + rng.uniform(spec[1], spec[2], size)
+    if kind == "fixed":
+        return np.full(size, base, dtype=float)
+    raise ValueError(f"Unknown distribution: {kind}")
+
+class StreamingHistogram:
+    """
+    Fixed-memory histogram for streaming percentiles.
+    The range starts at the first chunk's min/max and doubles whenever a later
+    value falls outside it, merging neighbouring bins, so memory stays at n_bins
+    counters however many values are added. Percentiles are interpolated within
+    bins, so their error is bounded by one bin width.
+    """
+    def __init__(self, n_bins=4096):
+        self.n_bins = n_bins + n_bins % 2
+        self.counts = np.zeros(self.n_bins, dtype=np.int64)
+        self.lo = None
+        self.hi = None
+        self.count = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _grow(self, upward):
+        merged = self.counts[0::2] + self.counts[1::2]
+        self.counts = np.zeros(self.n_bins, dtype=np.int64)
+        width = self.hi - self.lo
+        if upward:
+            self.counts[:self.n_bins // 2] = merged
+            self.hi = self.lo + 2 * width
+        else:
+            self.counts[self.n_bins // 2:] = merged
+            self.lo = self.hi - 2 * width
+
+    def add(self, values):
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        vmin, vmax = values.min(), values.max()
+        if self.lo is None:
+            span = max(vmax - vmin, abs(vmax) * 1e-9, 1e-9)
+            self.lo, self.hi = vmin, vmin + span * (1 + 1e-9)
+        while vmin < self.lo:
+            self._grow(upward=False)
+        while vmax >= self.hi:
+            self._grow(upward=True)
+
+        bins = ((values - self.lo) / (self.hi - self.lo) * self.n_bins).astype(np.int64)
+        self.counts += np.bincount(np.clip(bins, 0, self.n_bins - 1), minlength=self.n_bins)
+        self.count += len(values)
+        self.total += values.sum()
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+
+    def percentiles(self, qs):
+        if not self.count:
+            return np.full(len(qs), np.nan)
+        edges = np.linspace(self.lo, self.hi, self.n_bins + 1)
+        cdf = np.concatenate([[0], np.cumsum(self.counts)]) / self.count
+        out = np.interp(np.asarray(qs) / 100, cdf, edges)
+        return np.clip(out, self.min, self.max)
+
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+def _ticker_rng(seed, ticker):
+    return np.random.default_rng(np.random.SeedSequence([seed, zlib.crc32(ticker.encode())]))
+
+def _take(drivers, i):
+    """
+    Driver tree of ticker i as length-1 arrays.
+    """
+    if isinstance(drivers, dict):
+        return {k: _take(v, i) for k, v in drivers.items()}
+    return drivers[i:i + 1]
+
+def _repeat(drivers, size):
+    if isinstance(drivers, dict):
+        return {k: _repeat(v, size) for k, v in drivers.items()}
+    return np.repeat(drivers, size)
+
+def sample_drivers(base, rng, size, distributions):
+    """
+    Draws size driver paths around one ticker's base drivers (length-1 arrays).
+    """
+    paths = _repeat(base, size)
+    paths["growth"] = sample(rng, base["growth"][0], distributions["revenue_growth"], size)
+    paths["expense_ratios"][COST_OF_REVENUE] = sample(
+        rng, base["expense_ratios"][COST_OF_REVENUE][0], distributions["cost_ratio"], size)
+    paths["expense_ratios"][OPEX] = sample(rng, base["expense_ratios"][OPEX][0], distributions["opex_ratio"], size)
+    paths["tax_rate"] = sample(rng, base["tax_rate"][0], distributions["tax_rate"], size)
+    for name in paths["days"]:
+        paths["days"][name] = sample(rng, base["days"][name][0], distributions["working_capital_days"], size)
+    return paths
+
+def simulate_ticker(base, net_debt, rng, n_paths=N_PATHS, chunk_size=CHUNK_SIZE, distributions=None,
+                    wacc=valuation.WACC, terminal_growth=valuation.TERMINAL_GROWTH, forecast_years=5):
+    """
+    Simulates n_paths equity values of one ticker in chunks of chunk_size paths.
+    Returns a StreamingHistogram of equity value and the number of invalid paths
+    (discount rate at or below terminal growth, or non-finite values).
+    """
+    distributions = {**DISTRIBUTIONS, **(distributions or {})}
+    histogram = StreamingHistogram()
+    invalid = 0
+
+    done = 0
+    while done < n_paths:
+        size = min(chunk_size, n_paths - done)
+        paths = sample_drivers(base, rng, size, distributions)
+        discount_rate = sample(rng, wacc, distributions["discount_rate"], size)
+
+        ufcf = project(paths, forecast_years)[2]["UFCF"]
+        t = np.arange(1, forecast_years + 1)
+        discount = (1 + discount_rate[:, None]) ** -t[None, :]
+        spread = discount_rate - terminal_growth
+        with np.errstate(divide="ignore", invalid="ignore"):
+            terminal = np.where(spread > 0, ufcf[:, -1] * (1 + terminal_growth) / spread, np.nan)
+        equity = (ufcf * discount).sum(axis=1) + terminal * discount[:, -1] - net_debt
+
+        valid = np.isfinite(equity)
+        invalid += int((~valid).sum())
+        histogram.add(equity[valid])
+        done += size
+
+    return histogram, invalid
+
+def simulate_universe(frames, n_paths=N_PATHS, chunk_size=CHUNK_SIZE, seed=0, distributions=None,
+                      wacc=valuation.WACC, terminal_growth=valuation.TERMINAL_GROWTH, percentiles=PERCENTILES):
+    """
+    Runs the Monte Carlo valuation for {ticker: Silver frame}.
+    Returns one row per ticker with equity-value and per-share percentiles.
+    Each ticker draws from its own stream of (seed, ticker), so results are
+    reproducible for a given seed and chunk_size and do not depend on which
+    other tickers are simulated.
+    """
+    panel = _drop_without_revenue(build_history_panel(frames))
+    drivers = batch_drivers(panel)
+
+    rows = []
+    for i, ticker in enumerate(panel.tickers):
+        net_debt, shares = valuation.net_debt_and_shares(frames[ticker])
+        histogram, invalid = simulate_ticker(
+            _take(drivers, i), net_debt, _ticker_rng(seed, ticker), n_paths, chunk_size,
+            distributions, wacc, terminal_growth,
+        )
+        row = {"Ticker": ticker, "Paths": n_paths, "Invalid Paths": invalid, "Mean Equity Value": histogram.mean()}
+        for q, value in zip(percentiles, histogram.percentiles(percentiles)):
+            row[f"Equity Value P{q}"] = value
+            row[f"Value Per Share P{q}"] = value / shares
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index("Ticker") if rows else pd.DataFrame()
+
+def run_monte_carlo(n_paths=N_PATHS, chunk_size=CHUNK_SIZE, seed=0, distributions=None,
+                    wacc=valuation.WACC, terminal_growth=valuation.TERMINAL_GROWTH,
+                    tickers=None, silver_layout="files"):
+    """
+    Stochastic valuation of the Silver universe.
+    Saves the percentiles to data/valuation/monte_carlo.parquet.
+    """
+    print(f"Simulating {n_paths} paths per ticker...")
+    frames = load_silver(tickers, silver_layout)
+    if not frames:
+        print("No Silver data to simulate.")
+        return None
+
+    result = simulate_universe(frames, n_paths, chunk_size, seed, distributions, wacc, terminal_growth)
+    os.makedirs(valuation.VALUATION_DIR, exist_ok=True)
+    result.to_parquet(os.path.join(valuation.VALUATION_DIR, "monte_carlo.parquet"))
+    print(f"Simulated {len(result)} tickers")
+    return result
@@ -0,0 +1,129 @@
+import math
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from src import instrumentation
+
+DONE = "done"
+SKIPPED = "skipped"
+ERROR = "error"
+# Reported besides DONE or SKIPPED when a ticker's output was written but a
+# secondary output of the stage (such as its TTM Silver) failed
+INCOMPLETE = "incomplete"
+
+@dataclass
+class StageResult:
+    """
+    Per-ticker outcome of a pipeline stage, sorted by ticker.
+    skipped maps ticker -> reason, errors maps ticker -> "ExcType: message",
+    incomplete maps ticker -> "ExcType: message" of a failed secondary output,
+    tracebacks keeps the full traceback text of every error.
+    """
+    stage: str
+    done: list = field(default_factory=list)
+    skipped: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    incomplete: dict = field(default_factory=dict)
+    tracebacks: dict = field(default_factory=dict)
+
+    def add(self, ticker, status, detail=None):
+        if status == DONE:
+            self.done.append(ticker)
+        elif status == SKIPPED:
+            self.skipped[ticker] = detail
+        elif status == INCOMPLETE:
+            message, tb = detail
+            self.incomplete[ticker] = message
+            self.tracebacks[ticker] = tb
+        else:
+            message, tb = detail
+            self.errors[ticker] = message
+            self.tracebacks[ticker] = tb
+
+    def summary(self):
+        text = (f"{self.stage}: {len(self.done)} done, "
+                f"{len(self.skipped)} skipped, {len(self.errors)} errors")
+        return f"{text}, {len(self.incomplete)} incomplete" if self.incomplete else text
+
+def run_ticker(func, ticker, *args):
+    """
+    Runs func(ticker, *args) and converts its outcome into (ticker, status, detail).
+    func returns None when done or a reason string when the ticker is skipped.
+    The call is timed as one ticker span.
+    """
+    try:
+        with instrumentation.span(ticker=ticker):
+            reason = func(ticker, *args)
+    except Exception as e:
+        return ticker, ERROR, (f"{type(e).__name__}: {e}", traceback.format_exc())
+    if reason:
+        return ticker, SKIPPED, reason
+    return ticker, DONE, None
+
+def make_chunks(items, max_workers, chunksize=None, key=None):
+    """
+    Splits items into chunks; by default about four chunks per worker.
+    With key, items sharing a key always land in the same chunk, so a chunk
+    can own a partition exclusively.
+    """
+    if not items:
+        return []
+    if not chunksize:
+        chunksize = max(1, math.ceil(len(items) / (max(1, max_workers) * 4)))
+    if key is None:
+        return [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+
+    chunks = [[]]
+    for group_key in sorted(groups):
+        if chunks[-1] and len(chunks[-1]) + len(groups[group_key]) > chunksize:
+            chunks.append([])
+        chunks[-1].extend(groups[group_key])
+    return chunks
+
+def _run_chunk(stage, chunk_func, chunk, *args):
+    """
+    Pool worker entry point: runs one chunk and ships its metric events,
+    including the worker's peak memory during the chunk, back to the parent
+    along with the outcomes.
+    """
+    mark = instrumentation.RECORDER.mark()
+    instrumentation.reset_peak_memory()
+    with instrumentation.stage_context(stage):
+        outcomes = chunk_func(chunk, *args)
+    instrumentation.record_memory(stage)
+    return outcomes, instrumentation.RECORDER.take(mark)
+
+def run_chunked(stage, chunk_func, tickers, max_workers=1, chunksize=None, args=(), key=None):
+    """
+    Runs chunk_func(chunk_of_tickers, *args) over sorted tickers, in a process
+    pool when max_workers > 1. chunk_func returns a list of run_ticker outcomes.
+    Results do not depend on the number of workers.
+    Metric events of the stage are collected in instrumentation.RECORDER.
+    """
+    result = StageResult(stage)
+    tickers = sorted(tickers)
+    chunks = make_chunks(tickers, max_workers, chunksize, key)
+
+    with instrumentation.span(stage):
+        if max_workers <= 1:
+            with instrumentation.stage_context(stage):
+                outcomes = [chunk_func(chunk, *args) for chunk in chunks]
+        else:
+            n = len(chunks)
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = []
+                for chunk_outcomes, events in executor.map(_run_chunk, [stage] * n, [chunk_func] * n, chunks,
+                                                           *[[a] * n for a in args]):
+                    instrumentation.RECORDER.extend(events)
+                    outcomes.append(chunk_outcomes)
+
+    for chunk_outcomes in outcomes:
+        for ticker, status, detail in chunk_outcomes:
+            result.add(ticker, status, detail)
+            instrumentation.record_outcome(stage, ticker, status,
+                                           detail[0] if status in (ERROR, INCOMPLETE) else detail)
+    return result
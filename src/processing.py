@@ -1,85 +1,235 @@
 import pandas as pd
+import numpy as np
 import os
-import json
+import traceback
+from src import bronze, bronze_io, instrumentation, silver_store, snapshots, ttm
+from src.parallel import ERROR, INCOMPLETE, run_chunked, run_ticker
 
-def run_processing():
+SILVER_DIR = "data/silver"
+SILVER_TTM_DIR = "data/silver_ttm"
+
+# Largest relative error a float32 downcast may introduce in lean mode
+DOWNCAST_RTOL = 1e-6
+# Modules whose code decides the Silver output: Bronze and snapshot reads,
+# the annual and TTM transforms and the Silver layouts
+CODE_MODULES = [__file__, bronze.__file__, bronze_io.__file__, snapshots.__file__, ttm.__file__,
+                silver_store.__file__]
+
+def process_ticker(dfs):
+    """
+    Merges the Bronze statement frames of one ticker into its Silver frame.
+    """
+    # Merge and sort
+    full_df = pd.concat(dfs, axis=1)
+    full_df = full_df.sort_index()
+
+    # Calculate aggregated "Other" accounts
+    # These are needed for forecasting and cash flow calculations
+    def get_safe(col):
+        return full_df[col].fillna(0) if col in full_df.columns else 0
+
+    if "Current Assets" in full_df.columns:
+        full_df["OtherCurrentAssets_agg"] = (
+            get_safe("Current Assets") -
+            get_safe("Cash Cash Equivalents And Short Term Investments") -
+            get_safe("Accounts Receivable") -
+            get_safe("Inventory")
+        )
+
+    if "Total Non Current Assets" in full_df.columns:
+        full_df["OtherNonCurrentAssets_agg"] = (
+            get_safe("Total Non Current Assets") -
+            get_safe("Net PPE") -
+            get_safe("Goodwill And Other Intangible Assets")
+        )
+
+    if "Current Liabilities" in full_df.columns:
+        full_df["OtherCurrentLiabilities_agg"] = (
+            get_safe("Current Liabilities") -
+            get_safe("Accounts Payable")
+        )
+
+    if "Total Non Current Liabilities Net Minority Interest" in full_df.columns:
+        full_df["OtherNonCurrentLiabilities_agg"] = (
+            get_safe("Total Non Current Liabilities Net Minority Interest") -
+            get_safe("Long Term Debt And Capital Lease Obligation")
+        )
+
+    return full_df
+
+def compact_frame(df, rtol=DOWNCAST_RTOL):
+    """
+    Memory-lean copy of a statement frame: object columns holding numbers
+    (yfinance returns them when a line item is missing) become numeric, and
+    float64 columns become float32 when every value survives the round trip
+    within rtol. Text columns are left as they are; attrs are kept.
+    """
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == object:
+            numeric = pd.to_numeric(values, errors="coerce")
+            if numeric.notna().sum() == values.notna().sum():
+                values = numeric.astype("float64")
+        if values.dtype == "float64":
+            original = values.to_numpy()
+            with np.errstate(over="ignore", invalid="ignore"):
+                narrow = original.astype("float32")
+                error = np.abs(narrow.astype("float64") - original)
+            if np.all((error <= rtol * np.abs(original)) | np.isnan(original)):
+                values = pd.Series(narrow, index=df.index)
+        out[col] = values
+    compact = pd.DataFrame(out, index=df.index)
+    compact.attrs = dict(df.attrs)
+    return compact
+
+def save_silver(ticker, dfs, lean=False):
+    if not dfs:
+        return "No data found"
+
+    full_df = process_ticker(dfs)
+    if lean:
+        full_df = compact_frame(full_df)
+    path = os.path.join(SILVER_DIR, f"{ticker}.parquet")
+    full_df.to_parquet(path)
+    instrumentation.record_shape(ticker, *full_df.shape)
+    instrumentation.record_io(ticker, bytes_written=instrumentation.file_size(path))
+
+def save_ttm(tickers, bronze_format, silver_layout="files", lean=False, long_df=None):
+    """
+    Builds the trailing-twelve-month Silver of the given tickers from their
+    quarterly Bronze statements, in one vectorized pass over all of them (see
+    src/ttm.py), and writes one frame per ticker: TTM flows, quarter-end stocks
+    and the same *_agg accounts as the annual Silver, indexed by quarter end.
+    Returns the tickers written.
+    """
+    quarterly = bronze.read_quarterly_long(tickers, bronze_format, long_df)
+    if quarterly.empty:
+        return []
+
+    stocks, flows = ttm.trailing_panel(quarterly)
+    panel = process_ticker([stocks, flows])
+    frames = {}
+    for ticker, df in panel.groupby(level="ticker", sort=True):
+        df = df.droplevel("ticker").rename_axis(index=None).dropna(axis=1, how="all")
+        frames[ticker] = compact_frame(df) if lean else df
+
+    if silver_layout == "panel":
+        silver_store.write_panel(frames, silver_store.TTM_PANEL_DIR)
+    else:
+        os.makedirs(SILVER_TTM_DIR, exist_ok=True)
+        for ticker, df in frames.items():
+            path = os.path.join(SILVER_TTM_DIR, f"{ticker}.parquet")
+            df.to_parquet(path)
+            instrumentation.record_io(ticker, bytes_written=instrumentation.file_size(path))
+    return list(frames)
+
+def _bronze_sources(tickers, bronze_format, as_of=None, quarterly=False):
+    """
+    (load, long_df): load(ticker) returns the annual statement frames; long_df
+    holds the Parquet rows already read, so quarterly statements are not read twice.
+    With as_of, both come from the snapshot store as of that snapshot or time.
+    """
+    if as_of is not None:
+        snapshot_state = snapshots.state(as_of, tickers)
+        long_df = snapshots.read_long(snapshot_state, tickers, bronze.QUARTERLY_NAMES) if quarterly else None
+        return (lambda ticker: snapshots.read_frames(snapshot_state, ticker)), long_df
+    if bronze_format == "parquet":
+        long_df = bronze.read_parquet_long(tickers)
+        sources = {ticker: bronze.long_to_frames(group) for ticker, group in long_df.groupby("ticker", sort=True)}
+        return (lambda ticker: sources.get(ticker, [])), long_df
+    return bronze.read_json, None
+
+def _prefetched(tickers, load, bronze_format, as_of=None):
+    """
+    (ticker, future of load(ticker)) in order, reading the Bronze files of the
+    next tickers on threads while the current one is processed. Parquet rows
+    are already in memory, so those loads run inline.
+    """
+    depth = 0 if bronze_format == "parquet" and as_of is None else bronze_io.PREFETCH_DEPTH
+    return bronze_io.prefetch(tickers, load, depth)
+
+def _with_ttm(outcomes, tickers, bronze_format, silver_layout, lean, long_df):
+    """
+    Adds the TTM Silver of the chunk. If it fails, the annual outcomes stand
+    and every ticker without an annual error is also reported INCOMPLETE.
+    """
+    try:
+        save_ttm(tickers, bronze_format, silver_layout, lean, long_df)
+    except Exception as e:
+        detail = (f"TTM {type(e).__name__}: {e}", traceback.format_exc())
+        outcomes = outcomes + [(t, INCOMPLETE, detail) for t, status, d in outcomes if status != ERROR]
+    return outcomes
+
+def _process_chunk(tickers, bronze_format, lean=False, quarterly=False, as_of=None):
+    load, long_df = _bronze_sources(tickers, bronze_format, as_of, quarterly)
+    outcomes = [run_ticker(lambda t: save_silver(t, dfs.result(), lean), ticker)
+                for ticker, dfs in _prefetched(tickers, load, bronze_format, as_of)]
+    if quarterly:
+        outcomes = _with_ttm(outcomes, tickers, bronze_format, "files", lean, long_df)
+    return outcomes
+
+def _process_panel_chunk(tickers, bronze_format, lean=False, quarterly=False, as_of=None):
+    load, long_df = _bronze_sources(tickers, bronze_format, as_of, quarterly)
+
+    frames = {}
+    def collect(ticker, dfs):
+        dfs = dfs.result()
+        if not dfs:
+            return "No data found"
+        frames[ticker] = compact_frame(process_ticker(dfs)) if lean else process_ticker(dfs)
+        instrumentation.record_shape(ticker, *frames[ticker].shape)
+
+    outcomes = [run_ticker(collect, ticker, dfs) for ticker, dfs in _prefetched(tickers, load, bronze_format, as_of)]
+    try:
+        silver_store.write_panel(frames)
+    except Exception as e:
+        detail = (f"{type(e).__name__}: {e}", traceback.format_exc())
+        outcomes = [(t, ERROR, detail) if t in frames else (t, status, d) for t, status, d in outcomes]
+    if quarterly:
+        outcomes = _with_ttm(outcomes, tickers, bronze_format, "panel", lean, long_df)
+    return outcomes
+
+def list_bronze_tickers(bronze_format, as_of=None):
+    if as_of is not None:
+        return sorted(snapshots.state(as_of)["ticker"].unique())
+    if bronze_format == "parquet":
+        return bronze.list_parquet_tickers()
+    return bronze.list_json_tickers()
+
+def run_processing(bronze_format="json", max_workers=1, chunksize=None, tickers=None, silver_layout="files",
+                   lean=False, quarterly=False, as_of=None):
+    """
+    Builds the Silver layer from Bronze.
+    bronze_format selects the Bronze layout to read: "json" (one directory per
+    ticker) or "parquet" (columnar batches written by run_ingestion).
+    silver_layout selects the output: "files" (one parquet per ticker) or "panel"
+    (the partitioned dataset in src/silver_store.py).
+    lean stores compact dtypes (see compact_frame).
+    quarterly also builds the trailing-twelve-month Silver from the quarterly
+    statements (see save_ttm), in data/silver_ttm or the TTM panel.
+    as_of rebuilds Silver from the Bronze snapshot store as of a snapshot id or
+    time (see src/snapshots.py) instead of the current Bronze; the output
+    replaces the current Silver of those tickers.
+    Tickers are processed in chunks, in a pool of max_workers processes when
+    max_workers > 1. Returns a StageResult with per-ticker outcomes.
+    """
     print("Processing data from Bronze to Silver...")
-    
-    bronze_dir = "data/bronze"
-    silver_dir = "data/silver"
-    
-    if not os.path.exists(bronze_dir):
+
+    if not os.path.exists(bronze.BRONZE_DIR):
         print("Bronze directory not found.")
-        return
-
-    tickers = [d for d in os.listdir(bronze_dir) if os.path.isdir(os.path.join(bronze_dir, d))]
-    
-    for ticker in tickers:
-        print(f"Processing {ticker}...")
-        try:
-            ticker_path = os.path.join(bronze_dir, ticker)
-            
-            # Read JSONs and convert to DataFrame
-            dfs = []
-            for file_name in ["balance_sheet.json", "income_statement.json", "cashflow.json"]:
-                file_path = os.path.join(ticker_path, file_name)
-                if os.path.exists(file_path):
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-                    
-                    if not data:
-                        continue
-                        
-                    df = pd.DataFrame.from_dict(data, orient='index')
-                    df.index = pd.to_datetime(df.index.astype(int), unit='ms')
-                    dfs.append(df)
-            
-            if not dfs:
-                print(f"No data found for {ticker}")
-                continue
-                
-            # Merge, sort and save to Silver
-            full_df = pd.concat(dfs, axis=1)
-            full_df = full_df.sort_index()
-            
-            # Calculate aggregated "Other" accounts
-            # These are needed for forecasting and cash flow calculations
-            # Calculate aggregated "Other" accounts
-            # These are needed for forecasting and cash flow calculations
-            def get_safe(col):
-                return full_df[col].fillna(0) if col in full_df.columns else 0
-
-            if "Current Assets" in full_df.columns:
-                full_df["OtherCurrentAssets_agg"] = (
-                    get_safe("Current Assets") -
-                    get_safe("Cash Cash Equivalents And Short Term Investments") -
-                    get_safe("Accounts Receivable") -
-                    get_safe("Inventory")
-                )
-            
-            if "Total Non Current Assets" in full_df.columns:
-                full_df["OtherNonCurrentAssets_agg"] = (
-                    get_safe("Total Non Current Assets") -
-                    get_safe("Net PPE") -
-                    get_safe("Goodwill And Other Intangible Assets")
-                )
-            
-            if "Current Liabilities" in full_df.columns:
-                full_df["OtherCurrentLiabilities_agg"] = (
-                    get_safe("Current Liabilities") -
-                    get_safe("Accounts Payable")
-                )
-            
-            if "Total Non Current Liabilities Net Minority Interest" in full_df.columns:
-                full_df["OtherNonCurrentLiabilities_agg"] = (
-                    get_safe("Total Non Current Liabilities Net Minority Interest") -
-                    get_safe("Long Term Debt And Capital Lease Obligation")
-                )
-            
-            output_path = os.path.join(silver_dir, f"{ticker}.parquet")
-            full_df.to_parquet(output_path)
-            print(f"Saved {ticker} to Silver layer")
-            
-        except Exception as e:
-            print(f"Error processing {ticker}: {e}")
+        return None
+
+    os.makedirs(SILVER_DIR, exist_ok=True)
+    if tickers is None:
+        tickers = list_bronze_tickers(bronze_format, as_of)
 
+    if silver_layout == "panel":
+        # Chunks own whole panel buckets, so workers never write the same file
+        result = run_chunked("processing", _process_panel_chunk, tickers, max_workers, chunksize,
+                             args=(bronze_format, lean, quarterly, as_of), key=silver_store.ticker_bucket)
+    else:
+        result = run_chunked("processing", _process_chunk, tickers, max_workers, chunksize,
+                             args=(bronze_format, lean, quarterly, as_of))
+    print(result.summary())
+    return result
@@ -0,0 +1,155 @@
+import numpy as np
+import os
+from src import batch_forecasting, driver_model
+from src.batch_forecasting import (
+    HISTORY_ITEMS, MODEL, REVENUE, STATEMENT_NODES, BatchForecast, HistoryPanel, build_history_panel, batch_cagr,
+    batch_drivers, flatten_drivers, split_statements, _drop_without_revenue,
+)
+from src.forecast_cache import ForecastCache, cache_key, default_cache
+from src.forecasting import SILVER_DIR, load_silver
+from src.manifest import code_version, frame_hash, silver_hashes
+
+SCENARIO_DIR = "data/scenarios"
+# Modules whose code decides a cached history panel or scenario forecast
+CODE_MODULES = [batch_forecasting.__file__, driver_model.__file__]
+
+def _project_scenarios(panel, scenarios):
+    """
+    {name: BatchForecast} of one panel under every scenario.
+    Drivers are derived once per look-back window and CAGRs once per growth
+    fallback; each (window, tax rate, growth fallback) is projected once at its
+    longest horizon, and shorter horizons are sliced from it. A projection that
+    differs from an earlier one of the same window and horizon only in growth
+    or tax rate recomputes just the line items those drivers feed.
+    """
+    groups = {}
+    for assumptions in scenarios.values():
+        group = (assumptions.lookback_years, assumptions.tax_rate, assumptions.default_growth)
+        groups[group] = max(groups.get(group, 0), assumptions.forecast_years)
+
+    base_drivers, growths, projections, evaluations = {}, {}, {}, {}
+    for (lookback_years, tax_rate, default_growth), horizon in groups.items():
+        if lookback_years not in base_drivers:
+            base_drivers[lookback_years] = batch_drivers(panel, lookback_years)
+        if default_growth not in growths:
+            growths[default_growth] = batch_cagr(panel.item(REVENUE), fallback=default_growth)
+
+        drivers = {**base_drivers[lookback_years], "growth": growths[default_growth]}
+        if tax_rate is not None:
+            drivers["tax_rate"] = np.full(len(panel.tickers), float(tax_rate))
+        given = {**flatten_drivers(drivers), "forecast_years": horizon}
+
+        previous = evaluations.get((lookback_years, horizon))
+        if previous is None:
+            evaluation = MODEL.evaluate(given, STATEMENT_NODES)
+        else:
+            changes = {name: given[name] for name in ("growth", "tax_rate") if given[name] is not previous[name]}
+            evaluation = MODEL.recompute(previous, changes)
+        evaluations[(lookback_years, horizon)] = evaluation
+        projections[(lookback_years, tax_rate, default_growth)] = split_statements(evaluation.values)
+
+    out = {}
+    for name, assumptions in scenarios.items():
+        statements = projections[(assumptions.lookback_years, assumptions.tax_rate, assumptions.default_growth)]
+        horizon = assumptions.forecast_years
+        out[name] = BatchForecast(panel.tickers, panel.last_dates,
+                                  *[{col: v[:, :horizon] for col, v in s.items()} for s in statements])
+    return out
+
+def _cached_panel(hashes, load_frames, cache, version):
+    """
+    History panel of the tickers in hashes, built only for those whose panel rows are not cached.
+    """
+    keys = {ticker: cache_key(ticker, h, None, version) for ticker, h in hashes.items()}
+    panel, found = cache.get(list(keys.values()))
+    found = set(found)
+    missing = [ticker for ticker in keys if keys[ticker] not in found]
+    if missing:
+        built = build_history_panel(load_frames(missing))
+        cache.put([keys[ticker] for ticker in built.tickers], built)
+        panel = built if panel is None else HistoryPanel.concat([panel, built])
+    return panel
+
+def _evaluate(hashes, load_frames, scenarios, cache):
+    """
+    {name: BatchForecast} of the tickers in hashes ({ticker: Silver hash}) under
+    every scenario. Forecasts are cached per ticker and scenario, so only the
+    tickers whose Silver changed, or that a scenario has not seen, are projected.
+    load_frames(tickers) returns {ticker: Silver frame}.
+    """
+    version = code_version(CODE_MODULES)
+    tickers = sorted(hashes)
+    results, missing = {}, {}
+    for name, assumptions in scenarios.items():
+        keys = [cache_key(ticker, hashes[ticker], assumptions, version) for ticker in tickers]
+        results[name], found = cache.get(keys)
+        found = set(found)
+        missing[name] = [ticker for ticker, key in zip(tickers, keys) if key not in found]
+
+    stale = sorted({ticker for names in missing.values() for ticker in names})
+    if stale:
+        panel = _drop_without_revenue(_cached_panel({t: hashes[t] for t in stale}, load_frames, cache, version))
+        position = {ticker: i for i, ticker in enumerate(panel.tickers)}
+        todo = {name: scenarios[name] for name, names in missing.items() if names}
+        for name, batch in _project_scenarios(panel, todo).items():
+            cache.put([cache_key(ticker, hashes[ticker], scenarios[name], version) for ticker in batch.tickers], batch)
+            wanted = batch.take([position[t] for t in missing[name] if t in position])
+            results[name] = wanted if results[name] is None else BatchForecast.concat([results[name], wanted])
+
+    # Tickers in order, as forecast_batch returns them
+    for name, batch in results.items():
+        if batch is None:
+            continue
+        order = sorted(range(len(batch.tickers)), key=batch.tickers.__getitem__)
+        results[name] = batch.take(order)
+    return results
+
+def evaluate_scenarios(frames, scenarios, cache=None, hashes=None):
+    """
+    Forecasts {ticker: Silver frame} under every named scenario ({name: Assumptions})
+    in one call. Returns {name: BatchForecast}; tickers that cannot be forecast
+    are left out, as in forecast_batch.
+    The history panel is built once for all scenarios, and only the drivers and
+    projections that differ between scenarios are computed (see _project_scenarios).
+    With a ForecastCache, the panel rows and forecasts are stored per ticker
+    under its Silver content hash, so a repeated scenario costs a lookup, a new
+    one only its projection, and a changed ticker only its own work. hashes
+    ({ticker: Silver hash}) defaults to hashing the frames.
+    """
+    if cache is None:
+        return _project_scenarios(_drop_without_revenue(build_history_panel(frames)), scenarios)
+    if hashes is None:
+        hashes = {t: frame_hash(df) for t, df in frames.items() if not df.empty}
+    return _evaluate(hashes, lambda tickers: {t: frames[t] for t in tickers}, scenarios, cache)
+
+def run_scenarios(scenarios, tickers=None, silver_layout="files", cache=None):
+    """
+    Forecasts the Silver universe under every named scenario ({name: Assumptions}).
+    Saves each scenario to data/scenarios/<name>.parquet (one row per ticker and
+    forecast year) and returns {name: BatchForecast}.
+    Silver is identified by the same content hashes as the incremental manifest,
+    and only the Silver of tickers missing from the cache is read. cache
+    defaults to the shared disk-backed cache; pass ForecastCache(cache_dir=None)
+    to keep it in memory.
+    """
+    print(f"Evaluating {len(scenarios)} scenarios...")
+    hashes = silver_hashes(SILVER_DIR, silver_layout)
+    if tickers is not None:
+        hashes = {t: hashes[t] for t in tickers if t in hashes}
+    if not hashes:
+        print("No Silver data to forecast.")
+        return None
+
+    cache = cache or default_cache()
+    before = dict(cache.stats)
+    load_frames = lambda selected: load_silver(selected, silver_layout, columns=HISTORY_ITEMS)
+    results = _evaluate(hashes, load_frames, scenarios, cache)
+
+    os.makedirs(SCENARIO_DIR, exist_ok=True)
+    for name, batch in results.items():
+        batch.to_frame().to_parquet(os.path.join(SCENARIO_DIR, f"{name}.parquet"))
+
+    hits = {k: cache.stats[k] - before[k] for k in before}
+    print(f"Forecast {len(hashes)} tickers under {len(scenarios)} scenarios "
+          f"(cache: {hits['memory_hits']} memory hits, {hits['disk_hits']} disk hits, {hits['misses']} misses)")
+    return results
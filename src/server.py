@@ -0,0 +1,382 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from src import instrumentation, silver_store
+from src.forecasting import (
+    DEFAULT_GROWTH, FORECAST_YEARS, LOOKBACK_YEARS, REQUIRED_COLUMNS, SILVER_DIR, Assumptions, forecast_ticker,
+    project_silver, read_silver_file,
+)
+from src.processing import compact_frame
+from src.valuation import TERMINAL_GROWTH, WACC, inputs_from_gold, value_universe
+
+HOST = "127.0.0.1"
+PORT = 8765
+RELOAD_INTERVAL = 2.0
+FORECAST_CACHE_ENTRIES = 4096
+LATENCY_WINDOW = 10000  # latencies kept per endpoint for the percentiles
+# Accepted ranges of the query parameters (inclusive). The horizon bound keeps one
+# request from building an unbounded forecast in a long-running process.
+BOUNDS = {
+    "horizon": (1, 30),
+    "lookback": (1, 20),
+    "tax_rate": (0.0, 1.0),
+    "default_growth": (-1.0, 1.0),
+    "wacc": (0.0, 1.0),
+    "terminal_growth": (-1.0, 1.0),
+}
+
+class SilverCache:
+    """
+    The Silver layer held in memory as {ticker: frame}, with a version per
+    ticker (the mtime and size of its file, or of its panel bucket).
+    refresh() reloads only the files or buckets that changed and drops the
+    tickers that disappeared; readers always see a complete snapshot, because
+    every refresh swaps in a new dict instead of mutating the current one.
+    lean keeps only REQUIRED_COLUMNS with compact dtypes; tickers, if given,
+    limits the cache to those tickers.
+    """
+    def __init__(self, silver_layout="files", lean=False, tickers=None):
+        self.silver_layout = silver_layout
+        self.lean = lean
+        self.tickers = None if tickers is None else set(tickers)
+        self.frames = {}
+        self.versions = {}
+        self.reloads = 0
+        self.last_reload = None
+        self._stamps = {}  # file or bucket -> (mtime_ns, size)
+        self._bucket_tickers = {}
+        self._lock = threading.Lock()
+
+    def get(self, ticker):
+        """
+        (frame, version) of a ticker, or (None, None).
+        """
+        frames, versions = self.frames, self.versions
+        return frames.get(ticker), versions.get(ticker)
+
+    def _prepare(self, df):
+        if self.lean:
+            df = compact_frame(project_silver(df))
+        return df.sort_index()
+
+    def _scan(self):
+        if self.silver_layout == "panel":
+            paths = silver_store.list_bucket_files()
+        elif os.path.exists(SILVER_DIR):
+            paths = {entry.name[:-len(".parquet")]: entry.path for entry in os.scandir(SILVER_DIR)
+                     if entry.name.endswith(".parquet")
+                     and (self.tickers is None or entry.name[:-len(".parquet")] in self.tickers)}
+        else:
+            paths = {}
+        stamps = {}
+        for key, path in paths.items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stamps[key] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def _load(self, key):
+        """
+        {ticker: frame} stored under a file (ticker) or bucket key.
+        """
+        columns = REQUIRED_COLUMNS if self.lean else None
+        if self.silver_layout == "panel":
+            frames = silver_store.read_bucket_frames(key, columns)
+            return frames if self.tickers is None else {t: df for t, df in frames.items() if t in self.tickers}
+        return {key: read_silver_file(os.path.join(SILVER_DIR, f"{key}.parquet"), columns)}
+
+    def refresh(self):
+        """
+        Reloads what changed since the last refresh; returns (tickers reloaded, tickers dropped).
+        A file that cannot be read yet (e.g. still being written) is retried on the next refresh.
+        """
+        with self._lock:
+            stamps = self._scan()
+            frames, versions = dict(self.frames), dict(self.versions)
+            reloaded, dropped = [], []
+
+            for key in set(self._stamps) - set(stamps):
+                for ticker in self._bucket_tickers.pop(key, [key]):
+                    frames.pop(ticker, None)
+                    versions.pop(ticker, None)
+                    dropped.append(ticker)
+                del self._stamps[key]
+
+            for key, stamp in stamps.items():
+                if self._stamps.get(key) == stamp:
+                    continue
+                try:
+                    loaded = self._load(key)
+                except Exception as e:
+                    print(f"Could not reload Silver {key}: {type(e).__name__}: {e}")
+                    continue
+                for ticker in set(self._bucket_tickers.get(key, [])) - set(loaded):
+                    frames.pop(ticker, None)
+                    versions.pop(ticker, None)
+                    dropped.append(ticker)
+                for ticker, df in loaded.items():
+                    frames[ticker] = self._prepare(df)
+                    versions[ticker] = stamp
+                    reloaded.append(ticker)
+                self._stamps[key] = stamp
+                if self.silver_layout == "panel":
+                    self._bucket_tickers[key] = list(loaded)
+
+            self.frames, self.versions = frames, versions
+            if reloaded or dropped:
+                self.reloads += 1
+                self.last_reload = time.time()
+            return reloaded, dropped
+
+class LatencyStats:
+    """
+    Request counts and the latencies of the last LATENCY_WINDOW requests per endpoint.
+    """
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.latencies = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            if endpoint not in self.latencies:
+                self.latencies[endpoint] = deque(maxlen=self.window)
+                self.counts[endpoint] = {"requests": 0, "errors": 0}
+            self.latencies[endpoint].append(seconds)
+            self.counts[endpoint]["requests"] += 1
+            self.counts[endpoint]["errors"] += status >= 400
+
+    def summary(self):
+        with self._lock:
+            snapshot = {endpoint: np.array(values) for endpoint, values in self.latencies.items()}
+            counts = {endpoint: dict(c) for endpoint, c in self.counts.items()}
+        out = {}
+        for endpoint, values in snapshot.items():
+            p50, p99 = np.percentile(values, [50, 99]) * 1000
+            out[endpoint] = {**counts[endpoint], "p50_ms": round(float(p50), 3), "p99_ms": round(float(p99), 3),
+                             "max_ms": round(float(values.max()) * 1000, 3)}
+        return out
+
+class ValuationService:
+    """
+    Forecasts and values single tickers from the hot Silver cache.
+    Forecasts are memoized per (ticker, Silver version, assumptions) in an LRU
+    of max_entries, so a reloaded ticker is forecast again and nothing else is.
+    """
+    def __init__(self, cache, max_entries=FORECAST_CACHE_ENTRIES):
+        self.cache = cache
+        self.max_entries = max_entries
+        self.started = time.time()
+        self.latency = LatencyStats()
+        self.forecasts = OrderedDict()
+        self.forecast_stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def forecast(self, ticker, assumptions):
+        """
+        Gold frame (historical and forecast rows) of a ticker, or None when it
+        is unknown or cannot be forecast.
+        """
+        df, version = self.cache.get(ticker)
+        if df is None:
+            return None
+        key = (ticker, version, assumptions)
+        with self._lock:
+            if key in self.forecasts:
+                self.forecasts.move_to_end(key)
+                self.forecast_stats["hits"] += 1
+                return self.forecasts[key]
+            self.forecast_stats["misses"] += 1
+
+        gold = forecast_ticker(df.astype("float64") if self.cache.lean else df.copy(), assumptions)
+        with self._lock:
+            self.forecasts[key] = gold
+            while len(self.forecasts) > self.max_entries:
+                self.forecasts.popitem(last=False)
+        return gold
+
+    def valuation(self, ticker, assumptions, wacc=WACC, terminal_growth=TERMINAL_GROWTH):
+        """
+        Base-case DCF row of a ticker (see valuation.value_universe), or None.
+        """
+        gold = self.forecast(ticker, assumptions)
+        if gold is None:
+            return None
+        inputs = inputs_from_gold({ticker: gold})
+        if not inputs.tickers:
+            return None
+        return value_universe(inputs, wacc, terminal_growth).iloc[0]
+
+    def stats(self):
+        with self._lock:
+            forecast_cache = {**self.forecast_stats, "entries": len(self.forecasts)}
+        return {
+            "uptime_s": round(time.time() - self.started, 3),
+            "tickers": len(self.cache.frames),
+            "reloads": self.cache.reloads,
+            "last_reload": self.cache.last_reload,
+            "forecast_cache": forecast_cache,
+            "endpoints": self.latency.summary(),
+        }
+
+def _float(query, name, default):
+    """
+    The last value of a query parameter as a float within BOUNDS[name], or
+    default when it is absent. Raises ValueError otherwise (a 400 response).
+    """
+    values = query.get(name)
+    if not values:
+        return default
+    value = float(values[-1])
+    low, high = BOUNDS[name]
+    if not low <= value <= high:  # also rejects nan
+        raise ValueError(f"{name} must be between {low} and {high}, got {values[-1]}")
+    return value
+
+def _int(query, name, default):
+    value = _float(query, name, default)
+    if value != int(value):
+        raise ValueError(f"{name} must be a whole number, got {query[name][-1]}")
+    return int(value)
+
+def parse_assumptions(query):
+    """
+    Assumptions from query parameters named like the command-line flags:
+    horizon, lookback, tax_rate, default_growth, each within BOUNDS.
+    """
+    return Assumptions(
+        _int(query, "horizon", FORECAST_YEARS),
+        _int(query, "lookback", LOOKBACK_YEARS),
+        _float(query, "tax_rate", None),
+        _float(query, "default_growth", DEFAULT_GROWTH),
+    )
+
+def _records(df):
+    out = df.reset_index(names="Date")
+    out["Date"] = out["Date"].dt.strftime("%Y-%m-%d")
+    out = out.astype(object).where(out.notna(), None)
+    return out.to_dict(orient="records")
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    GET /forecast?ticker=X[&horizon=&lookback=&tax_rate=&default_growth=]
+    GET /valuation?ticker=X[&wacc=&terminal_growth=&...assumptions]
+    GET /stats, GET /reload. Responses are JSON.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        route = {"/forecast": self._forecast, "/valuation": self._valuation, "/stats": self._stats,
+                 "/reload": self._reload}.get(url.path)
+        try:
+            if route is None:
+                status, body = 404, {"error": f"unknown endpoint {url.path}"}
+            else:
+                status, body = route(parse_qs(url.query))
+        except (ValueError, KeyError) as e:
+            status, body = 400, {"error": f"{type(e).__name__}: {e}"}
+        except Exception as e:
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        self.server.service.latency.record(url.path if route else "other", time.perf_counter() - start, status)
+
+    def _ticker(self, query):
+        return query["ticker"][-1].upper()
+
+    def _forecast(self, query):
+        ticker, assumptions = self._ticker(query), parse_assumptions(query)
+        gold = self.server.service.forecast(ticker, assumptions)
+        if gold is None:
+            return 404, {"error": f"no forecast for {ticker}"}
+        return 200, {"ticker": ticker, "assumptions": json.loads(assumptions.key()), "rows": _records(gold)}
+
+    def _valuation(self, query):
+        ticker, assumptions = self._ticker(query), parse_assumptions(query)
+        wacc, terminal_growth = _float(query, "wacc", WACC), _float(query, "terminal_growth", TERMINAL_GROWTH)
+        if terminal_growth >= wacc:
+            raise ValueError(f"terminal_growth ({terminal_growth}) must be below wacc ({wacc})")
+        row = self.server.service.valuation(ticker, assumptions, wacc, terminal_growth)
+        if row is None:
+            return 404, {"error": f"no valuation for {ticker}"}
+        values = {k: (None if pd.isna(v) else float(v)) for k, v in row.items()}
+        return 200, {"ticker": ticker, "assumptions": json.loads(assumptions.key()), "valuation": values}
+
+    def _stats(self, query):
+        return 200, self.server.service.stats()
+
+    def _reload(self, query):
+        reloaded, dropped = self.server.service.cache.refresh()
+        return 200, {"reloaded": len(reloaded), "dropped": len(dropped)}
+
+    def log_message(self, format, *args):
+        pass  # one line per request would dominate the latency; see /stats
+
+def make_server(service, host=HOST, port=PORT):
+    """
+    A threading HTTP server for the service; every request runs in its own thread.
+    port=0 picks a free port (see server.server_address).
+    """
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def _reload_loop(cache, interval, stop):
+    while not stop.wait(interval):
+        reloaded, dropped = cache.refresh()
+        if reloaded or dropped:
+            print(f"Reloaded {len(reloaded)} tickers, dropped {len(dropped)}")
+
+def start(host=HOST, port=PORT, silver_layout="files", lean=False, reload_interval=RELOAD_INTERVAL, tickers=None):
+    """
+    Loads Silver, starts the server and the reload thread in the background
+    and returns (server, stop event); set the event and call server.shutdown() to stop.
+    Metric recording is switched off: every reload would add events to a
+    process that never exports them; /stats reports the request latencies.
+    """
+    instrumentation.set_recording(False)
+    cache = SilverCache(silver_layout, lean, tickers)
+    cache.refresh()
+    server = make_server(ValuationService(cache), host, port)
+    stop = threading.Event()
+    threading.Thread(target=_reload_loop, args=(cache, reload_interval, stop), name="silver-reload",
+                     daemon=True).start()
+    threading.Thread(target=server.serve_forever, name="valuation-server", daemon=True).start()
+    return server, stop
+
+def run_server(host=HOST, port=PORT, silver_layout="files", lean=False, reload_interval=RELOAD_INTERVAL,
+               tickers=None):
+    """
+    Serves forecasts and valuations of tickers (default: all of Silver) until interrupted.
+    Silver is loaded once and checked for changes every reload_interval seconds.
+    """
+    server, stop = start(host, port, silver_layout, lean, reload_interval, tickers)
+    host, port = server.server_address[:2]
+    print(f"Serving {len(server.service.cache.frames)} tickers on http://{host}:{port} "
+          f"(/forecast, /valuation, /stats, /reload)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Stopping server...")
+    finally:
+        stop.set()
+        server.shutdown()
+        server.server_close()
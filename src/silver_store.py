@@ -0,0 +1,162 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import glob
+import os
+import zlib
+from src import instrumentation
+
+PANEL_DIR = "data/silver_panel"
+TTM_PANEL_DIR = "data/silver_ttm_panel"
+N_BUCKETS = 64
+ROW_GROUP_SIZE = 256
+KEY_COLUMNS = ["ticker", "period_end"]
+PARTITIONING = ds.partitioning(pa.schema([("bucket", pa.int32())]), flavor="hive")
+
+def ticker_bucket(ticker):
+    """
+    Stable partition of a ticker; the same ticker always lands in the same bucket.
+    """
+    return zlib.crc32(ticker.encode()) % N_BUCKETS
+
+def _bucket_path(bucket, panel_dir=PANEL_DIR):
+    return os.path.join(panel_dir, f"bucket={bucket}", "part-0.parquet")
+
+def _to_table(frames):
+    parts = []
+    for ticker, df in frames.items():
+        part = df.apply(pd.to_numeric, errors="coerce")
+        wide = [col for col in part.columns if part[col].dtype != "float32"]
+        if len(wide) == len(part.columns):
+            part = part.astype("float64")
+        else:
+            # Keeps lean (float32) columns; copy() consolidates the per-column blocks
+            part = part.astype(dict.fromkeys(wide, "float64")).copy()
+        part = part.rename_axis("period_end").reset_index()
+        part.insert(0, "ticker", ticker)
+        parts.append(part)
+
+    panel = pd.concat(parts, ignore_index=True)
+    table = pa.Table.from_pandas(panel, preserve_index=False).replace_schema_metadata(None)
+    period_end = table.schema.get_field_index("period_end")
+    return table.set_column(period_end, "period_end", table.column("period_end").cast(pa.timestamp("ms")))
+
+def write_panel(frames, panel_dir=PANEL_DIR):
+    """
+    Upserts {ticker: Silver frame} into the panel (or the TTM panel, with TTM_PANEL_DIR).
+    Rewrites only the buckets the tickers belong to, replacing their previous rows.
+    Rows are sorted by (ticker, period_end) so row-group statistics prune reads.
+    """
+    by_bucket = {}
+    for ticker, df in frames.items():
+        by_bucket.setdefault(ticker_bucket(ticker), {})[ticker] = df
+
+    for bucket, bucket_frames in by_bucket.items():
+        table = _to_table(bucket_frames)
+
+        path = _bucket_path(bucket, panel_dir)
+        if os.path.exists(path):
+            existing = pq.read_table(path)
+            keep = pc.invert(pc.is_in(existing.column("ticker"), pa.array(list(bucket_frames))))
+            table = pa.concat_tables([existing.filter(keep), table], promote_options="permissive")
+
+        table = table.sort_by([("ticker", "ascending"), ("period_end", "ascending")])
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)
+        instrumentation.record_io(None, bytes_written=os.path.getsize(path))
+
+def open_dataset(panel_dir=PANEL_DIR):
+    """
+    The bucket files of a panel as one pyarrow dataset with a bucket column, or None when it is empty.
+    """
+    files = sorted(glob.glob(os.path.join(panel_dir, "bucket=*", "part-0.parquet")))
+    if not files:
+        return None
+
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files], promote_options="permissive")
+    schema = schema.remove_metadata().append(pa.field("bucket", pa.int32()))
+    return ds.dataset(files, schema=schema, format="parquet", partitioning=PARTITIONING,
+                      partition_base_dir=panel_dir)
+
+def read_panel(columns=None, tickers=None, start=None, end=None, panel_dir=PANEL_DIR):
+    """
+    Reads the panel as a DataFrame indexed by (ticker, period_end).
+    columns projects line items; tickers and the start/end period bounds are
+    pushed down to the Parquet reader, so only matching buckets and row groups are read.
+    """
+    dataset = open_dataset(panel_dir)
+    if dataset is None:
+        return pd.DataFrame()
+
+    expr = None
+    def add(condition):
+        return condition if expr is None else expr & condition
+
+    if tickers is not None:
+        tickers = list(tickers)
+        expr = add(ds.field("bucket").isin(sorted({ticker_bucket(t) for t in tickers})))
+        expr = add(ds.field("ticker").isin(tickers))
+    if start is not None:
+        expr = add(ds.field("period_end") >= pa.scalar(pd.Timestamp(start), pa.timestamp("ms")))
+    if end is not None:
+        expr = add(ds.field("period_end") <= pa.scalar(pd.Timestamp(end), pa.timestamp("ms")))
+
+    if columns is not None:
+        columns = KEY_COLUMNS + [c for c in columns if c in dataset.schema.names and c not in KEY_COLUMNS]
+    else:
+        columns = [c for c in dataset.schema.names if c != "bucket"]
+
+    table = dataset.to_table(columns=columns, filter=expr)
+    instrumentation.record_io(None, bytes_read=table.nbytes)
+    return _to_panel(table)
+
+def _to_panel(table):
+    df = table.to_pandas()
+    df["period_end"] = pd.to_datetime(df["period_end"])
+    return df.set_index(KEY_COLUMNS).sort_index()
+
+def _split(panel):
+    frames = {}
+    for ticker, df in panel.groupby(level="ticker", sort=True):
+        df = df.droplevel("ticker").rename_axis(index=None).dropna(axis=1, how="all")
+        frames[ticker] = df
+    return frames
+
+def read_panel_frames(columns=None, tickers=None, start=None, end=None, panel_dir=PANEL_DIR):
+    """
+    Reads the panel as {ticker: frame indexed by period end}, like the per-ticker files.
+    Columns that are entirely empty for a ticker are dropped, since they only exist
+    in the panel because another ticker reports them.
+    """
+    return _split(read_panel(columns, tickers, start, end, panel_dir))
+
+def list_bucket_files(panel_dir=PANEL_DIR):
+    """
+    {bucket: path of its Parquet file}.
+    """
+    files = glob.glob(os.path.join(panel_dir, "bucket=*", "part-0.parquet"))
+    return {int(os.path.basename(os.path.dirname(f)).split("=", 1)[1]): f for f in files}
+
+def read_bucket_frames(bucket, columns=None, panel_dir=PANEL_DIR):
+    """
+    Reads a single bucket as {ticker: frame}, e.g. to reload only the buckets that changed.
+    """
+    path = _bucket_path(bucket, panel_dir)
+    if columns is not None:
+        names = set(pq.read_schema(path).names)
+        columns = KEY_COLUMNS + [c for c in columns if c in names and c not in KEY_COLUMNS]
+    table = pq.read_table(path, columns=columns)
+    instrumentation.record_io(None, bytes_read=table.nbytes)
+    return _split(_to_panel(table))
+
+def list_panel_tickers(panel_dir=PANEL_DIR):
+    dataset = open_dataset(panel_dir)
+    if dataset is None:
+        return []
+    column = dataset.to_table(columns=["ticker"]).column("ticker")
+    return sorted(column.unique().to_pylist())
@@ -0,0 +1,175 @@
+import pandas as pd
+import hashlib
+import json
+import os
+import threading
+from src import bronze, instrumentation
+
+# data/bronze/snapshots/objects/<ab>/<sha256>.json: statement payloads, stored once per distinct content
+# data/bronze/snapshots/index/<snapshot id>.jsonl: the (ticker, statement, digest) entries a snapshot changed
+SNAPSHOT_DIR = os.path.join(bronze.BRONZE_DIR, "snapshots")
+OBJECTS_DIR = os.path.join(SNAPSHOT_DIR, "objects")
+INDEX_DIR = os.path.join(SNAPSHOT_DIR, "index")
+STATE_COLUMNS = ["ticker", "statement", "digest", "snapshot"]
+
+def snapshot_time(snapshot_id):
+    """
+    Local time a snapshot was taken, from its id (see bronze.new_batch_id).
+    """
+    return pd.to_datetime(snapshot_id[:15], format="%Y%m%dT%H%M%S")
+
+def _object_path(digest):
+    return os.path.join(OBJECTS_DIR, digest[:2], f"{digest}.json")
+
+def put_object(payload):
+    """
+    Stores a statement payload under its SHA-256 and returns the digest.
+    Content already in the store is not written again.
+    """
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    path = _object_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        instrumentation.record_io(None, bytes_written=len(payload))
+    return digest
+
+def read_object(digest):
+    path = _object_path(digest)
+    with open(path) as f:
+        payload = f.read()
+    instrumentation.record_io(None, bytes_read=len(payload))
+    return payload
+
+def list_snapshots():
+    """
+    The snapshot index: one row per snapshot with its time and the number of
+    statements it changed, oldest first.
+    """
+    if not os.path.exists(INDEX_DIR):
+        return pd.DataFrame(columns=["snapshot", "time", "changed"])
+    rows = []
+    for file_name in sorted(f for f in os.listdir(INDEX_DIR) if f.endswith(".jsonl")):
+        snapshot_id = file_name[:-len(".jsonl")]
+        with open(os.path.join(INDEX_DIR, file_name)) as f:
+            changed = sum(1 for line in f if line.endswith("\n"))
+        rows.append({"snapshot": snapshot_id, "time": snapshot_time(snapshot_id), "changed": changed})
+    return pd.DataFrame(rows, columns=["snapshot", "time", "changed"])
+
+def _snapshots_as_of(as_of):
+    """
+    Ids of the snapshots visible as of a snapshot id, a timestamp (a date alone
+    means the end of that day), or None for all of them.
+    """
+    snapshot_ids = list(list_snapshots()["snapshot"])
+    if as_of is None:
+        return snapshot_ids
+    as_of = str(as_of)
+    if as_of in snapshot_ids:
+        return snapshot_ids[:snapshot_ids.index(as_of) + 1]
+    cutoff = pd.Timestamp(as_of)
+    if cutoff == cutoff.normalize() and len(as_of) <= 10:
+        cutoff += pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    return [s for s in snapshot_ids if snapshot_time(s) <= cutoff]
+
+def history(as_of=None, tickers=None):
+    """
+    Every (ticker, statement, digest, snapshot) change recorded up to as_of, oldest first.
+    """
+    entries = []
+    for snapshot_id in _snapshots_as_of(as_of):
+        with open(os.path.join(INDEX_DIR, f"{snapshot_id}.jsonl")) as f:
+            for line in f:
+                if line.endswith("\n"):  # a line cut short by a crash was never committed
+                    entries.append({**json.loads(line), "snapshot": snapshot_id})
+    df = pd.DataFrame(entries, columns=STATE_COLUMNS)
+    if tickers is not None:
+        df = df[df["ticker"].isin(list(tickers))]
+    return df
+
+def state(as_of=None, tickers=None):
+    """
+    Bronze as of a snapshot or time: the latest (ticker, statement, digest,
+    snapshot) entry of every statement among the visible snapshots.
+    """
+    df = history(as_of, tickers)
+    return df.drop_duplicates(["ticker", "statement"], keep="last").sort_values(["ticker", "statement"])
+
+def read_statements(snapshot_state, ticker, names=None):
+    """
+    {bronze name: (dates x line items) frame} of a ticker in a state(); empty
+    statements are left out.
+    """
+    rows = snapshot_state[snapshot_state["ticker"] == ticker]
+    frames = {}
+    for name, digest in zip(rows["statement"], rows["digest"]):
+        if names is not None and name not in names:
+            continue
+        df = bronze.json_to_frame(json.loads(read_object(digest)))
+        if df is not None:
+            frames[name] = df
+    return frames
+
+def read_frames(snapshot_state, ticker):
+    """
+    The annual statement frames of a ticker, as bronze.read_json returns them.
+    """
+    frames = read_statements(snapshot_state, ticker, bronze.STATEMENT_NAMES)
+    return [frames[name] for name in bronze.STATEMENT_NAMES if name in frames]
+
+def read_long(snapshot_state, tickers, names):
+    """
+    Long rows (see bronze.statements_to_long) of the given statements of many tickers.
+    """
+    parts = []
+    for ticker in tickers:
+        statements = {name: df.T for name, df in read_statements(snapshot_state, ticker, names).items()}
+        if statements:
+            parts.append(bronze.statements_to_long(ticker, statements))
+    if not parts:
+        return pd.DataFrame(columns=bronze.BRONZE_SCHEMA.names)
+    return pd.concat(parts, ignore_index=True)
+
+class SnapshotWriter:
+    """
+    Records one ingestion run as a snapshot. Only statements whose content
+    differs from the latest snapshot are written to the object store and the
+    index; unchanged statements cost a hash and nothing else.
+    Index lines are flushed as tickers arrive, so a crash keeps what was recorded.
+    """
+    def __init__(self, snapshot_id=None):
+        self.snapshot_id = snapshot_id or bronze.new_batch_id()
+        head = state()
+        self.head = dict(zip(zip(head["ticker"], head["statement"]), head["digest"]))
+        self.changed = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def add(self, ticker, statements):
+        """
+        Records the fetched statements of a ticker; returns how many changed.
+        """
+        lines = []
+        for name, payload in bronze.statement_payloads(statements).items():
+            digest = put_object(payload)
+            if self.head.get((ticker, name)) != digest:
+                lines.append(json.dumps({"ticker": ticker, "statement": name, "digest": digest}) + "\n")
+                self.head[(ticker, name)] = digest
+        if lines:
+            with self._lock:
+                if self._file is None:
+                    os.makedirs(INDEX_DIR, exist_ok=True)
+                    self._file = open(os.path.join(INDEX_DIR, f"{self.snapshot_id}.jsonl"), "a")
+                self._file.write("".join(lines))
+                self._file.flush()
+                self.changed += len(lines)
+        return len(lines)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
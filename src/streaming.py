@@ -0,0 +1,301 @@
+import pandas as pd
+import os
+import queue
+import threading
+import time
+import traceback
+from functools import partial
+from src import bronze, bronze_io, instrumentation, silver_store, snapshots, valuation
+from src.forecasting import GOLD_DIR, forecast_ticker
+from src.ingestion import (
+    MAX_ATTEMPTS, RETRY_BASE_SECONDS, RETRY_CAP_SECONDS, RateLimiter, fetch_failed, fetch_http, fetch_with_retries,
+    fetch_yahoo,
+)
+from src.journal import DONE as JOURNAL_DONE, FAILED, FINISHED, PENDING, QUARANTINED, Journal
+from src.parallel import DONE, ERROR, SKIPPED, StageResult
+from src.processing import SILVER_DIR, process_ticker
+
+_END = object()
+
+class StreamingRun:
+    """
+    Outcome of a streaming run: one StageResult per stage, the base-case
+    valuation of every ticker and the seconds until the first valuation.
+    """
+    def __init__(self):
+        self.results = {stage: StageResult(stage) for stage in ["ingestion", "processing", "forecasting"]}
+        self.valuations = []
+        self.started = time.perf_counter()
+        self.first_valuation_s = None
+        self._lock = threading.Lock()
+
+    def add(self, stage, ticker, status, detail=None):
+        with self._lock:
+            self.results[stage].add(ticker, status, detail)
+        instrumentation.record_outcome(stage, ticker, status, detail[0] if status == ERROR else detail)
+
+    def error(self, stage, ticker, e):
+        self.add(stage, ticker, ERROR, (f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+    def valuation(self):
+        return pd.concat(self.valuations) if self.valuations else pd.DataFrame()
+
+class _BatchWriter:
+    """
+    Buffers per-ticker outputs and writes them every batch_size tickers, or
+    once the oldest buffered ticker has waited max_wait seconds (see flush_due).
+    written(ticker, error) is called for every ticker of a batch once it is
+    written, with error None, or the error detail for every ticker of a
+    batch that failed.
+    """
+    def __init__(self, write, batch_size, written, max_wait=None):
+        self.write = write
+        self.batch_size = batch_size
+        self.written = written
+        self.max_wait = max_wait
+        self.deadline = None
+        self.pending = {}
+
+    def add(self, ticker, item):
+        if not self.pending and self.max_wait is not None:
+            self.deadline = time.monotonic() + self.max_wait
+        self.pending[ticker] = item
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush_due(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.flush()
+
+    def flush(self):
+        self.deadline = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        try:
+            self.write(batch)
+        except Exception as e:
+            detail = (f"{type(e).__name__}: {e}", traceback.format_exc())
+            for ticker in batch:
+                self.written(ticker, detail)
+            return
+        for ticker in batch:
+            self.written(ticker, None)
+
+def run_streaming(tickers, fetch_workers=4, requests_per_second=None, fetcher=fetch_yahoo, queue_size=16,
+                  bronze_format="json", silver_layout="files", batch_size=500, max_wait=5.0, on_valuation=None,
+                  assumptions=None, journal=None, resume=False, snapshot=False, max_attempts=MAX_ATTEMPTS,
+                  retry_base=RETRY_BASE_SECONDS, retry_cap=RETRY_CAP_SECONDS):
+    """
+    Moves every ticker through Bronze -> Silver -> Gold -> valuation as soon as
+    its data arrives. Fetch threads, a processing thread and a forecasting thread
+    are connected by bounded queues, so downloading ticker N+1 overlaps with
+    processing ticker N and at most queue_size tickers wait in memory per stage.
+    Frames are handed over in memory; each layer is still persisted. tickers may
+    be any iterable, including a generator: it is pulled one ticker at a time.
+    Parquet Bronze and the Silver panel are written in batches of batch_size
+    tickers, and a ticker is forecast once its batch is on disk; a batch is
+    written early when its first ticker has waited max_wait seconds, which
+    bounds the delay on slow fetches. on_valuation(ticker, row) is called
+    for every valued ticker. The built-in fetchers share one pooled HTTP
+    session, as in run_ingestion. assumptions are passed to forecast_ticker.
+
+    Fetches are retried and journaled as in run_ingestion: a ticker is pending
+    in the journal once it is pulled and done once its Bronze data is written,
+    resume skips the done and quarantined tickers, and snapshot records the
+    run in the snapshot store. Returns a StreamingRun.
+    """
+    run = StreamingRun()
+    journal = journal or Journal()
+    retry = (max_attempts, retry_base, retry_cap)
+    snapshot_writer = snapshots.SnapshotWriter() if snapshot else None
+    limiter = RateLimiter(requests_per_second)
+    if getattr(fetcher, "func", fetcher) in (fetch_yahoo, fetch_http):
+        fetcher = partial(fetcher, session=bronze_io.make_session(max(bronze_io.POOL_SIZE, fetch_workers)))
+    fetched = queue.Queue(maxsize=queue_size)
+    processed = queue.Queue(maxsize=queue_size)
+
+    ticker_iter = iter(tickers)
+    iter_lock = threading.Lock()
+    finished = {}
+
+    def next_ticker():
+        with iter_lock:
+            for ticker in ticker_iter:
+                if not resume:
+                    journal.mark(ticker, PENDING, attempts=0)
+                elif journal.state(ticker) in FINISHED:
+                    finished[journal.state(ticker)] = finished.get(journal.state(ticker), 0) + 1
+                    continue
+                return ticker
+            return None
+
+    def fetch():
+        while (ticker := next_ticker()) is not None:
+            try:
+                with instrumentation.stage_context("ingestion"), instrumentation.span(ticker=ticker):
+                    statements = fetch_with_retries(ticker, fetcher, limiter, journal, *retry)
+            except Exception as e:
+                print(f"Error ingesting {ticker}: {fetch_failed(journal, ticker, e)}")
+                run.error("ingestion", ticker, e)
+                continue
+            fetched.put((ticker, statements))
+            run.add("ingestion", ticker, DONE)
+
+    # Processed tickers whose batched Bronze or Silver writes are not on disk yet.
+    # A ticker is reported, and handed to forecasting, only once all its writes are done.
+    unwritten = {}
+
+    def finish(ticker):
+        state = unwritten.pop(ticker)
+        if state["error"] is not None:
+            run.add("processing", ticker, ERROR, state["error"])
+        elif state["silver"] is None:
+            run.add("processing", ticker, SKIPPED, "No data found")
+        else:
+            run.add("processing", ticker, DONE)
+            processed.put((ticker, state["silver"]))
+
+    def bronze_written(ticker, error):
+        if error is None:
+            journal.mark(ticker, JOURNAL_DONE, attempts=journal.attempts(ticker) + 1)
+        else:
+            journal.mark(ticker, FAILED, error[0])
+        written(ticker, error)
+
+    def written(ticker, error):
+        state = unwritten[ticker]
+        state["writes"] -= 1
+        if state["error"] is None:
+            state["error"] = error
+        if state["sealed"] and state["writes"] == 0:
+            finish(ticker)
+
+    bronze_writer = _BatchWriter(bronze.write_parquet_batch, batch_size, bronze_written, max_wait)
+    silver_writer = _BatchWriter(silver_store.write_panel, batch_size, written, max_wait)
+
+    def next_fetched():
+        """
+        The next fetched ticker, or None when a batch is due before one arrives.
+        """
+        deadlines = [w.deadline for w in (bronze_writer, silver_writer) if w.deadline is not None]
+        try:
+            return fetched.get(timeout=max(0.0, min(deadlines) - time.monotonic()) if deadlines else None)
+        except queue.Empty:
+            return None
+
+    def process_one(ticker, statements, state):
+        if snapshot_writer is not None:
+            try:
+                snapshot_writer.add(ticker, statements)
+            except Exception as e:
+                journal.mark(ticker, FAILED, f"snapshot {type(e).__name__}: {e}")
+                raise
+        if bronze_format == "parquet":
+            state["writes"] += 1
+            bronze_writer.add(ticker, statements)
+        else:
+            try:
+                bronze.write_json(ticker, statements)
+            except Exception as e:
+                journal.mark(ticker, FAILED, f"{type(e).__name__}: {e}")
+                raise
+            journal.mark(ticker, JOURNAL_DONE, attempts=journal.attempts(ticker) + 1)
+
+        dfs = bronze.statements_to_frames(statements)
+        if not dfs:
+            return
+
+        silver_df = process_ticker(dfs)
+        instrumentation.record_shape(ticker, *silver_df.shape)
+        if silver_layout == "panel":
+            state["writes"] += 1
+            silver_writer.add(ticker, silver_df)
+        else:
+            path = os.path.join(SILVER_DIR, f"{ticker}.parquet")
+            silver_df.to_parquet(path)
+            instrumentation.record_io(ticker, bytes_written=instrumentation.file_size(path))
+        state["silver"] = silver_df
+
+    def process():
+        try:
+            while (item := next_fetched()) is not _END:
+                if item is not None:
+                    ticker, statements = item
+                    state = unwritten[ticker] = {"writes": 0, "silver": None, "error": None, "sealed": False}
+                    try:
+                        with instrumentation.stage_context("processing"), instrumentation.span(ticker=ticker):
+                            process_one(ticker, statements, state)
+                    except Exception as e:
+                        state["error"] = (f"{type(e).__name__}: {e}", traceback.format_exc())
+                    state["sealed"] = True
+                    if state["writes"] == 0:
+                        finish(ticker)
+                with instrumentation.stage_context("processing"):
+                    bronze_writer.flush_due()
+                    silver_writer.flush_due()
+
+            with instrumentation.stage_context("processing"):
+                bronze_writer.flush()
+                silver_writer.flush()
+        finally:
+            # Forecasting stops at _END, so it must arrive even if processing itself broke
+            processed.put(_END)
+
+    def forecast():
+        while (item := processed.get()) is not _END:
+            ticker, silver_df = item
+            try:
+                with instrumentation.stage_context("forecasting"), instrumentation.span(ticker=ticker):
+                    combined_df = forecast_ticker(silver_df.copy(), assumptions)
+                    if combined_df is not None:
+                        path = os.path.join(GOLD_DIR, f"{ticker}_forecast.parquet")
+                        combined_df.to_parquet(path)
+                        instrumentation.record_shape(ticker, *combined_df.shape)
+                        instrumentation.record_io(ticker, bytes_written=instrumentation.file_size(path))
+                if combined_df is None:
+                    run.add("forecasting", ticker, SKIPPED, "Could not forecast IS")
+                    continue
+                run.add("forecasting", ticker, DONE)
+
+                inputs = valuation.inputs_from_gold({ticker: combined_df})
+                if inputs.tickers:
+                    row = valuation.value_universe(inputs)
+                    run.valuations.append(row)
+                    if run.first_valuation_s is None:
+                        run.first_valuation_s = time.perf_counter() - run.started
+                    if on_valuation is not None:
+                        on_valuation(ticker, row.iloc[0])
+            except Exception as e:
+                run.error("forecasting", ticker, e)
+
+    for path in [bronze.BRONZE_DIR, SILVER_DIR, GOLD_DIR, valuation.VALUATION_DIR]:
+        os.makedirs(path, exist_ok=True)
+
+    fetchers = [threading.Thread(target=fetch, name=f"fetch-{i}") for i in range(max(1, fetch_workers))]
+    consumers = [threading.Thread(target=process, name="process"), threading.Thread(target=forecast, name="forecast")]
+    with instrumentation.span("streaming"):
+        for thread in fetchers + consumers:
+            thread.start()
+        for thread in fetchers:
+            thread.join()
+        fetched.put(_END)
+        for thread in consumers:
+            thread.join()
+    if resume:
+        print(f"Resumed ingestion: skipped {finished.get(JOURNAL_DONE, 0)} done and "
+              f"{finished.get(QUARANTINED, 0)} quarantined tickers")
+    if snapshot_writer is not None:
+        snapshot_writer.close()
+        print(f"Snapshot {snapshot_writer.snapshot_id}: {snapshot_writer.changed} statements changed")
+    journal.compact()
+
+    result = run.valuation()
+    if not result.empty:
+        result.to_parquet(os.path.join(valuation.VALUATION_DIR, "valuation.parquet"))
+
+    for stage_result in run.results.values():
+        print(stage_result.summary())
+    if run.first_valuation_s is not None:
+        print(f"First valuation after {run.first_valuation_s:.2f}s")
+    return run
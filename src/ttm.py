@@ -0,0 +1,61 @@
+import pandas as pd
+import numpy as np
+
+QUARTERS = 4
+# Bronze statements whose line items are flows over the quarter; balance sheet items are stocks
+FLOW_STATEMENTS = {"quarterly_income_statement", "quarterly_cashflow"}
+# Flow-statement items that are rates or averages, so summing four quarters means nothing.
+# They are taken as of the latest quarter, like stocks.
+POINT_IN_TIME_ITEMS = {"Tax Rate For Calcs", "Basic Average Shares", "Diluted Average Shares"}
+# Days between the first and last quarter end of a valid trailing window (about nine
+# months); wider gaps mean a missing quarter, narrower ones a duplicated filing.
+WINDOW_DAYS = (250, 300)
+
+def _wide(long_df):
+    wide = long_df.pivot(index=["ticker", "period_end"], columns="line_item", values="value")
+    return wide.rename_axis(columns=None)
+
+def trailing_sums(values, tickers, dates, quarters=QUARTERS):
+    """
+    Sum of every column over the `quarters` rows ending at each row, for a
+    panel sorted by (ticker, period end): (rows x items) in, same shape out.
+    A window is valid only when it stays within one ticker, spans consecutive
+    quarters (WINDOW_DAYS) and has a value in every quarter; otherwise NaN.
+    Shifted slices keep this one vectorized pass, linear in rows x items.
+    """
+    n_rows = len(values)
+    sums = np.full(values.shape, np.nan)
+    if n_rows < quarters:
+        return sums
+
+    filled = np.nan_to_num(values, nan=0.0)
+    present = ~np.isnan(values)
+    window = n_rows - quarters + 1
+    total = sum(filled[k:k + window] for k in range(quarters))
+    count = sum(present[k:k + window].astype(np.int8) for k in range(quarters))
+
+    start, end = np.arange(window), np.arange(quarters - 1, n_rows)
+    span = (dates[end] - dates[start]) / np.timedelta64(1, "D")
+    contiguous = (tickers[end] == tickers[start]) & (span >= WINDOW_DAYS[0]) & (span <= WINDOW_DAYS[1])
+    sums[end] = np.where(contiguous[:, None] & (count == quarters), total, np.nan)
+    return sums
+
+def trailing_panel(long_df, quarters=QUARTERS):
+    """
+    Turns the quarterly Bronze rows of many tickers (bronze.read_quarterly_long)
+    into (stocks, flows) panels indexed by (ticker, period end): flows are
+    trailing-twelve-month sums, stocks the balance sheet (and POINT_IN_TIME_ITEMS)
+    at each quarter end. Only quarters with at least one complete TTM flow are kept.
+    """
+    long_df = long_df.dropna(subset=["value"]).drop_duplicates(["ticker", "period_end", "line_item"])
+    is_flow = long_df["statement"].isin(FLOW_STATEMENTS) & ~long_df["line_item"].isin(POINT_IN_TIME_ITEMS)
+
+    flows, stocks = _wide(long_df[is_flow]), _wide(long_df[~is_flow])
+    index = flows.index.union(stocks.index).sort_values()
+    flows, stocks = flows.reindex(index), stocks.reindex(index)
+
+    sums = trailing_sums(flows.to_numpy(dtype="float64"), index.codes[0],
+                         index.get_level_values("period_end").to_numpy(), quarters)
+    complete = ~np.isnan(sums).all(axis=1)
+    flows = pd.DataFrame(sums[complete], index=index[complete], columns=flows.columns)
+    return stocks[complete], flows
@@ -0,0 +1,273 @@
+import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
+import os
+from dataclasses import dataclass
+from src import instrumentation
+
+GOLD_DIR = "data/gold"
+VALUATION_DIR = "data/valuation"
+
+# Base-case assumptions
+WACC = 0.09
+TERMINAL_GROWTH = 0.025
+
+# Default sensitivity axes
+WACC_GRID = np.linspace(0.06, 0.12, 50)
+GROWTH_GRID = np.linspace(0.0, 0.04, 50)
+EXIT_MULTIPLES = np.array([6.0, 8.0, 10.0, 12.0, 14.0, 16.0])
+
+COL_UFCF = "UFCF"
+COL_EBITDA = "EBITDA"
+COL_CASH = "Cash Cash Equivalents And Short Term Investments"
+COL_TOTAL_DEBT = "Total Debt"
+DEBT_PARTS = ["Long Term Debt And Capital Lease Obligation", "Current Debt And Capital Lease Obligation"]
+SHARE_COLUMNS = ["Ordinary Shares Number", "Share Issued"]
+# Historical line items read from Gold, which therefore have to survive the Silver projection
+HISTORY_COLUMNS = [COL_CASH, COL_TOTAL_DEBT, *DEBT_PARTS, *SHARE_COLUMNS]
+
+@dataclass
+class ValuationInputs:
+    """
+    Per-ticker valuation inputs: ufcf and ebitda are (tickers x forecast years),
+    zero-padded past each ticker's horizon; years is the number of forecast years
+    per ticker; net_debt and shares are per ticker (shares is NaN when unknown).
+    """
+    tickers: list
+    ufcf: np.ndarray
+    ebitda: np.ndarray
+    years: np.ndarray
+    net_debt: np.ndarray
+    shares: np.ndarray
+
+@dataclass
+class SensitivityGrid:
+    """
+    Broadcast valuation surfaces.
+    gordon arrays are (tickers x waccs x growths), exit arrays are (tickers x waccs x multiples).
+    """
+    tickers: list
+    waccs: np.ndarray
+    growths: np.ndarray
+    exit_multiples: np.ndarray
+    ev_gordon: np.ndarray
+    per_share_gordon: np.ndarray
+    ev_exit: np.ndarray
+    per_share_exit: np.ndarray
+
+    def table(self, ticker, method="gordon", per_share=True):
+        """
+        Sensitivity table of one ticker: WACC rows x terminal growth (or exit multiple) columns.
+        """
+        i = self.tickers.index(ticker)
+        if method == "gordon":
+            values = (self.per_share_gordon if per_share else self.ev_gordon)[i]
+            columns = pd.Index(self.growths, name="Terminal Growth")
+        else:
+            values = (self.per_share_exit if per_share else self.ev_exit)[i]
+            columns = pd.Index(self.exit_multiples, name="Exit Multiple")
+        return pd.DataFrame(values, index=pd.Index(self.waccs, name="WACC"), columns=columns)
+
+def _last_value(df, columns):
+    for col in columns:
+        if col in df.columns and df[col].notna().any():
+            return df[col].dropna().iloc[-1]
+    return np.nan
+
+def net_debt_and_shares(hist_df):
+    """
+    Net debt (total debt less cash) and share count from the latest historical rows.
+    """
+    debt = _last_value(hist_df, [COL_TOTAL_DEBT])
+    if np.isnan(debt):
+        parts = [_last_value(hist_df, [col]) for col in DEBT_PARTS]
+        debt = np.nansum(parts)
+    cash = _last_value(hist_df, [COL_CASH])
+    net_debt = debt - (0.0 if np.isnan(cash) else cash)
+    return net_debt, _last_value(hist_df, SHARE_COLUMNS)
+
+def inputs_from_gold(gold_frames):
+    """
+    Builds ValuationInputs from {ticker: Gold frame} (historical and forecast rows).
+    Tickers without forecast UFCF are left out.
+    """
+    tickers, ufcf, ebitda, net_debt, shares = [], [], [], [], []
+    for ticker in sorted(gold_frames):
+        df = gold_frames[ticker]
+        forecast = df[df["Type"] == "Forecast"].sort_index()
+        if forecast.empty or COL_UFCF not in forecast.columns:
+            continue
+        debt, share_count = net_debt_and_shares(df[df["Type"] == "Historical"].sort_index())
+
+        tickers.append(ticker)
+        ufcf.append(forecast[COL_UFCF].to_numpy(dtype=float))
+        ebitda.append(forecast[COL_EBITDA].to_numpy(dtype=float) if COL_EBITDA in forecast.columns
+                      else np.full(len(forecast), np.nan))
+        net_debt.append(debt)
+        shares.append(share_count)
+
+    return ValuationInputs(tickers, _stack(ufcf), _stack(ebitda), np.array([len(r) for r in ufcf], dtype=int),
+                           np.array(net_debt, dtype=float), np.array(shares, dtype=float))
+
+def inputs_from_batch(batch, frames):
+    """
+    Builds ValuationInputs from a BatchForecast and the Silver frames it was built from.
+    """
+    pairs = [net_debt_and_shares(frames[t]) for t in batch.tickers]
+    ufcf = batch.cashflow[COL_UFCF]
+    return ValuationInputs(
+        list(batch.tickers),
+        ufcf,
+        batch.income_statement[COL_EBITDA],
+        np.full(len(ufcf), ufcf.shape[1], dtype=int),
+        np.array([p[0] for p in pairs], dtype=float),
+        np.array([p[1] for p in pairs], dtype=float),
+    )
+
+def _stack(rows):
+    """
+    Stacks ragged per-ticker rows into a zero-padded (tickers x years) array.
+    """
+    width = max((len(r) for r in rows), default=0)
+    out = np.zeros((len(rows), width))
+    for i, row in enumerate(rows):
+        out[i, :len(row)] = row
+    return out
+
+def _pv_explicit(ufcf, waccs):
+    """
+    Present value of the explicit forecast for every (ticker, wacc): (tickers x waccs).
+    Missing forecast values propagate as NaN.
+    """
+    t = np.arange(1, ufcf.shape[1] + 1)
+    discount = (1 + waccs[:, None]) ** -t[None, :]
+    return ufcf @ discount.T
+
+def _to_equity_per_share(ev, inputs):
+    """
+    Converts enterprise values (tickers x ...) into per-share equity values.
+    """
+    extra = (slice(None),) + (None,) * (ev.ndim - 1)
+    return (ev - inputs.net_debt[extra]) / inputs.shares[extra]
+
+def sensitivity_grid(inputs, waccs=WACC_GRID, growths=GROWTH_GRID, exit_multiples=EXIT_MULTIPLES):
+    """
+    Values every ticker on the full WACC x terminal-growth and WACC x exit-multiple
+    grids in one broadcast computation. Cells with wacc <= growth are NaN.
+    """
+    waccs = np.asarray(waccs, dtype=float)
+    growths = np.asarray(growths, dtype=float)
+    exit_multiples = np.asarray(exit_multiples, dtype=float)
+
+    years = inputs.years
+    last = np.maximum(years - 1, 0)
+    rows = np.arange(len(inputs.tickers))
+    final_ufcf = inputs.ufcf[rows, last]
+    final_ebitda = inputs.ebitda[rows, last]
+
+    pv_explicit = _pv_explicit(inputs.ufcf, waccs)                           # (N, W)
+    terminal_discount = (1 + waccs[None, :]) ** -years[:, None]               # (N, W)
+
+    # Gordon growth: TV = UFCF_T * (1 + g) / (wacc - g)
+    spread = waccs[:, None] - growths[None, :]                                # (W, G)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gordon_factor = np.where(spread > 0, (1 + growths[None, :]) / spread, np.nan)
+    ev_gordon = (final_ufcf[:, None] * terminal_discount)[:, :, None] * gordon_factor[None, :, :]
+    ev_gordon += pv_explicit[:, :, None]
+
+    # Exit multiple: TV = EBITDA_T * multiple
+    ev_exit = final_ebitda[:, None, None] * terminal_discount[:, :, None] * exit_multiples[None, None, :]
+    ev_exit += pv_explicit[:, :, None]
+
+    return SensitivityGrid(
+        list(inputs.tickers), waccs, growths, exit_multiples,
+        ev_gordon, _to_equity_per_share(ev_gordon, inputs),
+        ev_exit, _to_equity_per_share(ev_exit, inputs),
+    )
+
+def value_universe(inputs, wacc=WACC, terminal_growth=TERMINAL_GROWTH):
+    """
+    Base-case DCF of every ticker: enterprise, equity and per-share value.
+    """
+    grid = sensitivity_grid(inputs, [wacc], [terminal_growth], [])
+    pv_explicit = _pv_explicit(inputs.ufcf, np.array([wacc]))[:, 0]
+    ev = grid.ev_gordon[:, 0, 0]
+    equity = ev - inputs.net_debt
+
+    return pd.DataFrame({
+        "PV of UFCF": pv_explicit,
+        "PV of Terminal Value": ev - pv_explicit,
+        "Enterprise Value": ev,
+        "Net Debt": inputs.net_debt,
+        "Equity Value": equity,
+        "Shares Outstanding": inputs.shares,
+        "Value Per Share": equity / inputs.shares,
+        "WACC": wacc,
+        "Terminal Growth": terminal_growth,
+    }, index=pd.Index(inputs.tickers, name="Ticker"))
+
+def read_gold(tickers=None):
+    """
+    Reads the Gold files as {ticker: frame}, limited to the columns valuation needs.
+    """
+    files = sorted(f for f in os.listdir(GOLD_DIR) if f.endswith("_forecast.parquet"))
+    wanted = {"Type", COL_UFCF, COL_EBITDA, *HISTORY_COLUMNS}
+
+    frames = {}
+    for file_name in files:
+        ticker = file_name.replace("_forecast.parquet", "")
+        if tickers is not None and ticker not in tickers:
+            continue
+        path = os.path.join(GOLD_DIR, file_name)
+        columns = [c for c in pq.read_schema(path).names if c in wanted]
+        frames[ticker] = pd.read_parquet(path, columns=columns)
+        instrumentation.record_io(ticker, bytes_read=instrumentation.file_size(path))
+    return frames
+
+def save_grid(grid, path):
+    """
+    Stores the per-share surfaces as float32 arrays in one .npz file.
+    """
+    np.savez(
+        path,
+        tickers=np.array(grid.tickers),
+        waccs=grid.waccs,
+        growths=grid.growths,
+        exit_multiples=grid.exit_multiples,
+        per_share_gordon=grid.per_share_gordon.astype(np.float32),
+        per_share_exit=grid.per_share_exit.astype(np.float32),
+    )
+
+def run_valuation(wacc=WACC, terminal_growth=TERMINAL_GROWTH, waccs=WACC_GRID, growths=GROWTH_GRID,
+                  exit_multiples=EXIT_MULTIPLES, tickers=None):
+    """
+    Discounts the Gold UFCF of every ticker.
+    Saves the base-case valuation to data/valuation/valuation.parquet and the
+    sensitivity grids to data/valuation/sensitivity.npz.
+    """
+    print("Valuing Gold forecasts...")
+
+    if not os.path.exists(GOLD_DIR):
+        print("Gold directory not found.")
+        return None
+
+    os.makedirs(VALUATION_DIR, exist_ok=True)
+    with instrumentation.span("valuation"), instrumentation.stage_context("valuation"):
+        inputs = inputs_from_gold(read_gold(tickers))
+        if not inputs.tickers:
+            print("No forecasts to value.")
+            return None
+
+        valuation = value_universe(inputs, wacc, terminal_growth)
+        valuation_path = os.path.join(VALUATION_DIR, "valuation.parquet")
+        valuation.to_parquet(valuation_path)
+
+        grid = sensitivity_grid(inputs, waccs, growths, exit_multiples)
+        grid_path = os.path.join(VALUATION_DIR, "sensitivity.npz")
+        save_grid(grid, grid_path)
+        instrumentation.record_shape(None, *valuation.shape)
+        instrumentation.record_io(None, bytes_written=os.path.getsize(valuation_path) + os.path.getsize(grid_path))
+
+    print(f"Valued {len(inputs.tickers)} tickers "
+          f"({len(grid.waccs)} x {len(grid.growths)} growth and {len(grid.exit_multiples)} exit-multiple grid)")
+    return valuation
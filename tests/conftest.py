@@ -0,0 +1,15 @@
+import warnings
+import pytest
+from src import forecast_cache
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """
+    Runs every test in an empty directory, since the pipeline reads and writes
+    the data/ tree relative to the working directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(forecast_cache, "_default_cache", None)
+    # Synthetic statements divide by zero on purpose (missing line items)
+    warnings.simplefilter("ignore", RuntimeWarning)
+    return tmp_path
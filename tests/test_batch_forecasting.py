@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_silver_frames
+from src.batch_forecasting import build_history_panel, forecast_batch
+from src.forecasting import forecasting_balance_sheet, forecasting_income_statement, forecast_cashflow
+
+def per_ticker(frames, forecast_years, lookback_years, tax_rate, default_growth):
+    out = {}
+    for ticker, df in frames.items():
+        is_forecast = forecasting_income_statement(df, forecast_years, lookback_years, tax_rate, default_growth)
+        if is_forecast.empty:
+            continue
+        bs_forecast = forecasting_balance_sheet(df, is_forecast, lookback_years)
+        out[ticker] = (is_forecast, bs_forecast, forecast_cashflow(df, is_forecast, bs_forecast))
+    return out
+
+@pytest.mark.parametrize("forecast_years, lookback_years, tax_rate, default_growth", [
+    (5, 3, None, 0.05),
+    (7, 2, 0.25, 0.03),
+])
+def test_batch_matches_per_ticker(forecast_years, lookback_years, tax_rate, default_growth):
+    frames = make_silver_frames(40, seed=5)
+    batch = forecast_batch(build_history_panel(frames), forecast_years, lookback_years, tax_rate, default_growth)
+    expected = per_ticker(frames, forecast_years, lookback_years, tax_rate, default_growth)
+
+    assert sorted(batch.tickers) == sorted(expected)
+    for ticker, statements in expected.items():
+        for exp_df, got_df in zip(statements, batch.frames(ticker)):
+            pd.testing.assert_frame_equal(exp_df, got_df, check_freq=False, check_index_type=False, rtol=1e-9)
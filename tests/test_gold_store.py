@@ -0,0 +1,29 @@
+import os
+from benchmarks.synthetic import make_universe, write_bronze
+from src import forecasting, gold_store, processing
+
+def test_forecast_without_panel_makes_tickers_stale():
+    universe = make_universe(4, seed=1)
+    write_bronze(universe)
+    processing.run_processing()
+    forecasting.run_forecasting(gold_panel=True)
+    tickers = sorted(universe)
+    assert gold_store.stale_tickers() == []
+
+    path = os.path.join(forecasting.GOLD_DIR, f"{tickers[1]}_forecast.parquet")
+    bucket = os.path.join(gold_store.PANEL_DIR, f"bucket={gold_store.ticker_bucket(tickers[1])}", "part-0.parquet")
+    os.utime(path, ns=(os.stat(bucket).st_mtime_ns + 1,) * 2)
+
+    assert gold_store.stale_tickers() == [tickers[1]]
+    assert gold_store.refresh() == [tickers[1]]
+    assert gold_store.stale_tickers() == []
+
+def test_refresh_builds_missing_panel():
+    universe = make_universe(3, seed=2)
+    write_bronze(universe)
+    processing.run_processing()
+    forecasting.run_forecasting()
+
+    assert gold_store.refresh() == sorted(universe)
+    assert gold_store.list_gold_tickers() == sorted(universe)
+    assert gold_store.refresh() == []
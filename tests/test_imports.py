@@ -0,0 +1,15 @@
+import os
+import subprocess
+import sys
+from src import forecasting
+
+def test_forecasting_imports_its_optional_stages_lazily():
+    code = "import sys, src.forecasting; print(sorted(m for m in sys.modules if m.startswith('src.')))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    loaded = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+
+    for module in ["gold_store", "batch_forecasting", "driver_model", "forecast_cache"]:
+        assert f"src.{module}'" not in loaded
+
+def test_code_modules_exist():
+    assert all(os.path.exists(path) for path in forecasting.CODE_MODULES)
@@ -0,0 +1,110 @@
+import os
+from benchmarks.synthetic import make_universe
+from src import bronze, ingestion, instrumentation
+from src.journal import DONE, FAILED, QUARANTINED, Journal
+from src.parallel import DONE as DONE_OUTCOME, ERROR
+
+def make_fetcher(universe, failing=()):
+    calls = {}
+    def fetch(ticker, limiter):
+        calls[ticker] = calls.get(ticker, 0) + 1
+        if ticker in failing:
+            raise ConnectionError(f"no data for {ticker}")
+        return universe[ticker]
+    return fetch, calls
+
+def ingest(tickers, fetcher, **kwargs):
+    return ingestion.run_ingestion(tickers, fetcher=fetcher, retry_base=0, **kwargs)
+
+def test_failing_ticker_is_quarantined():
+    universe = make_universe(3, seed=1)
+    tickers = sorted(universe)
+    fetch, calls = make_fetcher(universe, failing={tickers[1]})
+
+    journal = ingest(tickers, fetch, max_attempts=3)
+
+    assert journal.state(tickers[1]) == QUARANTINED
+    assert journal.attempts(tickers[1]) == 3
+    assert calls[tickers[1]] == 3
+    assert journal.counts(tickers) == {DONE: 2, QUARANTINED: 1}
+    assert os.path.exists(os.path.join(bronze.BRONZE_DIR, tickers[0], "balance_sheet.json"))
+    assert not os.path.exists(os.path.join(bronze.BRONZE_DIR, tickers[1]))
+
+def test_resume_skips_done_and_quarantined():
+    universe = make_universe(4, seed=2)
+    tickers = sorted(universe)
+    fetch, _ = make_fetcher(universe, failing={tickers[1]})
+    ingest(tickers[:3], fetch, max_attempts=2)
+
+    fetch, calls = make_fetcher(universe)
+    journal = ingest(tickers, fetch, resume=True)
+
+    assert calls == {tickers[3]: 1}
+    assert journal.counts(tickers) == {DONE: 3, QUARANTINED: 1}
+
+def test_run_without_resume_starts_over():
+    universe = make_universe(2, seed=3)
+    tickers = sorted(universe)
+    fetch, _ = make_fetcher(universe, failing={tickers[0]})
+    ingest(tickers, fetch, max_attempts=2)
+
+    fetch, calls = make_fetcher(universe)
+    journal = ingest(tickers, fetch)
+
+    assert calls == {ticker: 1 for ticker in tickers}
+    assert journal.counts(tickers) == {DONE: 2}
+
+def test_failed_parquet_batch_marks_its_tickers_failed(monkeypatch):
+    universe = make_universe(5, seed=4)
+    tickers = sorted(universe)
+    fetch, _ = make_fetcher(universe)
+    def write_parquet_batch(statements):
+        raise OSError("disk full")
+    with monkeypatch.context() as patch:
+        patch.setattr(bronze, "write_parquet_batch", write_parquet_batch)
+        journal = ingest(tickers, fetch, bronze_format="parquet", parquet_batch_size=2)
+
+    assert journal.counts(tickers) == {FAILED: 5}
+    assert journal.entries[tickers[0]]["reason"] == "OSError: disk full"
+
+    fetch, calls = make_fetcher(universe)
+    journal = ingest(tickers, fetch, bronze_format="parquet", resume=True)
+    assert sorted(calls) == tickers
+    assert journal.counts(tickers) == {DONE: 5}
+
+def test_journal_replay_ignores_a_torn_line():
+    journal = Journal("data/journal.jsonl")
+    journal.mark("AAA", DONE, attempts=1)
+    journal.mark("BBB", FAILED, "timeout", attempts=2)
+    journal.close()
+    with open("data/journal.jsonl", "a") as f:
+        f.write('{"ticker": "BBB", "state": "do')
+
+    replayed = Journal("data/journal.jsonl")
+
+    assert replayed.state("AAA") == DONE
+    assert replayed.state("BBB") == FAILED
+    assert replayed.attempts("BBB") == 2
+    assert replayed.remaining(["AAA", "BBB", "CCC"]) == ["BBB", "CCC"]
+
+def ingestion_outcomes(events):
+    return {e["ticker"]: e["status"] for e in events if e["type"] == "outcome" and e["stage"] == "ingestion"}
+
+def test_outcomes_follow_the_bronze_writes(monkeypatch):
+    universe = make_universe(4, seed=5)
+    tickers = sorted(universe)
+    fetch, _ = make_fetcher(universe)
+    def write_parquet_batch(statements):
+        if tickers[0] in statements:
+            raise OSError("disk full")
+        return real_write(statements)
+    real_write = bronze.write_parquet_batch
+    monkeypatch.setattr(bronze, "write_parquet_batch", write_parquet_batch)
+
+    mark = instrumentation.RECORDER.mark()
+    journal = ingest(tickers, fetch, bronze_format="parquet", parquet_batch_size=2)
+    outcomes = ingestion_outcomes(instrumentation.RECORDER.take(mark))
+
+    failed = [t for t in tickers if journal.state(t) == FAILED]
+    assert tickers[0] in failed
+    assert outcomes == {t: ERROR if t in failed else DONE_OUTCOME for t in tickers}
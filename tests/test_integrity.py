@@ -0,0 +1,31 @@
+import os
+import pandas as pd
+from benchmarks.synthetic import make_universe, write_bronze
+from src import forecasting, gold_store, integrity, processing
+
+def build_gold(gold_panel):
+    universe = make_universe(3, seed=1)
+    write_bronze(universe)
+    processing.run_processing()
+    forecasting.run_forecasting(gold_panel=gold_panel)
+    return sorted(universe)
+
+def test_stale_panel_is_not_checked():
+    tickers = build_gold(gold_panel=True)
+    path = os.path.join(forecasting.GOLD_DIR, f"{tickers[0]}_forecast.parquet")
+    gold = pd.read_parquet(path)
+    gold["Current Liabilities"] *= 2
+    gold.to_parquet(path)
+
+    panel = integrity.read_gold_panel()
+
+    assert gold_store.stale_tickers() == [tickers[0]]
+    assert (panel.loc[tickers[0], "Current Liabilities"].to_numpy() == gold["Current Liabilities"].to_numpy()).all()
+
+def test_forecast_rows_without_line_items_are_unchecked():
+    build_gold(gold_panel=False)
+
+    summary = integrity.run_integrity().summary
+
+    assert summary.loc[("balance_sheet", "Forecast"), "Status"] == "unchecked"
+    assert summary.loc[("balance_sheet", "Historical"), "Status"] == "checked"
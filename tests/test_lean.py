@@ -0,0 +1,35 @@
+import os
+import pandas as pd
+import pytest
+from benchmarks.bench_lean import add_extra_items, check_match
+from benchmarks.synthetic import make_silver_frames
+from src import batch_forecasting, forecasting, valuation
+
+def forecast(frames, lean):
+    os.makedirs(forecasting.SILVER_DIR, exist_ok=True)
+    for ticker, df in frames.items():
+        df.to_parquet(os.path.join(forecasting.SILVER_DIR, f"{ticker}.parquet"))
+    forecasting.run_forecasting(lean=lean)
+    return {f.replace("_forecast.parquet", ""): pd.read_parquet(os.path.join(forecasting.GOLD_DIR, f))
+            for f in os.listdir(forecasting.GOLD_DIR)}
+
+@pytest.fixture
+def frames():
+    return add_extra_items(make_silver_frames(10, seed=3), 5)
+
+def test_lean_forecasts_match_full_ones(frames):
+    check_match(forecast(frames, lean=False), forecast(frames, lean=True), rtol=1e-6)
+
+def test_missing_required_column_is_caught(frames, monkeypatch):
+    full = forecast(frames, lean=False)
+    required = [c for c in forecasting.REQUIRED_COLUMNS if c != "Inventory"]
+    monkeypatch.setattr(forecasting, "REQUIRED_COLUMNS", required)
+    monkeypatch.setattr(forecasting, "REQUIRED_SET", set(required))
+
+    with pytest.raises(AssertionError):
+        check_match(full, forecast(frames, lean=True), rtol=1e-6)
+
+def test_required_columns_cover_batch_and_valuation_inputs():
+    required = set(forecasting.REQUIRED_COLUMNS)
+    assert set(batch_forecasting.HISTORY_ITEMS) <= required
+    assert set(valuation.HISTORY_COLUMNS) <= required
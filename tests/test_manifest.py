@@ -0,0 +1,88 @@
+from benchmarks.synthetic import make_universe, write_bronze
+from src import bronze
+from src.manifest import Manifest, bronze_hashes, code_version, run_incremental
+from src.parallel import DONE, ERROR, INCOMPLETE, SKIPPED, StageResult
+
+VERSION = "v1"
+
+def built_manifest(hashes):
+    manifest = Manifest()
+    manifest.record("processing", hashes, VERSION, list(hashes))
+    manifest.save()
+    return Manifest()
+
+def test_unchanged_tickers_are_fresh():
+    write_bronze(make_universe(3, seed=1))
+    hashes = bronze_hashes()
+    assert built_manifest(hashes).stale("processing", hashes, VERSION) == []
+
+def test_changed_bronze_invalidates_only_its_ticker():
+    universe = make_universe(3, seed=1)
+    write_bronze(universe)
+    manifest = built_manifest(bronze_hashes())
+    tickers = sorted(universe)
+
+    bronze.write_json(tickers[1], make_universe(3, seed=2)[tickers[1]])
+
+    assert manifest.stale("processing", bronze_hashes(), VERSION) == [tickers[1]]
+
+def test_parquet_bronze_hashes_follow_content():
+    universe = make_universe(3, seed=1)
+    write_bronze(universe, "parquet")
+    manifest = built_manifest(bronze_hashes("parquet"))
+    tickers = sorted(universe)
+
+    bronze.write_parquet_batch({tickers[2]: make_universe(3, seed=2)[tickers[2]]})
+
+    assert manifest.stale("processing", bronze_hashes("parquet"), VERSION) == [tickers[2]]
+
+def test_version_force_and_missing_output_invalidate():
+    write_bronze(make_universe(3, seed=1))
+    hashes = bronze_hashes()
+    manifest = built_manifest(hashes)
+    tickers = sorted(hashes)
+
+    assert manifest.stale("processing", hashes, "v2") == tickers
+    assert manifest.stale("processing", hashes, VERSION, force=True) == tickers
+    assert manifest.stale("processing", hashes, VERSION, output_exists=lambda t: t != tickers[0]) == [tickers[0]]
+
+def test_code_version_covers_module_content_and_params(tmp_path):
+    module = tmp_path / "module.py"
+    module.write_text("x = 1\n")
+    version = code_version([str(module)], {"lean": False})
+
+    assert code_version([str(module)], {"lean": True}) != version
+    module.write_text("x = 2\n")
+    assert code_version([str(module)], {"lean": False}) != version
+
+def test_run_incremental_leaves_failed_and_incomplete_tickers_stale():
+    hashes = {"AAA": "a", "BBB": "b", "CCC": "c"}
+    manifest = Manifest()
+    def run(tickers):
+        result = StageResult("processing")
+        result.add("AAA", DONE)
+        result.add("BBB", DONE)
+        result.add("BBB", INCOMPLETE, ("TTM OSError: disk full", ""))
+        result.add("CCC", ERROR, ("ValueError: bad", ""))
+        return result
+
+    run_incremental(manifest, "processing", hashes, VERSION, run)
+
+    assert Manifest().stale("processing", hashes, VERSION) == ["BBB", "CCC"]
+
+def test_skipped_tickers_stay_fresh_without_output():
+    hashes = {"AAA": "a", "BBB": "b"}
+    calls = []
+    def run(tickers):
+        calls.append(tickers)
+        result = StageResult("forecasting")
+        result.add("AAA", DONE)
+        result.add("BBB", SKIPPED, "No data")
+        return result
+    exists = lambda ticker: ticker == "AAA"
+
+    run_incremental(Manifest(), "forecasting", hashes, VERSION, run, output_exists=exists)
+    assert run_incremental(Manifest(), "forecasting", hashes, VERSION, run, output_exists=exists) is None
+
+    assert calls == [["AAA", "BBB"]]
+    assert Manifest().stale("forecasting", {**hashes, "BBB": "b2"}, VERSION, output_exists=exists) == ["BBB"]
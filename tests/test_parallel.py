@@ -0,0 +1,53 @@
+import os
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_universe, write_bronze
+from src import bronze, forecasting, processing
+from src.parallel import make_chunks
+
+def read_dir(path):
+    return {name: pd.read_parquet(os.path.join(path, name)) for name in sorted(os.listdir(path))}
+
+def assert_same_dirs(got, expected):
+    assert list(got) == list(expected)
+    for name, df in expected.items():
+        pd.testing.assert_frame_equal(got[name], df)
+
+def test_chunks_keep_key_groups_together():
+    items = [f"T{i:02d}" for i in range(30)]
+    chunks = make_chunks(items, max_workers=2, chunksize=4, key=lambda item: int(item[1:]) % 5)
+
+    assert sorted(item for chunk in chunks for item in chunk) == items
+    owners = {}
+    for i, chunk in enumerate(chunks):
+        for item in chunk:
+            assert owners.setdefault(int(item[1:]) % 5, i) == i
+
+@pytest.mark.parametrize("workers, chunksize", [(2, None), (2, 3)])
+def test_outputs_do_not_depend_on_workers(workers, chunksize):
+    write_bronze(make_universe(12, seed=1))
+
+    serial = processing.run_processing(max_workers=1)
+    serial_silver = read_dir(processing.SILVER_DIR)
+    forecasting.run_forecasting(max_workers=1)
+    serial_gold = read_dir(forecasting.GOLD_DIR)
+
+    parallel = processing.run_processing(max_workers=workers, chunksize=chunksize)
+    assert_same_dirs(read_dir(processing.SILVER_DIR), serial_silver)
+    forecasting.run_forecasting(max_workers=workers, chunksize=chunksize)
+    assert_same_dirs(read_dir(forecasting.GOLD_DIR), serial_gold)
+    assert parallel.done == serial.done
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ticker_errors_are_collected(workers):
+    universe = make_universe(6, seed=2)
+    write_bronze(universe)
+    broken = sorted(universe)[1]
+    with open(os.path.join(bronze.BRONZE_DIR, broken, "income_statement.json"), "w") as f:
+        f.write("{not json")
+
+    result = processing.run_processing(max_workers=workers)
+
+    assert list(result.errors) == [broken]
+    assert "Traceback" in result.tracebacks[broken]
+    assert result.done == [t for t in sorted(universe) if t != broken]
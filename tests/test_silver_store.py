@@ -0,0 +1,52 @@
+import os
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_silver_frames
+from src import silver_store
+
+def assert_same(got, expected):
+    assert sorted(got) == sorted(expected)
+    for ticker, df in expected.items():
+        pd.testing.assert_frame_equal(got[ticker], df.dropna(axis=1, how="all"), check_like=True,
+                                      check_index_type=False, check_freq=False)
+
+@pytest.mark.parametrize("n_buckets", [1, silver_store.N_BUCKETS])
+def test_upsert_replaces_only_the_written_tickers(monkeypatch, n_buckets):
+    monkeypatch.setattr(silver_store, "N_BUCKETS", n_buckets)
+    frames = make_silver_frames(6, seed=1)
+    silver_store.write_panel(frames)
+    tickers = sorted(frames)
+
+    updated = make_silver_frames(6, seed=2)
+    changed = {ticker: updated[ticker] for ticker in tickers[:2]}
+    # A shorter history must not leave the rows of older years behind
+    changed[tickers[0]] = changed[tickers[0]].iloc[1:]
+    silver_store.write_panel(changed)
+
+    assert_same(silver_store.read_panel_frames(), {**frames, **changed})
+    assert silver_store.list_panel_tickers() == tickers
+
+def test_upsert_rewrites_only_the_affected_buckets():
+    frames = make_silver_frames(6, seed=1)
+    silver_store.write_panel(frames)
+    files = silver_store.list_bucket_files()
+    # Buckets are replaced through a rename, so a rewritten bucket is a new inode
+    inodes = {bucket: os.stat(path).st_ino for bucket, path in files.items()}
+
+    ticker = sorted(frames)[0]
+    silver_store.write_panel({ticker: make_silver_frames(6, seed=2)[ticker]})
+
+    rewritten = {bucket for bucket, path in files.items() if os.stat(path).st_ino != inodes[bucket]}
+    assert rewritten == {silver_store.ticker_bucket(ticker)}
+
+def test_read_panel_pushes_down_tickers_and_periods():
+    frames = make_silver_frames(6, seed=1)
+    silver_store.write_panel(frames)
+    ticker = sorted(frames)[3]
+    start = frames[ticker].index[1]
+
+    got = silver_store.read_panel_frames(columns=["Total Revenue"], tickers=[ticker], start=start)
+
+    assert list(got) == [ticker]
+    expected = frames[ticker].loc[frames[ticker].index >= start, ["Total Revenue"]]
+    pd.testing.assert_frame_equal(got[ticker], expected, check_index_type=False, check_freq=False)
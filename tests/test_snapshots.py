@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_universe
+from src import bronze, ingestion, snapshots
+from src.journal import DONE, FAILED
+
+FIRST = "20250101T120000_000000000"
+SECOND = "20250301T120000_000000000"
+
+def record(snapshot_id, universe):
+    writer = snapshots.SnapshotWriter(snapshot_id)
+    for ticker, statements in universe.items():
+        writer.add(ticker, statements)
+    writer.close()
+    return writer
+
+def json_frames(ticker, statements):
+    bronze.write_json(ticker, statements)
+    return bronze.read_json(ticker)
+
+def assert_same_frames(got, expected):
+    assert len(got) == len(expected)
+    for got_df, exp_df in zip(got, expected):
+        pd.testing.assert_frame_equal(got_df, exp_df)
+
+def test_unchanged_statements_are_not_recorded_again():
+    universe = make_universe(2, seed=1)
+    assert record(FIRST, universe).changed == 2 * len(bronze.STATEMENT_NAMES)
+    assert record(SECOND, universe).changed == 0
+    assert list(snapshots.list_snapshots()["changed"]) == [6]
+
+def test_as_of_reads_the_statements_of_that_time():
+    old = make_universe(2, seed=1)
+    ticker, other = sorted(old)
+    new = {ticker: make_universe(2, seed=2)[ticker]}
+    record(FIRST, old)
+    record(SECOND, new)
+
+    old_frames = json_frames(ticker, old[ticker])
+    new_frames = json_frames(ticker, new[ticker])
+    for as_of in [FIRST, "2025-01-01", "2025-02-28 23:00"]:
+        assert_same_frames(snapshots.read_frames(snapshots.state(as_of), ticker), old_frames)
+    for as_of in [SECOND, "2025-03-01", None]:
+        assert_same_frames(snapshots.read_frames(snapshots.state(as_of), ticker), new_frames)
+    # Statements that did not change in the later snapshot are still visible
+    assert_same_frames(snapshots.read_frames(snapshots.state(SECOND), other), json_frames(other, old[other]))
+
+def test_nothing_is_visible_before_the_first_snapshot():
+    record(FIRST, make_universe(1, seed=1))
+    assert snapshots.state("2024-12-31").empty
+
+@pytest.mark.parametrize("bronze_format", ["json", "parquet"])
+def test_failed_snapshot_marks_the_ticker_failed(monkeypatch, bronze_format):
+    universe = make_universe(4, seed=3)
+    tickers = sorted(universe)
+    real_add = snapshots.SnapshotWriter.add
+    def add(self, ticker, statements):
+        if ticker == tickers[1]:
+            raise OSError("disk full")
+        return real_add(self, ticker, statements)
+    monkeypatch.setattr(snapshots.SnapshotWriter, "add", add)
+    fetch = lambda ticker, limiter: universe[ticker]
+
+    journal = ingestion.run_ingestion(tickers, fetcher=fetch, bronze_format=bronze_format, snapshot=True)
+
+    assert journal.state(tickers[1]) == FAILED
+    assert journal.entries[tickers[1]]["reason"] == "snapshot OSError: disk full"
+    assert journal.counts(tickers) == {DONE: 3, FAILED: 1}
+    assert sorted(snapshots.state()["ticker"].unique()) == [t for t in tickers if t != tickers[1]]
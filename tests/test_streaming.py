@@ -0,0 +1,103 @@
+import os
+import threading
+import pytest
+from benchmarks.synthetic import make_universe
+from src import bronze, processing, silver_store, streaming
+from src.journal import DONE, FAILED, QUARANTINED, Journal
+
+@pytest.fixture
+def universe():
+    return make_universe(5, seed=1)
+
+def run(universe, failing=(), tickers=None, **kwargs):
+    def fetch(ticker, limiter):
+        if ticker in failing:
+            raise ConnectionError(f"no data for {ticker}")
+        return universe[ticker]
+    kwargs = {"fetcher": fetch, "batch_size": 2, **kwargs}
+    return streaming.run_streaming(tickers or sorted(universe), retry_base=0, **kwargs)
+
+def counts(result):
+    return {stage: (len(r.done), len(r.errors)) for stage, r in result.results.items()}
+
+def fail(*args, **kwargs):
+    raise OSError("disk full")
+
+@pytest.mark.parametrize("bronze_format, silver_layout", [("json", "files"), ("parquet", "panel")])
+def test_every_ticker_is_valued(universe, bronze_format, silver_layout):
+    result = run(universe, bronze_format=bronze_format, silver_layout=silver_layout)
+
+    assert counts(result) == {"ingestion": (5, 0), "processing": (5, 0), "forecasting": (5, 0)}
+    assert sorted(result.valuation().index) == sorted(universe)
+    assert Journal().counts(sorted(universe)) == {DONE: 5}
+    if silver_layout == "panel":
+        assert silver_store.list_panel_tickers() == sorted(universe)
+    else:
+        assert sorted(os.listdir(processing.SILVER_DIR)) == [f"{t}.parquet" for t in sorted(universe)]
+
+def test_failed_fetch_is_quarantined_and_the_rest_go_on(universe):
+    bad = sorted(universe)[2]
+    result = run(universe, failing={bad}, max_attempts=2)
+
+    assert list(result.results["ingestion"].errors) == [bad]
+    assert counts(result)["forecasting"] == (4, 0)
+    assert Journal().state(bad) == QUARANTINED
+
+def test_failed_silver_batch_reports_every_ticker(universe, monkeypatch):
+    monkeypatch.setattr(silver_store, "write_panel", fail)
+    result = run(universe, silver_layout="panel")
+
+    assert sorted(result.results["processing"].errors) == sorted(universe)
+    assert set(result.results["processing"].errors.values()) == {"OSError: disk full"}
+    assert counts(result)["forecasting"] == (0, 0)
+    assert result.valuation().empty
+    # Bronze was written, so ingestion itself succeeded
+    assert Journal().counts(sorted(universe)) == {DONE: 5}
+
+def test_failed_bronze_batch_marks_tickers_failed(universe, monkeypatch):
+    monkeypatch.setattr(bronze, "write_parquet_batch", fail)
+    result = run(universe, bronze_format="parquet")
+
+    assert sorted(result.results["processing"].errors) == sorted(universe)
+    assert counts(result)["forecasting"] == (0, 0)
+    assert Journal().counts(sorted(universe)) == {FAILED: 5}
+
+def test_resume_fetches_only_unfinished_tickers(universe):
+    tickers = sorted(universe)
+    run(universe, failing={tickers[0]}, tickers=tickers[:3], max_attempts=1)
+
+    result = run(universe, resume=True)
+
+    assert sorted(result.results["ingestion"].done) == tickers[3:]
+    assert Journal().counts(tickers) == {DONE: 4, QUARANTINED: 1}
+
+def test_tickers_are_pulled_one_at_a_time(universe):
+    tickers, pulled, seen = sorted(universe), [], []
+
+    def generate():
+        for ticker in tickers:
+            pulled.append(ticker)
+            yield ticker
+
+    def fetch(ticker, limiter):
+        seen.append((ticker, len(pulled), Journal().state(tickers[-1])))
+        return universe[ticker]
+
+    streaming.run_streaming(generate(), fetch_workers=1, fetcher=fetch, retry_base=0)
+
+    assert seen == [(ticker, i + 1, None) for i, ticker in enumerate(tickers[:-1])] + [(tickers[-1], 5, "pending")]
+
+def test_partial_batches_are_written_after_max_wait(universe):
+    tickers = sorted(universe)
+    valued, waits = threading.Event(), []
+
+    def fetch(ticker, limiter):
+        if ticker == tickers[-1]:
+            waits.append(valued.wait(timeout=5))
+        return universe[ticker]
+
+    run(universe, fetcher=fetch, fetch_workers=1, bronze_format="parquet", silver_layout="panel",
+        batch_size=100, max_wait=0.05, on_valuation=lambda ticker, row: valued.set())
+
+    # The first tickers were valued while the last one was still being fetched
+    assert waits == [True]
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import make_silver_frames, make_universe, write_bronze
+from src import forecasting, processing
+from src.batch_forecasting import batch_cagr, build_history_panel, forecast_batch
+
+@pytest.mark.parametrize("silver_dir", [processing.SILVER_DIR, processing.SILVER_TTM_DIR])
+def test_broken_silver_file_fails_only_its_ticker(silver_dir):
+    universe = make_universe(5, seed=1, n_quarters=8)
+    write_bronze(universe)
+    processing.run_processing(quarterly=True)
+    tickers = sorted(universe)
+    with open(os.path.join(silver_dir, f"{tickers[2]}.parquet"), "wb") as f:
+        f.write(b"not parquet")
+
+    result = forecasting.run_forecasting(ttm=True)
+
+    assert list(result.errors) == [tickers[2]]
+    assert result.done == [t for t in tickers if t != tickers[2]]
+
+def with_ttm_row(df, months, growth=1.05):
+    ttm = df.tail(1).copy()
+    ttm.index = pd.DatetimeIndex([df.index.max() + pd.DateOffset(months=months)])
+    ttm["Total Revenue"] *= growth
+    return ttm
+
+def first_forecast_revenue(df, lean=False):
+    forecasting.save_gold("TTM", df, lean=lean)
+    gold = pd.read_parquet(os.path.join(forecasting.GOLD_DIR, "TTM_forecast.parquet"))
+    return gold.loc[gold["Type"] == "Forecast", "Total Revenue"].iloc[0]
+
+@pytest.fixture
+def silver():
+    os.makedirs(forecasting.GOLD_DIR, exist_ok=True)
+    return next(iter(make_silver_frames(1, seed=4).values())).sort_index()
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_ttm_base_counts_its_step_by_length(silver, lean):
+    combined = forecasting.with_ttm_base(silver, with_ttm_row(silver, months=6))
+    revenue = combined["Total Revenue"].dropna()
+    expected = revenue.iloc[-1] * (1 + forecasting.calculate_cagr(revenue, last_step=0.5))
+
+    assert combined.attrs["ttm_step"] == 0.5
+    assert first_forecast_revenue(combined, lean) == pytest.approx(expected, rel=1e-6)
+
+def test_fiscal_year_end_change_counts_as_a_year(silver):
+    # Annual history whose last fiscal year ended six months after the one before
+    shifted = silver.rename(index={silver.index[-1]: silver.index[-2] + pd.DateOffset(months=6)})
+    batch = forecast_batch(build_history_panel({"TTM": shifted}))
+    expected = batch.income_statement["Total Revenue"][0, 0]
+
+    assert first_forecast_revenue(shifted) == pytest.approx(expected, rel=1e-9)
+
+def test_batch_cagr_matches_calculate_cagr():
+    rng = np.random.default_rng(0)
+    series = rng.uniform(50, 150, (20, 6))
+    series[rng.uniform(size=series.shape) < 0.2] = np.nan
+    for last_step in [1.0, 0.5, 0.75]:
+        batch = batch_cagr(series, last_step=last_step)
+        for row, got in zip(series, batch):
+            expected = forecasting.calculate_cagr(pd.Series(row).dropna(), fallback=0.05, last_step=last_step)
+            assert got == pytest.approx(expected, rel=1e-12)